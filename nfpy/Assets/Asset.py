@@ -11,6 +11,7 @@ import pandas as pd
 from typing import (Callable, Optional, TypeVar)
 
 import nfpy.Calendar as Cal
+import nfpy.DB as DB
 import nfpy.IO.Utilities as Ut
 import nfpy.Math as Math
 from nfpy.Tools import Exceptions as Ex
@@ -158,6 +159,11 @@ class Asset(FinancialItem):
         """
         # this is needed inside the self._get_dati_for_query()
         dtype_code = self._dt.get(dtype)
+
+        cache = DB.get_tscache_glob()
+        if cache:
+            return self._load_dtype_cached(cache, dtype_code)
+
         self.dtype = dtype_code
 
         # Take results and append to the unique dataframe indexed on the calendar
@@ -193,6 +199,27 @@ class Asset(FinancialItem):
             df.rename(columns={"value": dtype_code}, inplace=True)
             return True, df
 
+    def _load_dtype_cached(self, cache: DB.TyTSCache, dtype_code: int) \
+            -> tuple[bool, pd.DataFrame]:
+        """ Fetch a time series through the on-disk cache. The cached records
+            are sliced on the calendar dates without copying.
+        """
+        arr = cache.get(self.ts_table, self._uid, dtype_code)
+
+        dates = arr['date']
+        start = (self._df.index[0] - pd.Timedelta(days=1)).to_datetime64()
+        end = self._df.index[-1].to_datetime64()
+        slc = slice(
+            np.searchsorted(dates, start, side='left'),
+            np.searchsorted(dates, end, side='right')
+        )
+
+        df = pd.DataFrame(
+            {dtype_code: arr['value'][slc]},
+            index=pd.DatetimeIndex(dates[slc], name='date')
+        )
+        return not df.empty, df
+
     def load_dtype_in_df(self, dtype: str) -> bool:
         """ Load the datatype and merge into the dataframe. """
         success, df = self.load_dtype(dtype)
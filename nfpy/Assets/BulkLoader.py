@@ -0,0 +1,185 @@
+#
+# Bulk Loader
+# Load time series for many assets and datatypes in a single query
+#
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from typing import (Optional, Sequence)
+
+import nfpy.Calendar as Cal
+from nfpy.DatatypeFactory import get_dt_glob
+import nfpy.DB as DB
+from nfpy.Tools import Exceptions as Ex
+
+from .Asset import TyAsset
+
+# Maximum number of uids bound in a single IN () clause. Keeps the number of
+# query parameters well below the SQLite limit.
+_MAX_UIDS_PER_QUERY = 500
+
+
+def _fetch_ts(table: str, uids: Sequence[str], codes: Sequence[int],
+              start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """ Fetch the long-format rows <uid, dtype, date, value> from a time
+        series table for all the given uids and datatype codes.
+    """
+    db = DB.get_db_glob()
+
+    q = """SELECT [uid], [dtype], [date], [value] FROM [{}]
+    WHERE [uid] IN ({}) AND [dtype] IN ({}) AND [date] >= ? AND [date] <= ?"""
+    dtype_ph = ','.join('?' * len(codes))
+    dates = (start.to_pydatetime() - timedelta(days=1), end.to_pydatetime())
+
+    frames = []
+    for i in range(0, len(uids), _MAX_UIDS_PER_QUERY):
+        chunk = tuple(uids[i:i + _MAX_UIDS_PER_QUERY])
+        frames.append(
+            pd.read_sql_query(
+                q.format(table, ','.join('?' * len(chunk)), dtype_ph),
+                db.connection,
+                params=(*chunk, *codes, *dates),
+                parse_dates=['date']
+            )
+        )
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_ts_array(table: str, uids: Sequence[str], dtypes: Sequence[str],
+                  calendar: Optional[pd.DatetimeIndex] = None) -> np.ndarray:
+    """ Load from a time series table several datatypes for many uids with a
+        single round trip per chunk of uids. Data are aligned on the calendar
+        and missing observations are filled with NaN.
+
+        Input:
+            table [str]: time series table (e.g. EquityTS)
+            uids [Sequence[str]]: uids to load
+            dtypes [Sequence[str]]: datatypes to load
+            calendar [pd.DatetimeIndex]: dates to align to. If None the global
+                daily calendar is used (default: None)
+
+        Output:
+            res [np.ndarray]: array with shape (uids, dtypes, dates)
+
+        Exceptions:
+            CalendarError: if the calendar is not initialized
+            KeyError: if a datatype is not recognized in the decoding table
+    """
+    if calendar is None:
+        cal = Cal.get_calendar_glob()
+        if not cal:
+            raise Ex.CalendarError("Calendar not initialized as required!!!")
+        calendar = cal.calendar
+
+    dt = get_dt_glob()
+    codes = [dt.get(d) for d in dtypes]
+    uids = list(uids)
+
+    res = np.full((len(uids), len(codes), len(calendar)), np.nan)
+    if (len(uids) == 0) or (len(codes) == 0) or (len(calendar) == 0):
+        return res
+
+    # Repeated uids are fetched once and copied back to each of their rows
+    unique = pd.Index(uids).unique()
+    df = _fetch_ts(table, list(unique), codes, calendar[0], calendar[-1])
+    if df.empty:
+        return res
+
+    # Map each row to its position in the output array. Rows whose date is
+    # not in the calendar are dropped as done by Asset.load_dtype_in_df().
+    t_pos = calendar.get_indexer(df['date'])
+    u_pos = unique.get_indexer(df['uid'])
+    d_pos = pd.Index(codes).get_indexer(df['dtype'])
+    mask = t_pos >= 0
+
+    arr = np.full((len(unique), len(codes), len(calendar)), np.nan)
+    arr[u_pos[mask], d_pos[mask], t_pos[mask]] = \
+        df['value'].to_numpy(dtype=float)[mask]
+    res[:] = arr[unique.get_indexer(uids)]
+    return res
+
+
+def load_ts_frame(table: str, uids: Sequence[str], dtypes: Sequence[str],
+                  calendar: Optional[pd.DatetimeIndex] = None) -> pd.DataFrame:
+    """ Load from a time series table several datatypes for many uids and
+        return a wide dataframe indexed on the calendar. See load_ts_array().
+
+        Input:
+            table [str]: time series table (e.g. EquityTS)
+            uids [Sequence[str]]: uids to load
+            dtypes [Sequence[str]]: datatypes to load
+            calendar [pd.DatetimeIndex]: dates to align to. If None the global
+                daily calendar is used (default: None)
+
+        Output:
+            res [pd.DataFrame]: dataframe with columns MultiIndex <uid, dtype>
+    """
+    if calendar is None:
+        cal = Cal.get_calendar_glob()
+        if not cal:
+            raise Ex.CalendarError("Calendar not initialized as required!!!")
+        calendar = cal.calendar
+
+    uids = list(uids)
+    arr = load_ts_array(table, uids, dtypes, calendar)
+    cols = pd.MultiIndex.from_product([uids, list(dtypes)],
+                                      names=['uid', 'dtype'])
+    return pd.DataFrame(
+        arr.reshape(-1, arr.shape[2]).T,
+        index=calendar,
+        columns=cols
+    )
+
+
+def load_assets_bulk(assets: Sequence[TyAsset], dtypes: Sequence[str]) -> None:
+    """ Pre-load several datatypes into the dataframes of many assets. Assets
+        are grouped by time series table and each group is fetched in a single
+        query. Datatypes already present in an asset dataframe are not
+        overwritten. Afterward, calls to Asset.series() are served from memory.
+
+        Input:
+            assets [Sequence[TyAsset]]: assets to fill
+            dtypes [Sequence[str]]: datatypes to load
+    """
+    dt = get_dt_glob()
+    codes = [dt.get(d) for d in dtypes]
+
+    # Assets are grouped also by the index of their dataframe as, for
+    # instance, indices may be aligned to a monthly or yearly calendar. Data
+    # are assigned by position, therefore the indices in a group must be
+    # equal and not only share the same bounds and length.
+    groups = {}
+    for a in assets:
+        idx = a.data.index
+        key = (a.ts_table, len(idx))
+        if len(idx) > 0:
+            key += (idx[0], idx[-1])
+        candidates = groups.setdefault(key, [])
+        for group in candidates:
+            if group[0].data.index.equals(idx):
+                group.append(a)
+                break
+        else:
+            candidates.append([a])
+
+    for key, candidates in groups.items():
+        for group in candidates:
+            _load_group(key[0], group, dtypes, codes)
+
+
+def _load_group(table: str, group: Sequence[TyAsset], dtypes: Sequence[str],
+                codes: Sequence[int]) -> None:
+    """ Fill the dataframes of a group of assets sharing the same index. """
+    calendar = group[0].data.index
+    arr = load_ts_array(table, [a.uid for a in group], dtypes, calendar)
+
+    for i, a in enumerate(group):
+        for j, code in enumerate(codes):
+            if code in a.data.columns:
+                continue
+            if np.isnan(arr[i, j]).all():
+                continue
+            a.data[code] = arr[i, j]
+
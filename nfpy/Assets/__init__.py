@@ -1,4 +1,5 @@
 from .AssetFactory import get_af_glob
+from .BulkLoader import (load_assets_bulk, load_ts_array, load_ts_frame)
 from .FxFactory import get_fx_glob
 
 # Type[U] -> U
@@ -11,6 +12,9 @@ __all__ = [
     # Factories
     'get_af_glob', 'get_fx_glob',
 
+    # Bulk loading
+    'load_assets_bulk', 'load_ts_array', 'load_ts_frame',
+
     # Types
     'TyAggregation', 'TyAsset', 'TyFI',
 ]
@@ -0,0 +1,130 @@
+#
+# Database backup
+# Online backup of the database with compression and rotation
+#
+
+from datetime import datetime
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Optional
+
+import nfpy.IO.Utilities as Ut
+from nfpy.Tools import (Exceptions as Ex, get_conf_glob, get_logger_glob)
+
+
+class BackupEngine(threading.Thread):
+    """ Online backup of the database using the SQLite backup API. The copy is
+        made from a dedicated connection in large page steps so that the
+        connected readers can continue working. The engine can be run in
+        the calling thread via BackupEngine.run() or in background via
+        BackupEngine.start().
+
+        Input:
+            db_path [str]: path of the database (default: configured database)
+            f_name [str]: destination file (default: timestamped file in the
+                backup folder)
+            pages [int]: pages copied per step, -1 for all at once
+                (default: db_backup_pages or -1)
+            compress [bool]: gzip the backup (default: db_backup_compress)
+            keep [int]: number of backups to keep in the backup folder, 0 to
+                keep all (default: db_backup_keep or 0)
+            verbose [bool]: print the progress (default: True)
+    """
+
+    _CHUNK = 1 << 20
+
+    def __init__(self, db_path: Optional[str] = None,
+                 f_name: Optional[str] = None, pages: Optional[int] = None,
+                 compress: Optional[bool] = None, keep: Optional[int] = None,
+                 verbose: bool = True):
+        super().__init__(name='nfpyDBBackup', daemon=False)
+        conf = get_conf_glob()
+
+        self._db_path = db_path if db_path else conf.db_path
+        self._bk_dir = os.path.expanduser(conf.backup_folder)
+        self._pages = int(pages if pages is not None
+                          else (conf['db_backup_pages'] or -1))
+        self._compress = bool(compress if compress is not None
+                              else conf['db_backup_compress'])
+        self._keep = int(keep if keep is not None
+                         else (conf['db_backup_keep'] or 0))
+        self._verbose = verbose
+
+        name, ext = os.path.splitext(os.path.basename(self._db_path))
+        self._name = name
+        self._ext = ext
+        if f_name is None:
+            ts = datetime.today().strftime('%Y%m%d_%H%M%S')
+            f_name = os.path.join(self._bk_dir, f'{name}_{ts}{ext}')
+        self._f_name = f_name
+        self._error = None
+
+    @property
+    def f_name(self) -> str:
+        """ Final path of the backup file. """
+        return self._f_name + '.gz' if self._compress else self._f_name
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._error
+
+    def _progress(self, status: int, remaining: int, total: int) -> None:
+        if self._verbose:
+            print(f'Copied {total - remaining} of {total} pages...')
+
+    def _backup(self) -> None:
+        """ Copy the database into the destination file. """
+        dst_dir = os.path.dirname(self._f_name)
+        if dst_dir:
+            os.makedirs(dst_dir, exist_ok=True)
+
+        src = sqlite3.connect(self._db_path)
+        dst = sqlite3.connect(self._f_name)
+        try:
+            src.backup(dst, pages=self._pages,
+                       progress=self._progress, sleep=0.)
+        finally:
+            dst.close()
+            src.close()
+
+    def _gzip(self) -> None:
+        with open(self._f_name, 'rb') as f_in, \
+                gzip.open(self._f_name + '.gz', 'wb', compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, self._CHUNK)
+        os.remove(self._f_name)
+
+    def _rotate(self) -> None:
+        """ Remove the oldest backups of the database exceeding the number of
+            backups to keep. File names are timestamped, hence sortable.
+        """
+        if (self._keep <= 0) or (not os.path.isdir(self._bk_dir)):
+            return
+
+        suffixes = (self._ext, self._ext + '.gz')
+        files = sorted(
+            f for f in os.listdir(self._bk_dir)
+            if f.startswith(self._name + '_') and f.endswith(suffixes)
+        )
+        for f in files[:-self._keep]:
+            os.remove(os.path.join(self._bk_dir, f))
+
+    def run(self) -> None:
+        logger = get_logger_glob()
+        try:
+            self._backup()
+            if self._compress:
+                self._gzip()
+            self._rotate()
+        except (sqlite3.Error, OSError) as ex:
+            self._error = ex
+            Ut.print_exc(Ex.DatabaseError(f'BackupEngine(): {ex}'))
+            logger.error(f'BackupEngine(): backup of {self._db_path} failed {ex}')
+            if threading.current_thread() is not self:
+                raise ex
+        else:
+            logger.info(f'BackupEngine(): database backup\'d in {self.f_name}')
+            if self._verbose:
+                print(f"Database backup'd in: {self.f_name}")
@@ -4,7 +4,11 @@
 
 import os
 import atexit
-from typing import (Iterable, Optional)
+from concurrent.futures import Future
+from contextlib import contextmanager
+import queue
+import threading
+from typing import (Generator, Iterable, Optional)
 
 import nfpy.IO.Utilities as Ut
 from nfpy.Tools import (
@@ -14,21 +18,170 @@ from nfpy.Tools import (
     get_logger_glob
 )
 
+from .Backup import BackupEngine
 from .DBTypes import *
 
 MIN_DB_VERSION = 1.11
 
+# Performance pragmas applied on connection. The tuple contains the name of
+# the configuration parameter and the set of allowed values, None for integers.
+_PRAGMA_PROFILE = {
+    'journal_mode': ('db_journal_mode', {'DELETE', 'TRUNCATE', 'PERSIST',
+                                         'MEMORY', 'WAL', 'OFF'}),
+    'synchronous': ('db_synchronous', {'OFF', 'NORMAL', 'FULL', 'EXTRA'}),
+    'temp_store': ('db_temp_store', {'DEFAULT', 'FILE', 'MEMORY'}),
+    'mmap_size': ('db_mmap_size', None),
+    'cache_size': ('db_cache_size', None),
+    'busy_timeout': ('db_busy_timeout', None),
+}
+
+# Pragmas overridden during bulk loads
+_PRAGMA_BULK_PROFILE = {
+    'synchronous': ('db_bulk_synchronous', {'OFF', 'NORMAL', 'FULL', 'EXTRA'}),
+    'cache_size': ('db_bulk_cache_size', None),
+}
+
+
+class DBWriter(threading.Thread):
+    """ Thread owning the only writing connection to the database. Batches of
+        writes are submitted to a queue and executed in order, each batch in
+        its own savepoint so that it is applied atomically. A commit is issued
+        each time the queue is drained, the futures of the pending batches are
+        resolved only after their commit. Errors are set on the futures of
+        the affected batches and never stop the thread.
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__(name='nfpyDBWriter', daemon=True)
+        self._db_path = db_path
+        self._q = queue.Queue()
+        self._conn = None
+
+    def run(self) -> None:
+        conn = None
+        pending = []
+
+        while True:
+            item = self._q.get()
+            if item is None:
+                self._q.task_done()
+                break
+
+            ops, fut = item
+            try:
+                if conn is None:
+                    conn = get_db_connection(self._db_path)
+                    self._conn = conn
+                if self._apply(conn, ops, fut):
+                    pending.append(fut)
+            except Exception as ex:
+                # Failure outside of the statements of the batch, the open
+                # transaction is abandoned together with the pending batches.
+                # The thread is kept alive to serve the next batches.
+                Ut.print_exc(Ex.DatabaseError(str(ex)))
+                if not fut.done():
+                    fut.set_exception(ex)
+                self._abort(conn, pending, ex)
+                pending = []
+
+            if self._q.empty() and (conn is not None):
+                self._commit(conn, pending)
+                pending = []
+            self._q.task_done()
+
+        if conn is not None:
+            self._commit(conn, pending)
+            conn.close()
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection,
+               ops: list[tuple[str, tuple, bool]], fut: Future) -> bool:
+        """ Execute a batch in its own savepoint. If a statement fails the
+            batch is rolled back and the exception is set on its future.
+            Returns True if the batch has been applied.
+        """
+        if not conn.in_transaction:
+            conn.execute('BEGIN;')
+        conn.execute('SAVEPOINT [nfpy_write];')
+        try:
+            for q, p, many in ops:
+                if many:
+                    conn.executemany(q, p)
+                else:
+                    conn.execute(q, p)
+        except sqlite3.Error as ex:
+            msg = f'{ex}\n{q}\n{repr(p)}'
+            Ut.print_exc(Ex.DatabaseError(msg))
+            fut.set_exception(ex)
+            conn.execute('ROLLBACK TO [nfpy_write];')
+            conn.execute('RELEASE [nfpy_write];')
+            return False
+
+        conn.execute('RELEASE [nfpy_write];')
+        return True
+
+    @staticmethod
+    def _abort(conn: Optional[sqlite3.Connection], pending: list,
+               ex: Exception) -> None:
+        """ Roll back the open transaction and fail the pending batches. """
+        if (conn is not None) and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+        for fut in pending:
+            fut.set_exception(ex)
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, pending: list) -> None:
+        try:
+            conn.commit()
+        except sqlite3.Error as ex:
+            DBWriter._abort(conn, pending, ex)
+        else:
+            for fut in pending:
+                fut.set_result(None)
+
+    def submit(self, ops: Iterable[tuple[str, Iterable, bool]]) -> Future:
+        fut = Future()
+        self._q.put(([(q, tuple(p), many) for q, p, many in ops], fut))
+        return fut
+
+    def flush(self) -> None:
+        """ Wait for all the submitted writes to be committed. """
+        self._q.join()
+
+    def close(self) -> None:
+        self._q.put(None)
+        self.join()
+
 
 class DBHandler(metaclass=Singleton):
-    """ Base class for DB connection. """
+    """ Base class for DB connection. The thread creating the handler owns the
+        main connection, any other thread gets its own connection on first
+        use. Connections of threads that have exited are closed whenever a
+        new thread connection is opened. After a fork the child process drops
+        the inherited connections and opens new ones lazily on first use.
+        Writes may be funneled through a single writer thread using
+        DBHandler.write() and DBHandler.write_batch().
+    """
 
     def __init__(self, db_path: str):
         self._db_path = str(db_path)
         self._conn = None
+        self._owner = None
+        self._local = threading.local()
+        self._thread_conns = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        self._orphans = []
         self._is_connected = False
         self._db_version = None
         self._create_connection()
 
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
     def __bool__(self):
         return self._is_connected
 
@@ -54,7 +207,26 @@ class DBHandler(metaclass=Singleton):
 
     @property
     def connection(self) -> sqlite3.Connection:
-        return self._conn
+        """ Return the connection for the calling thread. """
+        ident = threading.get_ident()
+        if ident == self._owner:
+            if self._conn is None:
+                # Reconnection after a fork
+                self._conn = get_db_connection(self._db_path)
+            return self._conn
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = get_db_connection(self._db_path)
+            self._local.conn = conn
+            with self._lock:
+                self._prune_thread_conns()
+                # The ident of an exited thread may be reused
+                old = self._thread_conns.pop(ident, None)
+                if old is not None:
+                    old.close()
+                self._thread_conns[ident] = conn
+        return conn
 
     @connection.deleter
     def connection(self) -> None:
@@ -93,19 +265,111 @@ class DBHandler(metaclass=Singleton):
         return c
 
     def commit(self) -> None:
+        conn = self.connection
         try:
-            self._conn.commit()
+            conn.commit()
         except sqlite3.Error as ex:
-            self._conn.rollback()
+            conn.rollback()
             raise ex
 
     def rollback(self) -> None:
-        self._conn.rollback()
+        self.connection.rollback()
+
+    def write(self, q: str, p: Iterable = (), many: bool = False) -> Future:
+        """ Submit a write to the single writer thread. The returned future
+            is resolved once the write has been committed.
+
+            Input:
+                q [str]: query to execute
+                p [Iterable]: query parameters (default: ())
+                many [bool]: if True use executemany (default: False)
+
+            Output:
+                fut [Future]: future resolved after the commit
+        """
+        return self.write_batch([(q, p, many)])
+
+    def write_batch(self, ops: Iterable[tuple[str, Iterable, bool]]) -> Future:
+        """ Submit to the single writer thread several writes to be applied
+            atomically. If any write fails none of them is applied.
+
+            Input:
+                ops [Iterable[tuple[str, Iterable, bool]]]: sequence of
+                    <query, parameters, many> where <many> is True to use
+                    executemany
+
+            Output:
+                fut [Future]: future resolved after the commit
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = DBWriter(self._db_path)
+                self._writer.start()
+        return self._writer.submit(ops)
+
+    def flush(self) -> None:
+        """ Wait for all writes submitted to the writer thread. """
+        if self._writer is not None:
+            self._writer.flush()
+
+    @contextmanager
+    def bulk_load(self) -> Generator[sqlite3.Connection, None, None]:
+        """ Context manager for large writes on the calling thread connection.
+            The bulk profile pragmas from the configuration are applied, the
+            whole block is executed in a single transaction, opened here if
+            none is already open, and the normal profile is restored on exit.
+        """
+        conn = self.connection
+        normal = {
+            k: conn.execute(f'PRAGMA {k};').fetchone()[0]
+            for k in _PRAGMA_BULK_PROFILE
+        }
+
+        _apply_pragmas(conn, _PRAGMA_BULK_PROFILE)
+        try:
+            if not conn.in_transaction:
+                conn.execute('BEGIN;')
+            yield conn
+        except Exception as ex:
+            conn.rollback()
+            raise ex
+        else:
+            conn.commit()
+        finally:
+            for k, v in normal.items():
+                conn.execute(f'PRAGMA {k} = {v};')
+
+    def _prune_thread_conns(self) -> None:
+        """ Close the connections of the threads that have exited. Must be
+            called holding the lock.
+        """
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._thread_conns if i not in alive]:
+            self._thread_conns.pop(ident).close()
+
+    def _after_fork(self) -> None:
+        """ Drop the connections inherited from the parent process. These
+            must not be used nor closed by the child, hence they are kept
+            alive in a holder that is never closed as garbage collecting them
+            would close the handles shared with the parent. The forking thread
+            becomes the owner and reconnects on first use.
+        """
+        self._orphans.append(
+            (self._conn, self._local, self._thread_conns, self._writer)
+        )
+        self._local = threading.local()
+        self._thread_conns = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        if self._is_connected:
+            self._conn = None
+            self._owner = threading.get_ident()
 
     def _create_connection(self) -> None:
         """ Creates the DB connection """
         logger = get_logger_glob()
         self._conn = get_db_connection(self.db_path)
+        self._owner = threading.get_ident()
 
         # Sanity check on the database version
         q = "select [value] from SystemInfo where [field] = 'DBVersion'"
@@ -122,6 +386,21 @@ class DBHandler(metaclass=Singleton):
     def _close_connection(self) -> None:
         """ Close the DB connection """
         if self._is_connected:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+            with self._lock:
+                for conn in self._thread_conns.values():
+                    conn.close()
+                self._thread_conns = {}
+                self._local = threading.local()
+
+            if self._conn is None:
+                # Forked child that never reconnected
+                self._is_connected = False
+                return
+
             try:
                 # call for the optimization of the indexes
                 self.cursor.execute('PRAGMA optimize;')
@@ -135,36 +414,65 @@ class DBHandler(metaclass=Singleton):
                 self._conn = None
                 self._is_connected = False
 
-    def backup(self, f_name: Optional[str] = None) -> None:
-        """ Backup the connected database into the destination. """
-        # Create new backup filename
-        path, file = os.path.split(self._db_path)
-        if f_name is None:
-            name, ext = os.path.splitext(file)
-            new_file = os.path.join(
-                get_conf_glob().backup_folder,
-                ''.join([name, f"_{datetime.today().strftime('%Y%m%d_%H%M%S')}", ext])
-            )
+    def backup(self, f_name: Optional[str] = None, background: bool = False,
+               **kwargs) -> BackupEngine:
+        """ Online backup of the connected database into the destination. See
+            BackupEngine for the additional keyword arguments.
+
+            Input:
+                f_name [str]: destination file (default: None)
+                background [bool]: if True run the backup in a background
+                    thread, BackupEngine.join() waits for completion
+                    (default: False)
+
+            Output:
+                engine [BackupEngine]: the backup engine
+        """
+        engine = BackupEngine(self._db_path, f_name, **kwargs)
+        if background:
+            engine.start()
         else:
-            new_file = f_name
+            engine.run()
+        return engine
 
-        # Visualize progress
-        def progress(status, remaining, total):
-            print(f'Copied {total - remaining} of {total} pages...')
 
-        try:
-            bck = sqlite3.connect(new_file)
-            self._conn.backup(bck, pages=1, progress=progress)
-            bck.close()
-        except sqlite3.Error as ex:
-            Ut.print_exc(ex)
-            raise ex
+def _apply_pragmas(conn: sqlite3.Connection, profile: dict) -> None:
+    """ Apply the pragmas in the profile taking the values from the
+        configuration. Pragmas not configured are left to the SQLite default.
 
-        print(f"Database backup'd in: {new_file}")
+        Errors:
+            ConfigurationError: if a value is not valid for the pragma
+    """
+    conf = get_conf_glob()
+    for pragma, (param, allowed) in profile.items():
+        v = conf[param]
+        if (v is None) or (v == ''):
+            continue
+
+        if allowed is None:
+            try:
+                v = int(v)
+            except ValueError:
+                raise Ex.ConfigurationError(
+                    f'get_db_connection(): {param} = {v} is not an integer'
+                )
+        else:
+            v = str(v).upper()
+            if v not in allowed:
+                raise Ex.ConfigurationError(
+                    f'get_db_connection(): {param} = {v} not in {allowed}'
+                )
+
+        conn.execute(f'PRAGMA {pragma} = {v};')
 
 
 def get_db_connection(path: str) -> sqlite3.Connection:
-    return sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    """ Open a new connection to the database and apply the performance
+        profile defined in the configuration.
+    """
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    _apply_pragmas(conn, _PRAGMA_PROFILE)
+    return conn
 
 
 def get_db_glob(db_path: Optional[str] = None) -> DBHandler:
@@ -179,41 +487,24 @@ def get_db_glob(db_path: Optional[str] = None) -> DBHandler:
 
 def backup_db(db_path: Optional[str] = None,
               f_name: Optional[str] = None) -> None:
-    from shutil import copyfile
-
-    conf = get_conf_glob()
-    if not db_path:
-        db_path = conf.db_path
-    else:
-        if not isinstance(db_path, str):
-            raise Ex.DatabaseError("Not a valid database name")
-
-    path, file = os.path.split(db_path)
-    bk_dir = conf.backup_folder
-
-    if f_name is None:
-        name, ext = os.path.splitext(file)
-        new_file = os.path.join(
-            bk_dir,
-            ''.join([name, f"_{datetime.today().strftime('%Y%m%d_%H%M%S')}", ext])
-        )
-    else:
-        new_file = f_name
-
-    if not os.path.exists(bk_dir):
-        try:
-            os.makedirs(bk_dir)
-        except OSError as ex:
-            print(f'Creation of the directory {bk_dir} failed')
-            raise ex
-
-    try:
-        copyfile(db_path, new_file)
-    except OSError as ex:
-        print(f'Backup of  {new_file} failed')
-        raise ex
-    else:
-        print(f"Database backup'd in: {new_file}")
+    """ Backup of the database through the SQLite online backup API. Unlike
+        a plain file copy, the backup includes the pages committed to the
+        write-ahead log and is consistent even if taken during a checkpoint.
+        See BackupEngine for the configuration of compression and rotation.
+
+        Input:
+            db_path [str]: path of the database (default: configured database)
+            f_name [str]: destination file (default: timestamped file in the
+                backup folder)
+
+        Exceptions:
+            DatabaseError: if the database name is not valid
+            sqlite3.Error, OSError: if the backup fails
+    """
+    if db_path and not isinstance(db_path, str):
+        raise Ex.DatabaseError("Not a valid database name")
+
+    BackupEngine(db_path, f_name).run()
 
 
 # register the connection closing.
@@ -0,0 +1,287 @@
+#
+# Time series cache
+# Memory-mapped on-disk cache of the time series tables
+#
+
+import hashlib
+import numpy as np
+import os
+import pandas as pd
+import sqlite3
+from typing import (Optional, TypeVar)
+
+from nfpy.Tools import (Singleton, get_conf_glob, get_logger_glob)
+
+from .DB import (get_db_connection, get_db_glob)
+
+# Record layout of the cached files
+_TS_DTYPE = np.dtype([('date', 'datetime64[ns]'), ('value', 'f8')])
+
+
+class TSCache(metaclass=Singleton):
+    """ Persistent columnar cache placed in front of the time series tables.
+        Each <table, uid, dtype> series is stored as a single .npy file of
+        <date, value> records that is memory-mapped on read. Every write to a
+        cached table bumps, through a trigger, the version of the written
+        series in the TSCacheVersion table. The version is part of the name of
+        the cached file, hence validating a series is a single primary key
+        lookup and any insert, update or delete makes the cache stale.
+        The triggers are installed on all the time series tables when the
+        cache is created. Writes made while the triggers are missing, for
+        instance after a table has been rebuilt, cannot be tracked: the
+        cached series of a table found without triggers are dropped and the
+        triggers reinstalled. Files are kept in a folder per database.
+        The triggers change the schema of the database and add a version
+        upsert to each written row. When the cache is disabled they are
+        dropped on creation of the cache object, the TSCacheVersion table is
+        kept and the cache is rebuilt once enabled again.
+    """
+
+    _Q_VERSION_TABLE = """CREATE TABLE IF NOT EXISTS [TSCacheVersion] (
+    [tbl] TEXT NOT NULL, [uid] TEXT NOT NULL, [dtype] INTEGER NOT NULL,
+    [version] INTEGER NOT NULL, PRIMARY KEY ([tbl], [uid], [dtype])
+    ) WITHOUT ROWID;"""
+    _Q_TRIGGER = """CREATE TRIGGER IF NOT EXISTS [{table}_tscache_{op}]
+    AFTER {op} ON [{table}] BEGIN
+    INSERT INTO [TSCacheVersion] VALUES ('{table}', {row}.[uid], {row}.[dtype], 1)
+    ON CONFLICT ([tbl], [uid], [dtype]) DO UPDATE SET [version] = [version] + 1;
+    END;"""
+    _Q_ALL_TRIGGERS = """SELECT [name] FROM [sqlite_master]
+    WHERE [type] = 'trigger' AND [name] GLOB '*_tscache_*'"""
+    _Q_DROP_TRIGGER = """DROP TRIGGER IF EXISTS [{}];"""
+    _Q_TS_TABLES = """SELECT [m].[name] FROM [sqlite_master] AS [m]
+    WHERE [m].[type] = 'table' AND [m].[name] GLOB '*TS' AND EXISTS (
+    SELECT 1 FROM pragma_table_info([m].[name]) WHERE [name] = 'dtype')"""
+    _Q_TRIGGERS = """SELECT COUNT(*) FROM [sqlite_master]
+    WHERE [type] = 'trigger' AND [tbl_name] = ? AND [name] IN (?, ?, ?)"""
+    _Q_STAMP = """SELECT [version] FROM [TSCacheVersion]
+    WHERE [tbl] = ? AND [uid] = ? AND [dtype] = ?"""
+    _Q_SERIES = """SELECT [date], [value] FROM [{}]
+    WHERE [uid] = ? AND [dtype] = ? ORDER BY [date]"""
+
+    def __init__(self):
+        conf = get_conf_glob()
+        self._db = get_db_glob()
+        path = conf['ts_cache_path']
+        self._path = os.path.expanduser(path) if path else None
+        self._is_active = bool(conf['ts_cache']) and bool(self._path)
+
+        if self._is_active:
+            # Databases with equal versions must not share the cached files
+            db_id = hashlib.blake2b(
+                os.path.realpath(self._db.db_path).encode(), digest_size=8
+            ).hexdigest()
+            self._path = os.path.join(self._path, db_id)
+            self._track_all()
+        else:
+            self._untrack_all()
+
+    def __bool__(self) -> bool:
+        return self._is_active
+
+    __nonzero__ = __bool__
+
+    @property
+    def path(self) -> Optional[str]:
+        return self._path
+
+    def _file(self, table: str, uid: str, dtype: int, version: int) -> str:
+        return os.path.join(self._path, table, f'{uid}_{dtype}_v{version}.npy')
+
+    @staticmethod
+    def _triggers(table: str) -> tuple[str, ...]:
+        return tuple(f'{table}_tscache_{op}'
+                     for op in ('INSERT', 'UPDATE', 'DELETE'))
+
+    def _is_tracked(self, table: str) -> bool:
+        """ Check whether all the version triggers exist on the table. """
+        res = self._db.execute(
+            self._Q_TRIGGERS, (table, *self._triggers(table))
+        ).fetchone()
+        return res[0] == 3
+
+    def _install(self, tables: list[str]) -> None:
+        """ Create the triggers maintaining the versions of the series of the
+            tables. A dedicated connection is used to never commit a
+            transaction open on the shared connection.
+        """
+        conn = get_db_connection(self._db.db_path)
+        try:
+            conn.execute(self._Q_VERSION_TABLE)
+            for table in tables:
+                for op in ('INSERT', 'UPDATE', 'DELETE'):
+                    row = 'OLD' if op == 'DELETE' else 'NEW'
+                    conn.execute(
+                        self._Q_TRIGGER.format(table=table, op=op, row=row)
+                    )
+            conn.commit()
+        except sqlite3.Error as ex:
+            conn.rollback()
+            raise ex
+        finally:
+            conn.close()
+
+    def _track(self, table: str) -> bool:
+        """ Make sure the table is tracked. If the triggers are missing the
+            cached series of the table may be stale and are removed.
+
+            Output:
+                res [bool]: True if the cache can be used for the table
+        """
+        if self._is_tracked(table):
+            return True
+
+        try:
+            self._install([table])
+        except sqlite3.Error as ex:
+            get_logger_glob().warning(f'TSCache(): cannot track {table} {ex}')
+            return False
+
+        self.invalidate(table)
+        return True
+
+    def _track_all(self) -> None:
+        """ Track all the time series tables in the database. """
+        tables = [r[0] for r in self._db.execute(self._Q_TS_TABLES).fetchall()]
+        untracked = [t for t in tables if not self._is_tracked(t)]
+        if not untracked:
+            return
+
+        try:
+            self._install(untracked)
+        except sqlite3.Error as ex:
+            get_logger_glob().warning(f'TSCache(): cannot track tables {ex}')
+            return
+
+        for table in untracked:
+            self.invalidate(table)
+
+    def _untrack_all(self) -> None:
+        """ Drop the version triggers from all the tables. A dedicated
+            connection is used to never commit a transaction open on the
+            shared connection.
+        """
+        triggers = [
+            r[0] for r in self._db.execute(self._Q_ALL_TRIGGERS).fetchall()
+        ]
+        if not triggers:
+            return
+
+        conn = get_db_connection(self._db.db_path)
+        try:
+            for name in triggers:
+                conn.execute(self._Q_DROP_TRIGGER.format(name))
+            conn.commit()
+        except sqlite3.Error as ex:
+            conn.rollback()
+            get_logger_glob().warning(f'TSCache(): cannot untrack tables {ex}')
+        finally:
+            conn.close()
+
+    def _version(self, table: str, uid: str, dtype: int) -> int:
+        """ Return the current version of the series in the database. Series
+            not written since the triggers were created have version 0.
+        """
+        res = self._db.execute(self._Q_STAMP, (table, uid, dtype)).fetchone()
+        return 0 if res is None else int(res[0])
+
+    def _fetch(self, table: str, uid: str, dtype: int) -> np.ndarray:
+        """ Load the full series from the database. """
+        df = pd.read_sql_query(
+            self._Q_SERIES.format(table),
+            self._db.connection,
+            params=(uid, dtype),
+            parse_dates=['date']
+        )
+        arr = np.empty(len(df), dtype=_TS_DTYPE)
+        arr['date'] = df['date'].to_numpy(dtype='datetime64[ns]')
+        arr['value'] = df['value'].to_numpy(dtype=float)
+        return arr
+
+    def _write(self, table: str, uid: str, dtype: int, version: int,
+               arr: np.ndarray) -> None:
+        """ Write the records atomically to avoid partial files being read by
+            concurrent processes. Older versions of the series are removed.
+        """
+        f_name = self._file(table, uid, dtype, version)
+        folder = os.path.dirname(f_name)
+        os.makedirs(folder, exist_ok=True)
+
+        tmp = f'{f_name}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, arr, allow_pickle=False)
+        os.replace(tmp, f_name)
+
+        prefix = f'{uid}_{dtype}_v'
+        for f in os.listdir(folder):
+            if f.startswith(prefix) and f.endswith('.npy') and \
+                    (os.path.join(folder, f) != f_name):
+                try:
+                    os.remove(os.path.join(folder, f))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, table: str, uid: str, dtype: int) -> np.ndarray:
+        """ Return the records of the full series, from the cache if valid or
+            from the database otherwise, updating the cache.
+
+            Input:
+                table [str]: time series table
+                uid [str]: uid of the series
+                dtype [int]: datatype code of the series
+
+            Output:
+                res [np.ndarray]: read-only array of <date, value> records
+        """
+        if not self._track(table):
+            return self._fetch(table, uid, dtype)
+
+        # The version is read before the data, a concurrent write can only
+        # make the cached file stale, never a stale file look valid
+        version = self._version(table, uid, dtype)
+        f_name = self._file(table, uid, dtype, version)
+
+        if os.path.isfile(f_name):
+            try:
+                return np.load(f_name, mmap_mode='r', allow_pickle=False)
+            except (OSError, ValueError) as ex:
+                get_logger_glob().warning(f'TSCache(): {f_name} unreadable {ex}')
+
+        # Uncommitted writes of an open transaction are visible to the shared
+        # connection and may be rolled back, the version would be reused
+        arr = self._fetch(table, uid, dtype)
+        if not self._db.connection.in_transaction:
+            self._write(table, uid, dtype, version, arr)
+        return arr
+
+    def invalidate(self, table: str, uid: Optional[str] = None,
+                   dtype: Optional[int] = None) -> None:
+        """ Remove cached series. If <uid> is not given all series in the table
+            are removed, if <dtype> is not given all datatypes of the uid are.
+        """
+        folder = os.path.join(self._path, table)
+        if not os.path.isdir(folder):
+            return
+
+        for f in os.listdir(folder):
+            name, ext = os.path.splitext(f)
+            if ext != '.npy':
+                continue
+
+            try:
+                f_uid, f_dtype, _ = name.rsplit('_', 2)
+            except ValueError:
+                continue
+            if (uid is not None) and (f_uid != uid):
+                continue
+            if (dtype is not None) and (int(f_dtype) != dtype):
+                continue
+            os.remove(os.path.join(folder, f))
+
+
+def get_tscache_glob() -> TSCache:
+    """ Returns the pointer to the global TSCache """
+    return TSCache()
+
+
+TyTSCache = TypeVar('TyTSCache', bound=TSCache)
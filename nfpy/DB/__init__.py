@@ -5,12 +5,16 @@
 # logger.setLevel(get_conf_glob().log_level)
 #
 
+from .Backup import BackupEngine
 from .DB import (get_db_glob, get_db_connection, backup_db, MIN_DB_VERSION)
 from .DBTypes import SQLITE2PY_CONVERSION
 from .QueryBuilder import get_qb_glob
 from .TableFiddler import TableFiddler
+from .TSCache import (get_tscache_glob, TyTSCache)
 
 __all__ = [
-    'backup_db', 'get_db_connection', 'get_db_glob', 'get_qb_glob',
+    'backup_db', 'BackupEngine', 'get_db_connection', 'get_db_glob',
+    'get_qb_glob',
+    'get_tscache_glob', 'TyTSCache',
     'SQLITE2PY_CONVERSION', 'TableFiddler', 'MIN_DB_VERSION'
 ]
@@ -18,6 +18,8 @@ import nfpy.DB as DB
 from nfpy.DatatypeFactory import get_dt_glob
 from nfpy.Tools import (Exceptions as Ex, get_conf_glob, Utilities as Ut)
 
+from .Sessions import get_session_glob
+
 
 # Tuple to define parameters
 DwnParameter = namedtuple('DwnParameter', ['code', 'mandatory', 'default'])
@@ -25,7 +27,8 @@ DwnParameter = namedtuple('DwnParameter', ['code', 'mandatory', 'default'])
 
 class TLSAdapter(adapters.HTTPAdapter):
 
-    def init_poolmanager(self, connections, maxsize, block=False):
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
         """Create and initialize the urllib3 PoolManager."""
         # ctx = ssl.create_default_context()
         ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
@@ -36,7 +39,8 @@ class TLSAdapter(adapters.HTTPAdapter):
                 maxsize=maxsize,
                 block=block,
                 ssl_version=ssl.PROTOCOL_TLS,
-                ssl_context=ctx
+                ssl_context=ctx,
+                **pool_kwargs
         )
 
 
@@ -49,6 +53,7 @@ class BasePage(metaclass=ABCMeta):
 
     _PARAMS = {}
     _PROVIDER = ''
+    _ADAPTER = adapters.HTTPAdapter
     _PAGE = ''
     _TABLE = ''
     _COLUMNS = {}
@@ -74,7 +79,6 @@ class BasePage(metaclass=ABCMeta):
         self._p = []
         self._robj = []
         self._res = None
-        self._jar = None
         self._fname = None
 
         self._is_initialized = False
@@ -249,17 +253,16 @@ class BasePage(metaclass=ABCMeta):
         if not self._is_initialized:
             raise RuntimeError("BaseDownloader(): The object must be initialized first")
 
-        session = requests.Session()
-        self._mount(session)
-
-        if self._jar:
-            session.cookies = self._jar
+        session, auth = get_session_glob().get(
+            self._PROVIDER, self._ADAPTER, self._handshake
+        )
 
-        headers = self._HEADER
+        headers = dict(self._HEADER)
         headers['User-Agent'] = self.user_agent
 
         # Run through the list of parameters for each call
         for param_set in self._p:
+            param_set = self._auth_params(param_set, auth)
 
             # Make the call
             if self.req_method == 'get':
@@ -271,16 +274,26 @@ class BasePage(metaclass=ABCMeta):
 
             if r.status_code == 200:
                 r.encoding = self._ENCODING
-                self._jar = r.cookies
                 self._robj.append(r)
             else:
+                if r.status_code in (401, 403):
+                    # Expired authentication, redo the handshake next time
+                    get_session_glob().reset(self._PROVIDER, session)
                 msg = f"{self.__class__.__name__}(): Error in downloading {self._PROVIDER}|{self.ticker}: " \
                       f"[{r.status_code}] {r.reason}"
                 raise requests.HTTPError(msg)
 
-    def _mount(self, session) -> None:
-        """ To apply a custom SSL context to the call. """
-        pass
+    def _handshake(self, session: requests.Session) -> dict:
+        """ Authentication run once per provider session, e.g. to obtain
+            cookies or tokens. The returned data are passed to
+            BasePage._auth_params() for each call. Return an empty dictionary
+            if the authentication failed.
+        """
+        return {}
+
+    def _auth_params(self, params: dict, auth: dict) -> dict:
+        """ Add the authentication data to the call parameters. """
+        return params
 
     def _write_to_file(self, fname: str | None = None) -> None:
         """ Write to a text file. """
@@ -304,36 +317,26 @@ class BasePage(metaclass=ABCMeta):
         # We make the use of UPSERT optional field
         if self.use_upsert:
             # Update/Insert new data
-            self._db.executemany(
-                self._qb.upsert(
-                    self._TABLE,
-                    fields=fields_all
-                ),
-                data_all,
-                commit=True
-            )
+            ops = [(
+                self._qb.upsert(self._TABLE, fields=fields_all),
+                data_all, True
+            )]
         else:
-            # Delete old data
+            # Delete old data and insert new data
             keys = [k for k in self._qb.get_keys(self._TABLE)]
-            self._db.executemany(
-                self._qb.delete(
-                    self._TABLE,
-                    fields=keys
+            ops = [
+                (
+                    self._qb.delete(self._TABLE, fields=keys),
+                    self._res[keys].values.tolist(), True
                 ),
-                self._res[keys].values.tolist(),
-                commit=False
-            )
-
-            # Insert new data
-            self._db.executemany(
-                self._qb.merge(
-                    self._TABLE,
-                    ins_fields=fields_all
+                (
+                    self._qb.merge(self._TABLE, ins_fields=fields_all),
+                    data_all, True
                 ),
-                data_all,
-                commit=True
-            )
+            ]
 
+        # Writes go through the single writer thread, wait for the commit
+        self._db.write_batch(ops).result()
         self._is_saved = True
 
     def printout(self) -> None:
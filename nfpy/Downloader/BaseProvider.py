@@ -5,6 +5,7 @@
 
 from abc import (ABCMeta, abstractmethod)
 from enum import Enum
+import sqlite3
 
 import nfpy.Calendar as Cal
 from nfpy.DatatypeFactory import get_dt_glob
@@ -73,13 +74,23 @@ class Action(Enum):
 
 
 class BaseImportItem(metaclass=ABCMeta):
-    """ Base class for import items. """
+    """ Base class for import items. Items defining the _Q_BULK query can be
+        imported for many uids in a single set-based statement joining the
+        source table against the temporary ImportBatch table of <uid, ticker>.
+    """
 
     _MODE = 'RW'
     _Q_READ = ''
     _Q_WRITE = ''
     _Q_READWRITE = ''
     _Q_INCR = ''
+    _Q_BULK = ''
+    _Q_BULK_INCR = ''
+
+    _Q_BATCH_CREATE = """CREATE TEMP TABLE IF NOT EXISTS [ImportBatch]
+    ([uid] TEXT, [ticker] TEXT);"""
+    _Q_BATCH_CLEAR = "DELETE FROM temp.[ImportBatch];"
+    _Q_BATCH_INSERT = "INSERT INTO temp.[ImportBatch] VALUES (?, ?);"
 
     def __init__(self, item: dict, incr: bool):
         self._db = DB.get_db_glob()
@@ -104,7 +115,7 @@ class BaseImportItem(metaclass=ABCMeta):
             if self._incr:
                 qrw += self._Q_INCR
             qrw = qrw.format(**self._d) + ";"
-            self._db.execute(qrw, params, commit=True)
+            self._db.write(qrw, params).result()
 
         else:
             qr = self._Q_READ
@@ -116,8 +127,60 @@ class BaseImportItem(metaclass=ABCMeta):
             data_clean = self._clean_data(data)
 
             if len(data_clean) > 0:
-                self._db.executemany(
+                self._db.write(
                     self._Q_WRITE.format(**self._d),
                     data_clean,
-                    commit=True
-                )
+                    many=True
+                ).result()
+
+    def _import(self, conn: sqlite3.Connection) -> None:
+        """ Run the import on the given connection without committing. """
+        params = self._get_params()
+
+        if self._MODE == 'RW':
+            qrw = self._Q_READWRITE
+            if self._incr:
+                qrw += self._Q_INCR
+            conn.execute(qrw.format(**self._d) + ';', params)
+
+        else:
+            qr = self._Q_READ
+            if self._incr:
+                qr += self._Q_INCR
+            data = conn.execute(qr.format(**self._d) + ';', params).fetchall()
+            data_clean = self._clean_data(data)
+
+            if len(data_clean) > 0:
+                conn.executemany(self._Q_WRITE.format(**self._d), data_clean)
+
+    @classmethod
+    def run_batch(cls, conn: sqlite3.Connection, items: list[dict],
+                  incr: bool) -> None:
+        """ Import a batch of items, all having the same destination table, on
+            the given connection. No commit is issued so that the batch can be
+            part of a larger transaction.
+
+            Input:
+                conn [sqlite3.Connection]: connection to use
+                items [list[dict]]: import items data
+                incr [bool]: do an incremental import
+        """
+        if not items:
+            return
+
+        if (cls._MODE != 'RW') or (not cls._Q_BULK):
+            for item in items:
+                cls(item, incr)._import(conn)
+            return
+
+        conn.execute(cls._Q_BATCH_CREATE)
+        conn.execute(cls._Q_BATCH_CLEAR)
+        conn.executemany(
+            cls._Q_BATCH_INSERT,
+            ((d['uid'], d['ticker']) for d in items)
+        )
+
+        q = cls._Q_BULK
+        if incr:
+            q += cls._Q_BULK_INCR
+        conn.execute(q.format(dst_table=items[0]['dst_table']) + ';')
@@ -5,9 +5,11 @@
 #
 
 from collections import defaultdict
+from functools import partial
 from itertools import groupby
 from requests import RequestException
-from typing import (KeysView, Optional)
+import sqlite3
+from typing import (Any, Callable, KeysView, Optional)
 
 from nfpy.Assets import get_af_glob
 import nfpy.Calendar as Cal
@@ -22,6 +24,7 @@ from nfpy.Tools import (
 
 from .BaseProvider import get_provider
 from .Objs import *
+from .Scheduler import DownloadScheduler
 
 
 class DownloadFactory(metaclass=Singleton):
@@ -147,8 +150,8 @@ class DownloadFactory(metaclass=Singleton):
             )
         )
 
-    def do_import(self, data: NTImport, incremental: bool) -> None:
-        """ Take the importing object and runs the import. """
+    def _prepare_import(self, data: NTImport) -> tuple[type, dict]:
+        """ Return the import item class and the item data. """
         if data.item not in self._imp_obj[data.provider]:
             raise ValueError(f"Item {data.item} not available for {data.provider}")
 
@@ -163,9 +166,81 @@ class DownloadFactory(metaclass=Singleton):
         else:
             data['dst_table'] = asset.ts_table
 
+        return class_, data
+
+    def do_import(self, data: NTImport, incremental: bool) -> None:
+        """ Take the importing object and runs the import. """
+        class_, data = self._prepare_import(data)
         imp_item = class_(data, incremental)
         imp_item.run()
 
+    def _run_import_batch(self, import_list: tuple[NTImport],
+                          incremental: bool) -> None:
+        """ Import all the items in a single transaction. Items are grouped by
+            import item class and destination table and each group is imported
+            set-based whenever the item supports it. A failing group is rolled
+            back to its savepoint without affecting the others.
+        """
+        groups = defaultdict(list)
+        for element in import_list:
+            try:
+                class_, data = self._prepare_import(element)
+            except Ex.CalendarError as cal:
+                raise cal
+            except (Ex.MissingData, Ex.IsNoneError,
+                    RuntimeError, ValueError) as e:
+                Ut.print_exc(e)
+            else:
+                groups[(class_, data['dst_table'])].append(data)
+
+        with self._db.bulk_load() as conn:
+            for (class_, table), items in groups.items():
+                conn.execute('SAVEPOINT import_group;')
+                try:
+                    class_.run_batch(conn, items, incremental)
+                except (sqlite3.Error, Ex.MissingData, RuntimeError,
+                        ValueError) as e:
+                    conn.execute('ROLLBACK TO import_group;')
+                    msg = f'{class_.__module__}.{class_.__name__} -> {table}: {e}'
+                    Ut.print_exc(Ex.DatabaseError(msg))
+                finally:
+                    conn.execute('RELEASE import_group;')
+
+    @staticmethod
+    def _fetch_page(page: Any) -> None:
+        page.initialize(params={}) \
+            .fetch()
+
+    def _complete_download(self, d: NTDownload, page: Any, fetch: Callable,
+                           do_save: bool, today: Any) -> bool:
+        """ Complete the download of a page calling the fetch callable, parse
+            the results and save them. Return True if the download is done
+            and False if it failed.
+        """
+        logger = get_logger_glob()
+        try:
+            fetch()
+            _ = page.data
+
+        except (Ex.MissingData, Ex.IsNoneError, RuntimeError,
+                RequestException, ValueError, ConnectionError) as e:
+            Ut.print_exc(e)
+            logger.error(e)
+            return False
+        except RuntimeWarning as w:
+            Ut.print_wrn(w)
+            logger.warning(w)
+            data_upd = (today, d.provider, d.page, d.ticker)
+            self._db.write(self.q_upd, data_upd).result()
+        else:
+            if do_save is True:
+                page.save()
+                data_upd = (today, d.provider, d.page, d.ticker)
+                self._db.write(self.q_upd, data_upd).result()
+            else:
+                page.printout()
+        return True
+
     def run_download(
             self,
             do_save: bool = True,
@@ -173,7 +248,8 @@ class DownloadFactory(metaclass=Singleton):
             provider: str | None = None,
             page: str | None = None,
             ticker: str | None = None,
-            override_active: bool = False
+            override_active: bool = False,
+            workers: int = 1
     ) -> None:
         """ Performs a bulk update of the system based on the 'auto' flag in the
             Downloads table. The entries are updated only in case the last
@@ -186,6 +262,10 @@ class DownloadFactory(metaclass=Singleton):
                 page [str | None]: download for a page (default: None)
                 ticker [str | None]: download for a ticker (default: None)
                 override_active [bool]: disregard 'active' (default: False)
+                workers [int]: number of concurrent downloads. With more than
+                    one worker the pages are fetched concurrently within the
+                    limits in DownloadLimits, while parsing and saving are
+                    done sequentially (default: 1)
         """
         today = Cal.today(mode='date')
         active = not override_active
@@ -199,6 +279,7 @@ class DownloadFactory(metaclass=Singleton):
         count_done = 0
         count_skipped = 0
         count_failed = 0
+        tasks = {}
         for provider, group in groupby(upd_list, key=lambda v: v.provider):
             logger.log(20, f'Provider {provider}')
 
@@ -206,32 +287,30 @@ class DownloadFactory(metaclass=Singleton):
             skipped, generator = get_provider(provider)() \
                 .get_download_generator(group, override_date)
             count_skipped += skipped
-            for d, page in generator:
-                try:
-                    print(f'{d.ticker} -> {d.provider}[{d.page}]')
-                    page.initialize(params={}) \
-                        .fetch()
-                    _ = page.data
 
-                except (Ex.MissingData, Ex.IsNoneError, RuntimeError,
-                        RequestException, ValueError, ConnectionError) as e:
-                    Ut.print_exc(e)
-                    logger.error(e)
-                    count_failed += 1
-                except RuntimeWarning as w:
-                    Ut.print_wrn(w)
-                    logger.warning(w)
-                    data_upd = (today, d.provider, d.page, d.ticker)
-                    self._db.execute(self.q_upd, data_upd, commit=True)
+            if workers > 1:
+                tasks[provider] = [
+                    ((d, page), partial(self._fetch_page, page))
+                    for d, page in generator
+                ]
+                continue
+
+            for d, page in generator:
+                print(f'{d.ticker} -> {d.provider}[{d.page}]')
+                fetch = partial(self._fetch_page, page)
+                if self._complete_download(d, page, fetch, do_save, today):
                     count_done += 1
                 else:
-                    if do_save is True:
-                        page.save()
-                        data_upd = (today, d.provider, d.page, d.ticker)
-                        self._db.execute(self.q_upd, data_upd, commit=True)
-                    else:
-                        page.printout()
+                    count_failed += 1
+
+        if tasks:
+            scheduler = DownloadScheduler(workers)
+            for (d, page), fut in scheduler.run(tasks):
+                print(f'{d.ticker} -> {d.provider}[{d.page}]')
+                if self._complete_download(d, page, fut.result, do_save, today):
                     count_done += 1
+                else:
+                    count_failed += 1
 
         msg = f'Items downloaded: {count_done:>4}\n' \
             f'\tItems skipped:    {count_skipped:>4}\n' \
@@ -239,16 +318,16 @@ class DownloadFactory(metaclass=Singleton):
         print(msg)
         logger.log(20, msg)
 
-        self._db.execute(
+        self._db.write(
             'UPDATE [SystemInfo] SET [date] = ? WHERE [field] = "lastDownload";',
-            (today,), commit=True
-        )
+            (today,)
+        ).result()
         logger.log(20, 'Download completed')
 
     def run_import(self, uid: Optional[str] = None,
                    provider: Optional[str] = None,
                    item: Optional[str] = None, override_active: bool = False,
-                   incremental: bool = False) -> None:
+                   incremental: bool = False, batch: bool = False) -> None:
         """ Performs a bulk import of the system based on the 'auto' flag in the
             Imports table.
 
@@ -258,6 +337,8 @@ class DownloadFactory(metaclass=Singleton):
                 item [Optional[str]]: import for the item (default: None)
                 override_active [bool]: disregard 'active' (default: False)
                 incremental [bool]: do an incremental import (default: False)
+                batch [bool]: import set-based in a single transaction
+                    (default: False)
         """
         active = not override_active
         import_list = self.fetch_imports(
@@ -267,19 +348,25 @@ class DownloadFactory(metaclass=Singleton):
         logger = get_logger_glob()
         logger.log(20, f'We are about to import {len(import_list)} items')
 
-        for element in import_list:
-            try:
-                self.do_import(element, incremental)
-            except Ex.CalendarError as cal:
-                raise cal
-            except (Ex.MissingData, Ex.IsNoneError,
-                    RuntimeError, ValueError, RequestException) as e:
-                Ut.print_exc(e)
+        # Install or drop the cache triggers as configured before writing
+        DB.get_tscache_glob()
 
-        self._db.execute(
+        if batch:
+            self._run_import_batch(import_list, incremental)
+        else:
+            for element in import_list:
+                try:
+                    self.do_import(element, incremental)
+                except Ex.CalendarError as cal:
+                    raise cal
+                except (Ex.MissingData, Ex.IsNoneError,
+                        RuntimeError, ValueError, RequestException) as e:
+                    Ut.print_exc(e)
+
+        self._db.write(
             'UPDATE [SystemInfo] SET [date] = ? WHERE [field] = "lastImport";',
-            (Cal.today(mode='date'),), commit=True
-        )
+            (Cal.today(mode='date'),)
+        ).result()
         logger.log(20, 'Import completed')
 
 
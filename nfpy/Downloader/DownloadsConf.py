@@ -1046,3 +1046,31 @@ BorsaItalianaDividendsConf = [
 FREDSeriesConf = [
     'realtime_start', 'realtime_end', 'date', 'value'
 ]
+
+
+#
+# Download limits
+#
+
+# Concurrency cap and token-bucket rate limit per provider for concurrent
+# downloads. The <rate> is expressed in requests per second, the <burst> is
+# the capacity of the bucket.
+ProviderLimit = namedtuple('ProviderLimit', ['max_workers', 'rate', 'burst'])
+
+DownloadLimits = {
+    'BorsaItaliana': ProviderLimit(2, 1., 2),
+    'ECB': ProviderLimit(4, 4., 8),
+    'FRED': ProviderLimit(4, 2., 4),
+    'IB': ProviderLimit(1, 1., 1),
+    'Nasdaq': ProviderLimit(2, 1., 2),
+    'OECD': ProviderLimit(2, 1., 2),
+    'Yahoo': ProviderLimit(4, 2., 4),
+}
+
+DefaultDownloadLimit = ProviderLimit(2, 1., 2)
+
+# Pooled HTTP sessions: connections kept alive per provider, number of
+# retries and backoff factor in seconds
+SessionPoolSize = 10
+SessionRetries = 3
+SessionBackoff = .5
@@ -26,6 +26,11 @@ class ClosePricesItem(BaseImportItem):
     select '{uid}', 114, date, value from FREDSeries where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 114), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 114, s.date, s.value from FREDSeries as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 114), '1900-01-01')"""
 
 
 class AggregatesItem(BaseImportItem):
@@ -33,6 +38,11 @@ class AggregatesItem(BaseImportItem):
     select '{uid}', 114, date, value*1e6 from FREDSeries where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 114), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 114, s.date, s.value*1e6 from FREDSeries as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 114), '1900-01-01')"""
 
 
 class SeriesPage(BasePage):
@@ -4,6 +4,7 @@
 #
 
 import pandas.tseries.offsets as off
+import sqlite3
 
 from .BaseProvider import BaseImportItem
 from .DownloadsConf import (
@@ -37,7 +38,8 @@ class FinancialsItem(BaseImportItem):
         for tck, prov in zip(tck_list, self._PROVIDERS):
             yield tck, *prov
 
-    def run(self) -> None:
+    def _collect(self) -> list[tuple]:
+        """ Coalesce the data from all providers. """
         data_dict = {}
         uid = self._d['uid']
 
@@ -100,11 +102,20 @@ class FinancialsItem(BaseImportItem):
 
         # When all providers are done, we transform the dictionary into a tuple
         # for insertion in the database
-        data_clean = self._create_list(data_dict)
+        return self._create_list(data_dict)
+
+    def run(self) -> None:
+        data_clean = self._collect()
 
         if len(data_clean) > 0:
-            self._db.executemany(
+            self._db.write(
                 self._Q_WRITE.format(**self._d),
                 data_clean,
-                commit=True
-            )
+                many=True
+            ).result()
+
+    def _import(self, conn: sqlite3.Connection) -> None:
+        data_clean = self._collect()
+
+        if len(data_clean) > 0:
+            conn.executemany(self._Q_WRITE.format(**self._d), data_clean)
@@ -28,6 +28,11 @@ class ClosePricesItem(BaseImportItem):
     select '{uid}', 124, date, close from NasdaqPrices where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 124), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 124, s.date, s.close from NasdaqPrices as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 124), '1900-01-01')"""
 
 
 class DividendsItem(BaseImportItem):
@@ -35,6 +40,11 @@ class DividendsItem(BaseImportItem):
     select '{uid}', 611, date, amount from NasdaqDividends where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 611), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 611, s.date, s.amount from NasdaqDividends as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 611), '1900-01-01')"""
 
 
 class NasdaqBasePage(BasePage):
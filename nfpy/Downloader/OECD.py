@@ -63,6 +63,7 @@ class SeriesPage(BasePage):
 
     _ENCODING = "utf-8-sig"
     _PROVIDER = "OECD"
+    _ADAPTER = TLSAdapter
     _REQ_METHOD = 'get'
     _PAGE = 'Series'
     _COLUMNS = OECDSeriesConf
@@ -119,10 +120,6 @@ class SeriesPage(BasePage):
                     p[translate[ext_k]] = pd.to_datetime(ext_v).strftime('%Y-%m')
             self._p[0].update(p)
 
-    def _mount(self, session) -> None:
-        """ To apply a custom SSL context to the call. """
-        session.mount('https://', TLSAdapter())
-
     def _parse(self) -> None:
         """ Parse the fetched object. """
         j = json.loads(self._robj[0].text)
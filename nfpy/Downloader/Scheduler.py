@@ -0,0 +1,112 @@
+#
+# Download scheduler
+# Run page fetches concurrently with per-provider limits
+#
+
+from concurrent.futures import (as_completed, Future, ThreadPoolExecutor)
+from itertools import zip_longest
+import threading
+import time
+from typing import (Any, Callable, Generator, Iterable)
+
+from .DownloadsConf import (DefaultDownloadLimit, DownloadLimits, ProviderLimit)
+
+
+class TokenBucket(object):
+    """ Thread-safe token bucket. Tokens are refilled at <rate> per second up
+        to <capacity>, each call to TokenBucket.acquire() consumes one token
+        waiting if none is available.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = float(rate)
+        self._capacity = float(max(capacity, 1))
+        self._tokens = self._capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._last) * self._rate
+                )
+                self._last = now
+
+                if self._tokens >= 1.:
+                    self._tokens -= 1.
+                    return
+
+                wait = (1. - self._tokens) / self._rate
+
+            time.sleep(wait)
+
+
+class DownloadScheduler(object):
+    """ Run the fetch calls on a thread pool. The number of concurrent calls
+        and the rate of calls per provider are limited according to the
+        DownloadLimits configuration. Only the network calls should be run in
+        the scheduler, parsing and saving to the database are left to the
+        calling thread that acts as the single writer.
+
+        Input:
+            workers [int]: number of threads in the pool
+            limits [dict[str, ProviderLimit]]: override the configured limits
+                (default: None)
+    """
+
+    def __init__(self, workers: int, limits: dict | None = None):
+        self._workers = max(int(workers), 1)
+        self._limits = dict(DownloadLimits)
+        if limits:
+            self._limits.update(limits)
+
+        self._sem = {}
+        self._bucket = {}
+
+    def _limit(self, provider: str) -> ProviderLimit:
+        return self._limits.get(provider, DefaultDownloadLimit)
+
+    def _throttled(self, provider: str, fn: Callable) -> Any:
+        with self._sem[provider]:
+            self._bucket[provider].acquire()
+            return fn()
+
+    def run(self, tasks: dict[str, Iterable[tuple[Any, Callable]]]) \
+            -> Generator[tuple[Any, Future], None, None]:
+        """ Run the tasks and yield them as they complete.
+
+            Input:
+                tasks [dict[str, Iterable[tuple[Any, Callable]]]]: for each
+                    provider the sequence of <key, fetch callable> to run
+
+            Output:
+                key [Any]: the key given for the task
+                fut [Future]: completed future of the fetch callable
+        """
+        for provider in tasks:
+            lim = self._limit(provider)
+            self._sem[provider] = threading.BoundedSemaphore(lim.max_workers)
+            self._bucket[provider] = TokenBucket(lim.rate, lim.burst)
+
+        with ThreadPoolExecutor(max_workers=self._workers,
+                                thread_name_prefix='nfpyDownload') as pool:
+            # Interleave the providers to avoid filling the pool with tasks
+            # waiting on the same provider limits
+            futures = {}
+            queues = [
+                [(provider, task) for task in group]
+                for provider, group in tasks.items()
+            ]
+            for round_ in zip_longest(*queues):
+                for item in round_:
+                    if item is None:
+                        continue
+                    provider, (key, fn) = item
+                    fut = pool.submit(self._throttled, provider, fn)
+                    futures[fut] = key
+
+            for fut in as_completed(futures):
+                yield futures[fut], fut
@@ -0,0 +1,105 @@
+#
+# HTTP sessions
+# Registry of pooled HTTP sessions shared by the pages of a provider
+#
+
+import requests
+from requests import adapters
+import threading
+from typing import (Callable, Optional)
+from urllib3.util.retry import Retry
+
+from nfpy.Tools import Singleton
+
+from .DownloadsConf import (SessionBackoff, SessionPoolSize, SessionRetries)
+
+
+class SessionRegistry(metaclass=Singleton):
+    """ Registry of the HTTP sessions, one per provider. Sessions are created
+        on first use with a pooled adapter retrying with backoff on connection
+        errors and on throttling/server statuses. Only idempotent requests
+        are retried. The optional handshake is run at creation, its result is
+        stored alongside the session and shared by all the pages of the
+        provider. A failed handshake returns empty authentication data, the
+        session is renewed with a new handshake by reset() once the provider
+        rejects the calls. Threads racing to create the same session may each
+        run the handshake, only the first session published is kept.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_adapter(adapter: type) -> adapters.HTTPAdapter:
+        retry = Retry(
+            total=SessionRetries,
+            backoff_factor=SessionBackoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        return adapter(
+            pool_connections=SessionPoolSize,
+            pool_maxsize=SessionPoolSize,
+            max_retries=retry,
+        )
+
+    def get(self, provider: str,
+            adapter: type = adapters.HTTPAdapter,
+            handshake: Optional[Callable] = None) \
+            -> tuple[requests.Session, dict]:
+        """ Return the session for the provider, creating it if needed.
+
+            Input:
+                provider [str]: provider name
+                adapter [type]: HTTPAdapter class to mount (default: HTTPAdapter)
+                handshake [Optional[Callable]]: called with the new session,
+                    returns a dictionary of authentication data, empty on
+                    failure (default: None)
+
+            Output:
+                session [requests.Session]: the shared session
+                auth [dict]: authentication data from the handshake
+        """
+        with self._lock:
+            try:
+                return self._sessions[provider]
+            except KeyError:
+                pass
+
+        # The handshake is a network round trip, it is run outside the lock
+        # to not block the pages of the other providers
+        session = requests.Session()
+        a = self._new_adapter(adapter)
+        session.mount('https://', a)
+        session.mount('http://', a)
+        auth = handshake(session) if handshake else {}
+
+        with self._lock:
+            # Another thread may have completed its handshake first
+            v = self._sessions.setdefault(provider, (session, auth))
+        if v[0] is not session:
+            session.close()
+        return v
+
+    def reset(self, provider: Optional[str] = None,
+              session: Optional[requests.Session] = None) -> None:
+        """ Close the sessions of a provider, or of all providers if None, to
+            force a new handshake on next use. If <session> is given the
+            provider session is closed only if it is still the given one, to
+            not discard a session already renewed by another thread.
+        """
+        with self._lock:
+            keys = list(self._sessions) if provider is None else [provider]
+            for k in keys:
+                v = self._sessions.get(k)
+                if (v is None) or \
+                        ((session is not None) and (v[0] is not session)):
+                    continue
+                del self._sessions[k]
+                v[0].close()
+
+
+def get_session_glob() -> SessionRegistry:
+    """ Returns the pointer to the global SessionRegistry """
+    return SessionRegistry()
@@ -18,6 +18,7 @@ import json
 import numpy as np
 import pandas as pd
 import pandas.tseries.offsets as off
+import requests
 import time
 
 import nfpy.Calendar as Cal
@@ -44,6 +45,11 @@ class ClosePricesItem(BaseImportItem):
     select '{uid}', 124, date, close from YahooPrices where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 124), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 124, s.date, s.close from YahooPrices as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 124), '1900-01-01')"""
 
 
 class FinancialsItem(BaseImportItem):
@@ -90,6 +96,11 @@ class DividendsItem(BaseImportItem):
     select '{uid}', 621, date, value from YahooDividends where ticker = ?"""
     _Q_INCR = """ and date > ifnull((select max(date) from {dst_table}
     where uid = '{uid}' and dtype = 621), '1900-01-01')"""
+    _Q_BULK = """insert or replace into {dst_table} (uid, dtype, date, value)
+    select b.uid, 621, s.date, s.value from YahooDividends as s
+    join temp.ImportBatch as b on s.ticker = b.ticker"""
+    _Q_BULK_INCR = """ where s.date > ifnull((select max(date) from {dst_table}
+    where uid = b.uid and dtype = 621), '1900-01-01')"""
 
 
 class SplitsItem(BaseImportItem):
@@ -124,12 +135,36 @@ class YahooBasePage(BasePage):
     _ENCODING = "utf-8-sig"
     _PROVIDER = "Yahoo"
     _REQ_METHOD = 'get'
+    _COOKIE_URL = u"https://fc.yahoo.com"
+    _CRUMB_URL = u"https://query1.finance.yahoo.com/v1/test/getcrumb"
 
     @property
     def baseurl(self) -> str:
         """ Return the base url for the page. """
         return self._BASE_URL.format(self.ticker)
 
+    def _handshake(self, session: requests.Session) -> dict:
+        """ Obtain the session cookie and the crumb. This is done once for all
+            the Yahoo pages sharing the session. If the crumb is not obtained
+            the pages are called without it, the handshake is repeated when
+            the session is reset after a rejected call.
+        """
+        headers = {'User-Agent': self.user_agent}
+        try:
+            session.get(self._COOKIE_URL, headers=headers, timeout=10)
+            r = session.get(self._CRUMB_URL, headers=headers, timeout=10)
+        except requests.RequestException:
+            return {}
+
+        crumb = r.text.strip() if r.status_code == 200 else ''
+        return {'crumb': crumb} if crumb else {}
+
+    def _auth_params(self, params: dict, auth: dict) -> dict:
+        """ Add the crumb to the call parameters. """
+        if 'crumb' not in auth:
+            return params
+        return {**params, 'crumb': auth['crumb']}
+
 
 class FinancialsPage(YahooBasePage):
     _PAGE = 'Financials'
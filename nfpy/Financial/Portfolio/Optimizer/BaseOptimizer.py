@@ -4,12 +4,16 @@
 #
 
 from abc import (ABCMeta, abstractmethod)
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor, wait)
 import numpy as np
 import numpy.random as rnd
 from scipy.optimize import (minimize, OptimizeResult)
-from typing import (Sequence, Type)
+from typing import (Optional, Sequence, Type, Union)
 
-from nfpy.Tools import (Constants as Cn, Utilities as Ut)
+import nfpy.Math as Math
+from nfpy.Tools import (Constants as Cn, get_logger_glob, Utilities as Ut)
+
+from .QPSolver import active_set_qp
 
 
 class OptimizerConf(Ut.AttributizedDict):
@@ -18,6 +22,8 @@ class OptimizerConf(Ut.AttributizedDict):
     def __init__(self):
         super().__init__()
         self.constraints = []
+        self.bounds = None
+        self.jac = None
         self.tol = 1e-9
         self.method = 'SLSQP'
         self.options = {'disp': False, 'eps': 1e-08,
@@ -41,21 +47,89 @@ class OptimizerResult(Ut.AttributizedDict):
         self.const_ret = []
 
 
+def _run_start(funct, x0: np.ndarray, conf: OptimizerConf,
+               bounds: tuple) -> OptimizeResult:
+    """ Run a single start of the minimization. Defined at module level to
+        be sent to the worker processes. The objective, the constraints and
+        their jacobians must be module level functions taking all the data
+        from their arguments, bound methods would send the whole optimizer
+        to the worker with every start.
+    """
+    return minimize(
+        funct, x0, args=conf.args, jac=conf.jac, tol=conf.tol,
+        method=conf.method, bounds=bounds,
+        constraints=conf.constraints, options=conf.options
+    )
+
+
+def _budget_f(wgt: np.ndarray, budget: float) -> float:
+    """ Net exposure constraint sum(w) = budget. """
+    return np.sum(wgt) - budget
+
+
+def _budget_jac(wgt: np.ndarray, *args) -> np.ndarray:
+    return np.ones_like(wgt)
+
+
+def _gross_f(wgt: np.ndarray, gross: float) -> float:
+    """ Gross exposure constraint sum(|w|) <= gross. """
+    return gross - np.sum(np.abs(wgt))
+
+
+def _gross_jac(wgt: np.ndarray, *args) -> np.ndarray:
+    return -np.sign(wgt)
+
+
 class BaseOptimizer(metaclass=ABCMeta):
     """ Implements the Portfolio Optimizer metaclass. Optimizer algorithms
         should derive from this class.
+
+        The minimization is restarted <iterations> times from random starting
+        points drawn from independent streams spawned from <seed>. Restarts
+        may be spread over <workers> processes. If <converged> is positive
+        the restarts are stopped early once <converged> successful restarts
+        reach the best optimum found within <conv_tol>. By default all the
+        restarts are run.
+
+        With solver='qp' the models that can be written as a convex problem
+        are solved exactly and deterministically by dedicated solvers (an
+        active-set method for the quadratic problems), falling back to the
+        randomized SLSQP otherwise. Use solver='slsqp' to always use the
+        latter.
+
+        The covariance is estimated with <cov_method>, any of the estimators
+        of Math.covariance() ('sample', 'ledoit_wolf', 'ewma', 'pairwise',
+        'pca'). With 'pca' the covariance is kept as a low-rank plus diagonal
+        Math.FactorCovariance, the objectives are evaluated in O(NK) and the
+        linear systems of the dedicated solvers are solved through the
+        Woodbury identity; the parameters of the estimator are given in
+        <cov_params>.
     """
 
     _LABEL = ''
 
     def __init__(self, returns: np.ndarray, freq: str, labels: Sequence[str],
                  iterations: int = 50, gamma: float = .0,
-                 budget: float = 1., **kwargs):
+                 budget: float = 1., workers: int = 1,
+                 seed: Optional[int] = None, converged: int = 0,
+                 conv_tol: float = 1e-8, solver: str = 'qp',
+                 cov_method: str = 'sample',
+                 cov_params: Optional[dict] = None, **kwargs):
         # Input variables
         self._ret = returns
         self._freq = freq
         self._iter = iterations
         self._cnsts_labels = labels
+        self._workers = max(1, int(workers))
+        self._seed = seed
+        self._converged = max(0, int(converged))
+        self._conv_tol = conv_tol
+
+        if solver not in ('qp', 'slsqp'):
+            raise ValueError(f'BaseOptimizer(): solver {solver} not recognized')
+        self._solver = solver
+        self._cov_method = cov_method
+        self._cov_params = cov_params if cov_params else {}
 
         self._gamma = abs(gamma)
 
@@ -63,14 +137,25 @@ class BaseOptimizer(metaclass=ABCMeta):
         assert returns.shape[0] == len(labels)
         self._num_cnsts = returns.shape[0]
         self._var_f = self._fn_var_l2 if gamma != 0 else self._fn_var
+        self._var_g = self._grad_var_l2 if gamma != 0 else self._grad_var
         self._budget_constraint = self._set_budget(budget)
         self._scaling = Cn.FREQ_2_D[freq]['Y']
         self._mean_ret = None
         self._cov = None
+        self._x0 = None
 
         # Output variables
         self._res = None
 
+        # Process pool shared by all the minimizations of the model
+        self._pool = None
+
+    def __getstate__(self) -> dict:
+        # The pool cannot be sent to the workers
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
     @property
     def desc(self) -> str:
         """ Returns the identifier of the optimization model. """
@@ -79,7 +164,12 @@ class BaseOptimizer(metaclass=ABCMeta):
     @property
     def result(self) -> OptimizerResult:
         if self._res is None:
-            self._res = self._optimize()
+            try:
+                self._res = self._optimize()
+            finally:
+                if self._pool is not None:
+                    self._pool.shutdown(cancel_futures=True)
+                    self._pool = None
         return self._res
 
     @property
@@ -96,6 +186,19 @@ class BaseOptimizer(metaclass=ABCMeta):
             raise ValueError(f'BaseOptimizer(): covariance matrix not of size {self._num_cnsts}')
         self._cov = v
 
+    @property
+    def warm_start(self) -> Optional[np.ndarray]:
+        return self._x0
+
+    @warm_start.setter
+    def warm_start(self, v: Optional[np.ndarray]) -> None:
+        """ Weights used as first starting point of the minimization, for
+            instance the optimum of a previous similar problem.
+        """
+        if (v is not None) and (v.shape != (self._num_cnsts,)):
+            raise ValueError(f'BaseOptimizer(): warm start not of size {self._num_cnsts}')
+        self._x0 = v
+
     @property
     def mean_returns(self) -> np.ndarray:
         return self._mean_ret
@@ -108,11 +211,32 @@ class BaseOptimizer(metaclass=ABCMeta):
             raise ValueError(f'BaseOptimizer(): mean returns vector not of size {self._num_cnsts}')
         self._mean_ret = v
 
-    def _abs_budget_f(self, v: np.ndarray) -> float:
-        return np.sum(np.abs(v)) - self._budget_constraint[1]
+    def _budget_constraints(self) -> list[dict]:
+        """ Net and gross exposure constraints of the budget rule. The net
+            exposure is fixed to the budget and the gross exposure is capped
+            to 2 - |budget|. With a budget of +/-1 the cap is expressed by
+            the sign of the bounds, see _budget_bounds(), as the linearized
+            gross constraint would coincide with the net one making the
+            SLSQP subproblem singular.
+        """
+        budget, gross = self._budget_constraint
+        cnsts = [
+            {'type': 'eq', 'fun': _budget_f, 'jac': _budget_jac,
+             'args': (budget,)}
+        ]
+        if self._sign_bounds() is None:
+            cnsts.append(
+                {'type': 'ineq', 'fun': _gross_f, 'jac': _gross_jac,
+                 'args': (gross,)}
+            )
+        return cnsts
 
-    def _budget_f(self, v: np.ndarray) -> float:
-        return np.sum(v) - self._budget_constraint[0]
+    def _budget_bounds(self) -> tuple:
+        """ Bounds on the weights for SLSQP under the budget rule. """
+        sb = self._sign_bounds()
+        if sb is None:
+            return ((-1.0, 1.0),) * self._num_cnsts
+        return tuple(zip(*sb))
 
     @staticmethod
     def _set_budget(budget: float) -> tuple[float, float]:
@@ -131,7 +255,7 @@ class BaseOptimizer(metaclass=ABCMeta):
                 variance [float]: portfolio variance
         """
         wgt, cov = args[0], args[1]
-        return float(np.dot(wgt.T, np.dot(cov, wgt)))
+        return float(wgt @ (cov @ wgt))
 
     @staticmethod
     def _fn_var_l2(*args) -> float:
@@ -146,37 +270,189 @@ class BaseOptimizer(metaclass=ABCMeta):
                 variance [float]: portfolio variance
         """
         wgt, cov, g = args[0], args[1], args[2]
-        var = float(np.dot(wgt.T, np.dot(cov, wgt))) \
-              + g * np.dot(wgt.T, wgt)
+        var = float(wgt @ (cov @ wgt)) + g * np.dot(wgt, wgt)
         return var
 
+    @staticmethod
+    def _grad_var(*args) -> np.ndarray:
+        """ Gradient of the portfolio variance w.r.t. the weights.
+
+            Input:
+                wgt [np.ndarray]: portfolio weights vector
+                cov [np.ndarray]: portfolio covariance
+
+            Output:
+                grad [np.ndarray]: gradient vector
+        """
+        wgt, cov = args[0], args[1]
+        return 2. * (cov @ wgt)
+
+    @staticmethod
+    def _grad_var_l2(*args) -> np.ndarray:
+        """ Gradient of the portfolio variance with L2 regularization w.r.t.
+            the weights.
+
+            Input:
+                wgt [np.ndarray]: portfolio weights vector
+                cov [np.ndarray]: portfolio covariance
+                gamma [float]: regularization parameter
+
+            Output:
+                grad [np.ndarray]: gradient vector
+        """
+        wgt, cov, g = args[0], args[1], args[2]
+        return 2. * (cov @ wgt + g * wgt)
+
+    def _starting_points(self) -> np.ndarray:
+        """ Random starting points on the budget simplex, one independent
+            stream per restart so that results do not depend on the number
+            of workers. The points have the sign of the budget to lie within
+            the bounds of negative budgets.
+        """
+        budget = self._budget_constraint[0]
+        streams = rnd.SeedSequence(self._seed).spawn(self._iter)
+        x0 = np.empty((self._iter, self._num_cnsts))
+        for i, ss in enumerate(streams):
+            _v = rnd.default_rng(ss).random(self._num_cnsts)
+            x0[i, :] = budget * _v / np.sum(_v)
+
+        # The warm start, if any, is tried first
+        if (self._x0 is not None) and (self._iter > 0):
+            x0[0, :] = self._x0
+        return x0
+
     def _minimizer(self, conf: OptimizerConf) -> OptimizeResult:
         """ Wrapper to Scipy minimize. Defines the budget rule, runs the
-            minimization and collects the results.
+            minimization from multiple starting points and collects the best
+            result.
 
             Input:
                 conf [OptimizerConf]: configuration of the optimization
         """
-        bounds = ((-1.0, 1.0),) * self._num_cnsts
+        bounds = conf.bounds
+        if bounds is None:
+            bounds = ((-1.0, 1.0),) * self._num_cnsts
+        starts = iter(self._starting_points())
         best_conv = 1e6
+        hits = 0
 
         result = None
-        for _ in range(self._iter):
-            _v = rnd.rand(self._num_cnsts)
-            _x0 = _v / np.sum(_v)
-
-            _optimum = minimize(
-                conf.funct, _x0, args=conf.args, tol=conf.tol,
-                method=conf.method, bounds=bounds,
-                constraints=conf.constraints, options=conf.options
-            )
 
-            if _optimum.success and (_optimum.fun < best_conv):
-                best_conv = _optimum.fun
+        def _update(_optimum: OptimizeResult) -> bool:
+            """ Keep the best result, return True to stop. """
+            nonlocal best_conv, hits, result
+            if not _optimum.success:
+                return False
+
+            f = float(_optimum.fun)
+            if abs(f - best_conv) <= self._conv_tol * max(1., abs(best_conv)):
+                hits += 1
+            elif f < best_conv:
+                hits = 1
+            if f < best_conv:
+                best_conv = f
                 result = _optimum
+            return 0 < self._converged <= hits
+
+        if self._workers == 1:
+            for _x0 in starts:
+                if _update(_run_start(conf.funct, _x0, conf, bounds)):
+                    break
+            return result
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+
+        # Keep a limited number of restarts in flight to profit of the early
+        # stopping
+        pending = set()
+        for _x0 in starts:
+            pending.add(
+                self._pool.submit(_run_start, conf.funct, _x0, conf, bounds)
+            )
+            if len(pending) < 2 * self._workers:
+                continue
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any([_update(f.result()) for f in done]):
+                break
+        else:
+            for f in pending:
+                _update(f.result())
+            pending = set()
+
+        for f in pending:
+            f.cancel()
 
         return result
 
+    def _qp_bounds(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """ Bounds on the weights equivalent to the budget constraints if
+            these can be written as linear constraints and the QP solvers are
+            enabled, None otherwise.
+        """
+        if self._solver != 'qp':
+            return None
+        return self._sign_bounds()
+
+    def _sign_bounds(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """ Bounds on the weights equivalent to the gross exposure constraint
+            if the budget is +/-1, None otherwise. In that case the gross
+            exposure constraint forces all weights to have the sign of the
+            budget.
+        """
+        budget = self._budget_constraint[0]
+        n = self._num_cnsts
+        if budget == 1.:
+            return np.zeros(n), np.ones(n)
+        elif budget == -1.:
+            return -np.ones(n), np.zeros(n)
+        return None
+
+    def _reg_cov(self) -> Union[np.ndarray, Math.FactorCovariance]:
+        """ Covariance with the L2 regularization on the diagonal. A factor
+            model covariance is kept as such.
+        """
+        if isinstance(self._cov, Math.FactorCovariance):
+            return self._cov.add_diagonal(self._gamma)
+        return self._cov + self._gamma * np.eye(self._num_cnsts)
+
+    def _qp_hess(self) -> Union[np.ndarray, Math.FactorCovariance]:
+        """ Hessian of the (regularized) variance. """
+        return 2. * self._reg_cov()
+
+    def _qp_minimizer(self, a_eq: np.ndarray, b_eq: np.ndarray,
+                      lb: np.ndarray, ub: np.ndarray,
+                      x0: Optional[np.ndarray] = None) \
+            -> Optional[OptimizeResult]:
+        """ Minimize the (regularized) variance subject to linear equality
+            constraints and bounds. The objective value is reported as the
+            <_var_f> function for consistency with _minimizer().
+
+            Input:
+                a_eq [np.ndarray]: matrix of equality constraints
+                b_eq [np.ndarray]: vector of equality constraints
+                lb [np.ndarray]: lower bounds on the weights
+                ub [np.ndarray]: upper bounds on the weights
+                x0 [Optional[np.ndarray]]: feasible starting point, if None
+                    the warm start is tried
+
+            Output:
+                res [Optional[OptimizeResult]]: the optimum, None if the
+                    problem is infeasible or did not converge. The caller is
+                    expected to fall back to _minimizer().
+        """
+        x0 = self._x0 if x0 is None else x0
+        res = active_set_qp(self._qp_hess(), a_eq, b_eq, lb, ub, x0=x0)
+        if not res.success:
+            get_logger_glob().warning(
+                f'{self._LABEL}: QP solver failed ({res.message}), '
+                f'falling back to SLSQP'
+            )
+            return None
+        res.fun = self._var_f(res.x, self._cov, self._gamma)
+        return res
+
     def _create_result_obj(self) -> OptimizerResult:
         obj = OptimizerResult()
         obj.model = self._LABEL
@@ -196,11 +472,33 @@ class BaseOptimizer(metaclass=ABCMeta):
                 * define all constraint functions including the budget()
         """
 
+    def _calc_inputs(self) -> None:
+        """ Calculate mean returns and covariance if not set before. """
+        if self._mean_ret is None:
+            self._mean_ret = Math.compound(
+                np.mean(self._ret, axis=1),
+                self._scaling
+            )
+        if self._cov is None:
+            self._cov = self._calc_cov()
+
     def _calc_cov(self) -> np.ndarray:
         """ Calculate the covariance. Must be called by _optimize() and may be
-            overridden in child classes.
+            overridden in child classes. The estimate is shared through the
+            global covariance cache with the other models on the same data.
         """
-        return np.cov(self._ret.T, rowvar=False) * self._scaling
+        cache = Math.get_cov_cache_glob()
+        key = cache.key(
+            self._cnsts_labels, None, self._freq, cache.stamp(self._ret),
+            self._cov_method, **self._cov_params
+        )
+        cov = cache.get(
+            key,
+            lambda: Math.covariance(
+                self._ret, self._cov_method, **self._cov_params
+            )
+        )
+        return cov * self._scaling
 
 
 TyOptimizer = Type[BaseOptimizer]
@@ -4,16 +4,42 @@
 # given portfolio to obtain the efficient frontier
 #
 
+from concurrent.futures import ProcessPoolExecutor
+import copy
 import numpy as np
+from scipy.optimize import OptimizeResult
 from typing import (Optional, Sequence)
 
-from .BaseOptimizer import (BaseOptimizer, OptimizerConf)
+from .BaseOptimizer import (BaseOptimizer, OptimizerConf, _budget_jac,
+                            _run_start)
 
-import nfpy.Math as Math
+# Known optima <ret, weights> used to warm start a point
+TySeeds = Sequence[tuple[float, np.ndarray]]
+
+# A segment of the frontier: target returns and their warm start optima. If
+# the seeds are None the point is warm started from the previous ones.
+TySegment = Sequence[tuple[float, Optional[TySeeds]]]
+
+
+def _frontier_segment(model: 'MarkowitzModel', segment: TySegment) \
+        -> list[tuple[float, Optional[OptimizeResult]]]:
+    """ Solve a segment of the frontier in a worker process. The model is a
+        light copy without the returns and with a single worker.
+    """
+    return model._solve_segment(segment)
 
 
 class MarkowitzModel(BaseOptimizer):
-    """ Implements the Markowitz Portfolio analysis. """
+    """ Implements the Markowitz Portfolio analysis.
+
+        Each point of the frontier is warm started from the previous optimum.
+        With several workers the grid is split in contiguous segments solved
+        in parallel. After the grid, up to <refine> rounds of refinement
+        bisect the intervals next to the points where the frontier turns by
+        more than <curv_tol> radians, up to a total of <max_points>. Each
+        midpoint is warm started from the ends of its interval and the
+        midpoints are batched in one segment per worker.
+    """
 
     _LABEL = 'Markowitz'
 
@@ -21,7 +47,9 @@ class MarkowitzModel(BaseOptimizer):
                  max_ret: float = 1., min_ret: float = .0,
                  iterations: int = 50, points: int = 20,
                  ret_grid: Sequence[float] = None,
-                 gamma: Optional[float] = None, **kwargs):
+                 gamma: float = .0, refine: int = 0,
+                 curv_tol: float = .05, max_points: Optional[int] = None,
+                 **kwargs):
         super().__init__(returns=returns, freq=freq, labels=labels,
                          iterations=iterations, gamma=gamma, **kwargs)
 
@@ -30,6 +58,8 @@ class MarkowitzModel(BaseOptimizer):
         self._max_r = max_ret
         self._min_r = min_ret
         self._ret_grid = ret_grid
+        self._refine = max(0, int(refine))
+        self._curv_tol = curv_tol
 
         if ret_grid is not None:
             if len(ret_grid) > 0:
@@ -37,6 +67,9 @@ class MarkowitzModel(BaseOptimizer):
                 self._max_r = max(self._ret_grid)
                 self._min_r = min(self._ret_grid)
 
+        self._max_points = 4 * self._grid_size \
+            if max_points is None else max_points
+
     def returns_grid(self):
         """ Calculates the grid of returns for the efficient frontier. """
         grid = self._ret_grid
@@ -49,42 +82,187 @@ class MarkowitzModel(BaseOptimizer):
         for r in grid:
             yield r
 
-    def _optimize(self):
-        """ Optimize following the Markowitz procedure """
+    @staticmethod
+    def _constrain_ret(wgt: np.ndarray, sret: np.ndarray, tret: float) -> float:
+        return np.dot(wgt, sret) - tret
 
-        def constrain_ret(wgt, sret, tret):
-            return np.dot(wgt, sret) - tret
+    @staticmethod
+    def _constrain_ret_jac(wgt: np.ndarray, sret: np.ndarray,
+                           tret: float) -> np.ndarray:
+        return sret
 
-        def budget(x):
-            return np.sum(x) - 1.
+    @staticmethod
+    def _budget(x: np.ndarray) -> float:
+        return np.sum(x) - 1.
 
-        self._mean_ret = Math.compound(
-            np.mean(self._ret, axis=1),
-            self._scaling
-        )
-        self._cov = self._calc_cov()
+    def _solve_point(self, fix_ret: float,
+                     seeds: Sequence[tuple[float, np.ndarray]]) \
+            -> Optional[OptimizeResult]:
+        """ Solve a single point of the frontier warm starting from the known
+            optima in <seeds>.
+        """
+        x0 = seeds[-1][1] if seeds else None
 
-        r = self._create_result_obj()
-        for i, fix_ret in enumerate(self.returns_grid()):
-            print(f'{i:>3}:{self._grid_size:>3} | {fix_ret:.2f}')
+        if self._solver == 'qp':
+            # By the two-fund property, as long as the active bounds do
+            # not change the optimal weights are linear in the target
+            # return. The inter/extrapolation from two known points is used
+            # as warm start and is already optimal in that case.
+            if len(seeds) == 2:
+                (r1, x1), (r2, x2) = seeds
+                if r2 != r1:
+                    x0 = x2 + (fix_ret - r2) / (r2 - r1) * (x2 - x1)
 
-            c = OptimizerConf()
-            c.args = (self._cov, self._gamma)
-            c.funct = self._var_f
-            c.constraints = [
-                {'type': 'eq', 'fun': constrain_ret, 'args': (self._mean_ret, fix_ret)},
-                {'type': 'eq', 'fun': budget},
-            ]
+            n = self._num_cnsts
+            opt = self._qp_minimizer(
+                np.vstack((np.ones(n), self._mean_ret)),
+                np.array([1., fix_ret]),
+                -np.ones(n), np.ones(n), x0=x0
+            )
+            if opt is not None:
+                return opt
 
-            opt = self._minimizer(c)
+        c = OptimizerConf()
+        c.args = (self._cov, self._gamma)
+        c.funct = self._var_f
+        c.jac = self._var_g
+        c.constraints = [
+            {'type': 'eq', 'fun': self._constrain_ret,
+             'jac': self._constrain_ret_jac,
+             'args': (self._mean_ret, fix_ret)},
+            {'type': 'eq', 'fun': self._budget,
+             'jac': _budget_jac},
+        ]
 
+        # A single start from the previous optimum, random restarts only if
+        # it does not converge
+        if x0 is not None:
+            bounds = ((-1.0, 1.0),) * self._num_cnsts
+            opt = _run_start(c.funct, x0, c, bounds)
+            if opt.success:
+                return opt
+
+        return self._minimizer(c)
+
+    def _solve_segment(self, segment: TySegment) \
+            -> list[tuple[float, Optional[OptimizeResult]]]:
+        """ Solve sequentially a segment of the frontier, each point warm
+            started from its seeds or, if not given, from the previous points.
+        """
+        prev = []
+        res = []
+        for fix_ret, seeds in segment:
+            print(f'{len(res):>3}:{len(segment):>3} | {fix_ret:.2f}')
+
+            seeds = prev if seeds is None else list(seeds)
+            opt = self._solve_point(fix_ret, seeds)
             if (opt is not None) and opt.success:
-                r.success = True
-                r.len = r.len + 1
-                r.weights.append(opt.x)
-                r.ptf_variance.append(opt.fun)
-                _ptf_ret = np.sum(self._mean_ret * opt.x)
-                r.ptf_return.append(_ptf_ret)
-                r.sharpe.append(_ptf_ret / np.sqrt(opt.fun))
+                prev = (seeds + [(fix_ret, opt.x)])[-2:]
+            else:
+                prev = seeds
+            res.append((fix_ret, opt))
+        return res
+
+    def _split(self, points: TySegment) -> list[TySegment]:
+        """ Split the points in contiguous segments, one per worker. """
+        n_seg = min(self._workers, len(points))
+        if n_seg == 0:
+            return []
+        idx = np.linspace(0, len(points), n_seg + 1).astype(int)
+        return [list(points[a:b]) for a, b in zip(idx[:-1], idx[1:]) if b > a]
+
+    def _worker_copy(self) -> 'MarkowitzModel':
+        """ Copy of the model sent to the workers. Only the inputs of the
+            segment solver are kept, the returns are not needed anymore once
+            mean returns and covariance are calculated.
+        """
+        model = copy.copy(self)
+        model._ret = None
+        model._pool = None
+        model._res = None
+        model._workers = 1
+        return model
+
+    def _solve_segments(self, segments: Sequence[TySegment]) \
+            -> list[tuple[float, Optional[OptimizeResult]]]:
+        """ Solve the segments of the frontier, in parallel if several
+            workers are available.
+        """
+        if (self._workers == 1) or (len(segments) == 1):
+            res = []
+            for seg in segments:
+                res.extend(self._solve_segment(seg))
+            return res
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+
+        model = self._worker_copy()
+        res = []
+        for seg_res in self._pool.map(
+                _frontier_segment, [model] * len(segments), segments
+        ):
+            res.extend(seg_res)
+        return res
+
+    def _refine_points(self, points: dict[float, OptimizeResult]) \
+            -> TySegment:
+        """ Bisect the intervals adjacent to the points where the frontier
+            turns more than the tolerance. The turning angle is measured in
+            the <volatility, return> plane normalized on the frontier span.
+            The midpoints are returned with the ends of their interval as
+            seeds.
+        """
+        rets = np.array(sorted(points))
+        if rets.shape[0] < 3:
+            return []
+
+        vols = np.sqrt([points[r].fun for r in rets])
+        x = (vols - vols.min()) / max(np.ptp(vols), 1e-12)
+        y = (rets - rets.min()) / max(np.ptp(rets), 1e-12)
+
+        dx, dy = np.diff(x), np.diff(y)
+        angles = np.abs(np.diff(np.arctan2(dy, dx)))
+        angles = np.minimum(angles, 2. * np.pi - angles)
+
+        to_split = set()
+        for i in np.where(angles > self._curv_tol)[0]:
+            to_split.update((i, i + 1))
+
+        midpoints = []
+        for i in sorted(to_split):
+            r1, r2 = rets[i], rets[i + 1]
+            seeds = [(r1, points[r1].x), (r2, points[r2].x)]
+            midpoints.append((.5 * (r1 + r2), seeds))
+        return midpoints
+
+    def _optimize(self):
+        """ Optimize following the Markowitz procedure """
+        self._calc_inputs()
+
+        # Split the grid in contiguous segments, one per worker
+        segments = self._split([(r, None) for r in self.returns_grid()])
+
+        points = {}
+        for _ in range(self._refine + 1):
+            for fix_ret, opt in self._solve_segments(segments):
+                if (opt is not None) and opt.success:
+                    points[fix_ret] = opt
+
+            room = self._max_points - len(points)
+            segments = self._split(self._refine_points(points)[:max(room, 0)])
+            if not segments:
+                break
+
+        r = self._create_result_obj()
+        for fix_ret in sorted(points):
+            opt = points[fix_ret]
+            r.success = True
+            r.len = r.len + 1
+            r.weights.append(opt.x)
+            r.ptf_variance.append(opt.fun)
+            _ptf_ret = np.sum(self._mean_ret * opt.x)
+            r.ptf_return.append(_ptf_ret)
+            r.sharpe.append(_ptf_ret / np.sqrt(opt.fun))
 
         return r
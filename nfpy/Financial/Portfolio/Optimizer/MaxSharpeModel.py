@@ -3,10 +3,30 @@
 #
 
 import numpy as np
+from scipy.optimize import OptimizeResult
+from typing import Optional
+
+from nfpy.Tools import get_logger_glob
 
 from .BaseOptimizer import (BaseOptimizer, OptimizerConf, OptimizerResult)
+from .QPSolver import active_set_qp
+
+
+def _neg_sharpe(wgt: np.ndarray, cov: np.ndarray, ret: np.ndarray,
+                gamma: float) -> float:
+    """ Negative Sharpe ratio -r / sqrt(v) of the portfolio. """
+    r = np.sum(ret * wgt)
+    v = BaseOptimizer._fn_var_l2(wgt, cov, gamma)
+    return - r / np.sqrt(v)
 
-import nfpy.Math as Math
+
+def _neg_sharpe_grad(wgt: np.ndarray, cov: np.ndarray, ret: np.ndarray,
+                     gamma: float) -> np.ndarray:
+    """ Gradient of the negative Sharpe ratio -r / sqrt(v). """
+    r = np.sum(ret * wgt)
+    v = BaseOptimizer._fn_var_l2(wgt, cov, gamma)
+    dv = BaseOptimizer._grad_var_l2(wgt, cov, gamma)
+    return - ret / np.sqrt(v) + .5 * r * dv / np.power(v, 1.5)
 
 
 class MaxSharpeModel(BaseOptimizer):
@@ -18,20 +38,17 @@ class MaxSharpeModel(BaseOptimizer):
 
     def _optimize(self) -> OptimizerResult:
 
-        self._mean_ret = Math.compound(
-            np.mean(self._ret, axis=1),
-            self._scaling
-        )
-        self._cov = self._calc_cov()
+        self._calc_inputs()
 
         c = OptimizerConf()
         c.args = (self._cov, self._mean_ret, self._gamma)
-        c.funct = self._min_funct
-        c.constraints = [
-                {'type': 'eq', 'fun': self._budget_f},
-                {'type': 'eq', 'fun': self._abs_budget_f}
-        ]
-        opt = self._minimizer(c)
+        c.funct = _neg_sharpe
+        c.jac = _neg_sharpe_grad
+        c.constraints = self._budget_constraints()
+        c.bounds = self._budget_bounds()
+        opt = self._qp_max_sharpe()
+        if opt is None:
+            opt = self._minimizer(c)
 
         r = self._create_result_obj()
         if (opt is not None) and opt.success:
@@ -45,8 +62,37 @@ class MaxSharpeModel(BaseOptimizer):
 
         return r
 
-    def _min_funct(self, wgt: np.array, cov: np.array, ret: np.array,
-                   gamma: float) -> float:
-        r = np.sum(ret * wgt)
-        v = self._var_f(wgt, cov, gamma)
-        return - r / np.sqrt(v)
+    def _qp_max_sharpe(self) -> Optional[OptimizeResult]:
+        """ Exact maximum Sharpe portfolio with all weights of the sign of
+            the budget. The problem is made homogeneous with y = w / k
+            leading to the quadratic problem
+
+                min y' C y   s.t.  s * mu' y = 1,  y >= 0
+
+            where s is the sign of the budget and w = s * y / sum(y).
+            Available only if at least one asset has a positive Sharpe ratio
+            in the direction of the budget.
+        """
+        if self._qp_bounds() is None:
+            return None
+
+        sign = self._budget_constraint[0]
+        ret = sign * self._mean_ret
+        if np.max(ret) <= .0:
+            return None
+
+        n = self._num_cnsts
+        opt = active_set_qp(
+            self._qp_hess(), ret[None, :], np.array([1.]),
+            np.zeros(n), np.full(n, np.inf)
+        )
+        if not opt.success:
+            get_logger_glob().warning(
+                f'{self._LABEL}: QP solver failed ({opt.message}), '
+                f'falling back to SLSQP'
+            )
+            return None
+
+        opt.x = sign * opt.x / np.sum(opt.x)
+        opt.fun = _neg_sharpe(opt.x, self._cov, self._mean_ret, self._gamma)
+        return opt
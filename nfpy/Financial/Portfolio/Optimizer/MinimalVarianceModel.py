@@ -6,8 +6,6 @@ import numpy as np
 
 from .BaseOptimizer import (BaseOptimizer, OptimizerConf, OptimizerResult)
 
-import nfpy.Math as Math
-
 
 class MinimalVarianceModel(BaseOptimizer):
     """ Implements the Minimal Variance Portfolio analysis. """
@@ -16,21 +14,25 @@ class MinimalVarianceModel(BaseOptimizer):
 
     def _optimize(self) -> OptimizerResult:
 
-        self._mean_ret = Math.compound(
-            np.mean(self._ret, axis=1),
-            self._scaling
-        )
-        self._cov = self._calc_cov()
+        self._calc_inputs()
 
         c = OptimizerConf()
         c.args = (self._cov, self._gamma)
         c.funct = self._var_f
-        c.constraints = [
-                {'type': 'eq', 'fun': self._budget_f},
-                {'type': 'eq', 'fun': self._abs_budget_f}
-        ]
-
-        opt = self._minimizer(c)
+        c.jac = self._var_g
+        c.constraints = self._budget_constraints()
+        c.bounds = self._budget_bounds()
+
+        opt = None
+        bounds = self._qp_bounds()
+        if bounds is not None:
+            opt = self._qp_minimizer(
+                np.ones((1, self._num_cnsts)),
+                np.array([self._budget_constraint[0]]),
+                *bounds
+            )
+        if opt is None:
+            opt = self._minimizer(c)
 
         r = self._create_result_obj()
         if (opt is not None) and opt.success:
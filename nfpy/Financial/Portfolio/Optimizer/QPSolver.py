@@ -0,0 +1,210 @@
+#
+# Quadratic programming solvers
+# Exact solvers for the mean-variance problems with linear equality
+# constraints and bounds on the weights
+#
+
+import numpy as np
+from scipy.optimize import (linprog, OptimizeResult)
+from typing import (Optional, Union)
+
+import nfpy.Math as Math
+
+
+def kkt_solve(hess: np.ndarray, a_eq: np.ndarray, b_eq: np.ndarray,
+              c: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Solve the equality constrained quadratic problem
+
+            min 1/2 x' H x + c' x   s.t.  A x = b
+
+        through its KKT linear system.
+
+        Input:
+            hess [np.ndarray]: hessian matrix H (n, n)
+            a_eq [np.ndarray]: matrix of equality constraints A (m, n)
+            b_eq [np.ndarray]: vector of equality constraints b (m,)
+            c [Optional[np.ndarray]]: linear term (default: None)
+
+        Output:
+            x [np.ndarray]: solution (n,)
+            lmbd [np.ndarray]: Lagrange multipliers of the constraints (m,)
+
+        Exceptions:
+            np.linalg.LinAlgError: if the system is singular
+    """
+    n, m = hess.shape[0], a_eq.shape[0]
+    kkt = np.zeros((n + m, n + m))
+    kkt[:n, :n] = hess
+    kkt[:n, n:] = -a_eq.T
+    kkt[n:, :n] = a_eq
+
+    rhs = np.zeros(n + m)
+    if c is not None:
+        rhs[:n] = -c
+    rhs[n:] = b_eq
+
+    sol = np.linalg.solve(kkt, rhs)
+    return sol[:n], sol[n:]
+
+
+def _free_step(hess: Union[np.ndarray, Math.FactorCovariance],
+               a_eq: np.ndarray, g: np.ndarray, free: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray]:
+    """ Step p on the free variables minimizing the quadratic model while
+        keeping the equalities satisfied, and the multipliers of the
+        equalities. A factor model hessian is solved through the Schur
+        complement of the KKT system using the Woodbury identity, without
+        building the dense matrix.
+    """
+    a_f = a_eq[:, free]
+    nf, m = int(free.sum()), a_eq.shape[0]
+
+    if isinstance(hess, Math.FactorCovariance):
+        if nf == 0:
+            return np.zeros(0), np.zeros(m)
+
+        # p = H^-1 (A' l - g) with A H^-1 A' l = A H^-1 g
+        h = hess.subset(free)
+        hi_g = h.solve(g[free])
+        hi_a = h.solve(a_f.T)
+        lmbd = np.linalg.lstsq(a_f @ hi_a, a_f @ hi_g, rcond=None)[0]
+        return hi_a @ lmbd - hi_g, lmbd
+
+    kkt = np.zeros((nf + m, nf + m))
+    kkt[:nf, :nf] = hess[np.ix_(free, free)]
+    kkt[:nf, nf:] = -a_f.T
+    kkt[nf:, :nf] = a_f
+    rhs = np.concatenate((-g[free], np.zeros(m)))
+    sol = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+    return sol[:nf], sol[nf:]
+
+
+def _feasible_point(a_eq: np.ndarray, b_eq: np.ndarray, lb: np.ndarray,
+                    ub: np.ndarray) -> Optional[np.ndarray]:
+    """ Find a point satisfying equalities and bounds (Phase I). """
+    res = linprog(
+        np.zeros(a_eq.shape[1]), A_eq=a_eq, b_eq=b_eq,
+        bounds=np.column_stack((lb, ub)), method='highs'
+    )
+    return res.x if res.status == 0 else None
+
+
+def _is_feasible(x: np.ndarray, a_eq: np.ndarray, b_eq: np.ndarray,
+                 lb: np.ndarray, ub: np.ndarray, tol: float) -> bool:
+    return bool(
+        np.all(x >= lb - tol) and np.all(x <= ub + tol)
+        and np.allclose(a_eq @ x, b_eq, atol=tol * 10.)
+    )
+
+
+def active_set_qp(hess: Union[np.ndarray, Math.FactorCovariance],
+                  a_eq: np.ndarray, b_eq: np.ndarray,
+                  lb: np.ndarray, ub: np.ndarray,
+                  c: Optional[np.ndarray] = None,
+                  x0: Optional[np.ndarray] = None,
+                  tol: float = 1e-10, max_iter: Optional[int] = None) \
+        -> OptimizeResult:
+    """ Primal active-set method for the convex quadratic problem
+
+            min 1/2 x' H x + c' x   s.t.  A x = b,  lb <= x <= ub
+
+        The working set contains the variables fixed at one of the bounds, at
+        each iteration the equality constrained problem on the free variables
+        is solved via its KKT system. If a feasible starting point <x0> is
+        given the solver is warm started, otherwise a feasible point is
+        searched by linear programming. A hessian given as factor model is
+        never made dense, each iteration costs O(NK^2).
+
+        Input:
+            hess [Union[np.ndarray, Math.FactorCovariance]]: positive
+                semi-definite hessian matrix H (n, n), positive definite if
+                given as factor model
+            a_eq [np.ndarray]: matrix of equality constraints A (m, n)
+            b_eq [np.ndarray]: vector of equality constraints b (m,)
+            lb [np.ndarray]: lower bounds (n,)
+            ub [np.ndarray]: upper bounds (n,)
+            c [Optional[np.ndarray]]: linear term (default: None)
+            x0 [Optional[np.ndarray]]: feasible starting point (default: None)
+            tol [float]: tolerance (default: 1e-10)
+            max_iter [Optional[int]]: maximum number of iterations
+                (default: 10 * n)
+
+        Output:
+            res [OptimizeResult]: result with fields x, fun, success, nit,
+                status and message
+    """
+    n = hess.shape[0]
+    a_eq = np.atleast_2d(a_eq)
+    b_eq = np.atleast_1d(b_eq)
+    c = np.zeros(n) if c is None else c
+    max_iter = 10 * n if max_iter is None else max_iter
+
+    if (x0 is None) or (not _is_feasible(x0, a_eq, b_eq, lb, ub, 1e-9)):
+        x0 = _feasible_point(a_eq, b_eq, lb, ub)
+        if x0 is None:
+            return OptimizeResult(
+                x=None, fun=np.nan, success=False, nit=0, status=2,
+                message='Problem infeasible'
+            )
+
+    x = np.clip(x0, lb, ub)
+    at_lb = x <= lb + tol
+    at_ub = ~at_lb & (x >= ub - tol)
+
+    status, it = 1, 0
+    for it in range(1, max_iter + 1):
+        fixed = at_lb | at_ub
+        free = ~fixed
+        g = hess @ x + c
+
+        # Step on the free variables keeping the equalities satisfied
+        p = np.zeros(n)
+        p[free], lmbd = _free_step(hess, a_eq, g, free)
+        nf = int(free.sum())
+
+        if np.max(np.abs(p), initial=.0) <= tol:
+            # Check the sign of the multipliers of the fixed variables.
+            # Multipliers are recomputed on the full set to include the
+            # fixed variables in the estimate of the equality multipliers.
+            if nf == 0:
+                lmbd = np.linalg.lstsq(a_eq.T, g, rcond=None)[0]
+            z = g - a_eq.T @ lmbd
+            z = np.where(at_lb, z, np.where(at_ub, -z, .0))
+
+            k = int(np.argmin(z))
+            if z[k] >= -tol * max(1., np.max(np.abs(g))):
+                status = 0
+                break
+
+            # Release the constraint with the most negative multiplier
+            at_lb[k] = at_ub[k] = False
+            continue
+
+        # Longest feasible step along p
+        alpha, block, to_lb = 1., -1, False
+        neg = free & (p < -tol)
+        pos = free & (p > tol)
+        if neg.any():
+            steps = (lb[neg] - x[neg]) / p[neg]
+            j = int(np.argmin(steps))
+            if steps[j] < alpha:
+                alpha, block, to_lb = steps[j], np.where(neg)[0][j], True
+        if pos.any():
+            steps = (ub[pos] - x[pos]) / p[pos]
+            j = int(np.argmin(steps))
+            if steps[j] < alpha:
+                alpha, block, to_lb = steps[j], np.where(pos)[0][j], False
+
+        x = x + max(alpha, .0) * p
+        if block >= 0:
+            if to_lb:
+                x[block], at_lb[block] = lb[block], True
+            else:
+                x[block], at_ub[block] = ub[block], True
+
+    return OptimizeResult(
+        x=x, fun=float(.5 * x @ (hess @ x) + c @ x), success=status == 0,
+        nit=it, status=status,
+        message='Optimization terminated successfully' if status == 0
+        else 'Iteration limit reached'
+    )
@@ -0,0 +1,153 @@
+#
+# Risk budgeting solvers
+# Solvers for the long-only risk budgeting portfolio based on the convex
+# log-barrier formulation
+#
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+from typing import (Optional, Union)
+
+import nfpy.Math as Math
+
+TyCov = Union[np.ndarray, Math.FactorCovariance]
+
+
+def _rb_newton(cov: TyCov, b: np.ndarray, y: np.ndarray, tol: float,
+               max_iter: int) -> tuple[np.ndarray, int, bool]:
+    """ Damped Newton method on the log-barrier objective. The hessian of a
+        factor model covariance is solved with the Woodbury identity.
+    """
+    def _f(_y: np.ndarray) -> float:
+        return .5 * _y @ (cov @ _y) - b @ np.log(_y)
+
+    is_factor = isinstance(cov, Math.FactorCovariance)
+    f = _f(y)
+    for it in range(1, max_iter + 1):
+        cy = cov @ y
+        g = cy - b / y
+        if is_factor:
+            step = cov.add_diagonal(b / (y * y)).solve(g)
+        else:
+            step = np.linalg.solve(cov + np.diag(b / (y * y)), g)
+
+        # Newton decrement as stopping criterion
+        dec = float(g @ step)
+        if .5 * dec <= tol:
+            return y, it, True
+
+        # Stay in the positive orthant and backtrack on the objective
+        neg = step > 0.
+        t = 1.
+        if neg.any():
+            t = min(1., .99 * np.min(y[neg] / step[neg]))
+        while True:
+            y_new = y - t * step
+            f_new = _f(y_new)
+            if f_new <= f - .25 * t * dec:
+                break
+            t *= .5
+            if t < 1e-12:
+                # No more progress possible at machine precision
+                return y, it, bool(.5 * dec <= np.sqrt(tol))
+        y, f = y_new, f_new
+
+    return y, max_iter, False
+
+
+def _rb_ccd(cov: TyCov, b: np.ndarray, y: np.ndarray, tol: float,
+            max_iter: int) -> tuple[np.ndarray, int, bool]:
+    """ Cyclical coordinate descent on the log-barrier objective. Each
+        coordinate is the positive root of the first order condition
+            C_ii y_i^2 + (Cy - C_ii y_i)_i y_i - b_i = 0
+        For a factor model covariance the factor exposures B'y are tracked
+        in place of Cy, hence each coordinate update costs O(K).
+    """
+    diag = cov.diagonal().copy()
+    is_factor = isinstance(cov, Math.FactorCovariance)
+    if is_factor:
+        ld, bf, sv = cov.loadings, cov.loadings * cov.factor_var, cov.specific_var
+        z = ld.T @ y
+    else:
+        cy = cov @ y
+
+    for it in range(1, max_iter + 1):
+        y_old = y.copy()
+        for i in range(y.shape[0]):
+            cyi = bf[i] @ z + sv[i] * y[i] if is_factor else cy[i]
+            c = cyi - diag[i] * y[i]
+            yi = (-c + np.sqrt(c * c + 4. * diag[i] * b[i])) / (2. * diag[i])
+            if is_factor:
+                z += ld[i] * (yi - y[i])
+            else:
+                cy += cov[:, i] * (yi - y[i])
+            y[i] = yi
+
+        if np.max(np.abs(y - y_old)) <= tol * np.max(np.abs(y)):
+            return y, it, True
+
+    return y, max_iter, False
+
+
+def risk_budgeting(cov: TyCov, budgets: Optional[np.ndarray] = None,
+                   method: str = 'newton', tol: float = 1e-14,
+                   max_iter: Optional[int] = None) -> OptimizeResult:
+    """ Long-only risk budgeting portfolio. The problem
+
+            min 1/2 y' C y - sum_i b_i log(y_i)   y > 0
+
+        is strictly convex and its solution, normalized as w = y / sum(y),
+        has risk contributions w_i (C w)_i / (w' C w) equal to the budgets.
+
+        Input:
+            cov [TyCov]: covariance matrix, a factor model is never made
+                dense
+            budgets [Optional[np.ndarray]]: risk budgets, normalized to one.
+                If None the equal risk contribution portfolio is calculated
+                (default: None)
+            method [str]: 'newton' for the damped Newton method or 'ccd' for
+                the cyclical coordinate descent (default: 'newton')
+            tol [float]: tolerance (default: 1e-14)
+            max_iter [Optional[int]]: maximum number of iterations
+                (default: 100 for newton, 1000 for ccd)
+
+        Output:
+            res [OptimizeResult]: result with fields x (weights), rc (risk
+                contributions), success, nit and message
+
+        Exceptions:
+            ValueError: if the method is not recognized or budgets are not
+                strictly positive
+    """
+    n = cov.shape[0]
+    if budgets is None:
+        b = np.full(n, 1. / n)
+    else:
+        b = np.asarray(budgets, dtype=float)
+        if b.shape[0] != n:
+            raise ValueError(f'risk_budgeting(): budgets must be of size {n}')
+        if np.any(b <= .0):
+            raise ValueError('risk_budgeting(): budgets must be positive')
+        b = b / np.sum(b)
+
+    # Start from the inverse volatility portfolio scaled on the budgets
+    y = b / np.sqrt(cov.diagonal())
+    y *= np.sqrt(np.sum(b) / (y @ (cov @ y)))
+
+    if method == 'newton':
+        max_iter = 100 if max_iter is None else max_iter
+        y, it, ok = _rb_newton(cov, b, y, tol, max_iter)
+    elif method == 'ccd':
+        max_iter = 1000 if max_iter is None else max_iter
+        y, it, ok = _rb_ccd(cov, b, y, np.sqrt(tol), max_iter)
+    else:
+        raise ValueError(f'risk_budgeting(): method {method} not recognized')
+
+    w = y / np.sum(y)
+    cw = cov @ w
+    rc = w * cw / (w @ cw)
+    return OptimizeResult(
+        x=w, rc=rc, success=ok, nit=it,
+        message='Optimization terminated successfully' if ok
+        else 'Iteration limit reached'
+    )
@@ -3,23 +3,40 @@
 #
 
 import numpy as np
+from scipy.optimize import OptimizeResult
 from typing import (Optional, Sequence)
 
-from .BaseOptimizer import (BaseOptimizer, OptimizerConf, OptimizerResult)
-
-import nfpy.Math as Math
+from .BaseOptimizer import (BaseOptimizer, OptimizerResult)
+from .RiskBudgeting import risk_budgeting
 
 
 class RiskParityModel(BaseOptimizer):
-    """ Implements the simple Risk Parity Portfolio analysis. """
+    """ Implements the simple Risk Parity Portfolio analysis. Per-asset risk
+        budgets can be given in <risk_budgets>, equal risk contributions are
+        targeted otherwise. The problem is always solved with the dedicated
+        log-barrier solver using <rb_method> ('newton' or 'ccd').
+    """
 
     _LABEL = 'RiskParity'
 
     def __init__(self, returns: np.ndarray, freq: str, labels: Sequence[str],
-                 iterations: int = 50, budget: float = 1., **kwargs):
+                 iterations: int = 50, budget: float = 1.,
+                 risk_budgets: Optional[Sequence[float]] = None,
+                 rb_method: str = 'newton', **kwargs):
         super().__init__(returns=returns, freq=freq, labels=labels,
                          iterations=iterations, budget=budget, **kwargs)
 
+        if risk_budgets is None:
+            risk_tgt = np.ones(self._num_cnsts)
+        else:
+            risk_tgt = np.asarray(risk_budgets, dtype=float)
+            if risk_tgt.shape[0] != self._num_cnsts:
+                raise ValueError(f'RiskParityModel(): risk budgets must be of size {self._num_cnsts}')
+            if np.any(risk_tgt <= .0):
+                raise ValueError('RiskParityModel(): risk budgets must be positive')
+        self._risk_tgt = risk_tgt / np.sum(risk_tgt)
+        self._rb_method = rb_method
+
     def rc(self, wgt: np.ndarray, cov: np.ndarray,
            var: Optional[np.ndarray] = None) -> np.ndarray:
         """ Calculates the Risk Contribution of each asset in the portfolio.
@@ -34,31 +51,15 @@ class RiskParityModel(BaseOptimizer):
                 rc [np.array]: risk contribution of each asset
         """
         if var is None:
-            print('DEVO CALCOLARE A PARTE')
             var = self._var_f(wgt, cov, self._gamma)
-        mrc = np.dot(cov, wgt) / var
+        mrc = (cov @ wgt) / var
         return np.multiply(wgt, mrc)
 
     def _optimize(self) -> OptimizerResult:
 
-        self._mean_ret = Math.compound(
-            np.mean(self._ret, axis=1),
-            self._scaling
-        )
-        self._cov = self._calc_cov()
-
-        risk_tgt = np.ones(self._num_cnsts) / self._num_cnsts
+        self._calc_inputs()
 
-        c = OptimizerConf()
-        c.args = (self._cov, risk_tgt)
-        c.constraints = [
-            {'type': 'ineq', 'fun': lambda x: x},
-            {'type': 'eq', 'fun': self._budget_f},
-            {'type': 'eq', 'fun': self._abs_budget_f}
-        ]
-        c.funct = self._min_funct
-
-        opt = self._minimizer(c)
+        opt = self._rb_solver()
 
         r = self._create_result_obj()
         if (opt is not None) and opt.success:
@@ -74,10 +75,14 @@ class RiskParityModel(BaseOptimizer):
 
         return r
 
-    def _min_funct(self, wgt: np.ndarray, cov: np.ndarray,
-                   risk_tgt: np.ndarray) -> float:
-        # FIXME: here the np.dot(cov, wgt) is calculated twice per iteration
-        var = self._var_f(wgt, cov, self._gamma)
-        rc = self.rc(wgt, cov, var)
-        tgt = np.multiply(var, risk_tgt)
-        return sum(np.square(rc - tgt))
+    def _rb_solver(self) -> OptimizeResult:
+        """ Solve via the convex log-barrier formulation. Risk contributions
+            are invariant to the scale of the weights and all weights have
+            the sign of the budget, hence the long solution is scaled by the
+            budget. The gross exposure equals the budget and is always below
+            the cap.
+        """
+        opt = risk_budgeting(self._reg_cov(), self._risk_tgt,
+                             method=self._rb_method)
+        opt.x = self._budget_constraint[0] * opt.x
+        return opt
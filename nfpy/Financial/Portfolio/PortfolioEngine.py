@@ -3,12 +3,11 @@
 # Work with portfolios
 #
 
-from collections import defaultdict
 import cutils
 import numpy as np
 import pandas as pd
 import pandas.tseries.offsets as off
-from typing import (Any, Iterable)
+from typing import (Any, Iterable, Optional, Sequence, Union)
 
 from .Optimization import optimize_portfolio
 from .Utils import _ret_matrix
@@ -16,6 +15,7 @@ from .Utils import _ret_matrix
 import nfpy.Assets as Ast
 import nfpy.Calendar as Cal
 import nfpy.Math as Math
+import nfpy.Var as Var
 
 
 class PortfolioEngine(object):
@@ -38,6 +38,10 @@ class PortfolioEngine(object):
         self._curr_tot_val = None
         self._curr_wgt = None
 
+        self._hist_uids = None
+        self._hist_qty = None
+        self._hist_val = None
+
     @property
     def portfolio(self) -> Ast.Asset:
         return self._ptf
@@ -108,7 +112,18 @@ class PortfolioEngine(object):
         curr_wgt = self._curr_pos_val / value
         self._ptf.weights = curr_wgt
 
-    def _load_ptf_history(self):
+    def _event_pos(self, dates: Iterable) -> np.ndarray:
+        """ Map event dates to the position of the first calendar date at or
+            after the event. Events before the calendar start are mapped to
+            the first date, events after the end to len(calendar).
+        """
+        days = np.array(
+            [np.datetime64(d, 'D') for d in dates],
+            dtype='datetime64[D]'
+        ).astype(self._dt.dtype)
+        return np.searchsorted(self._dt, days, side='left')
+
+    def _load_ptf_history(self) -> None:
         """ Load the entire history of the portfolio.
             For each given day the order of events is,
                 1. Normal time trades
@@ -116,6 +131,12 @@ class PortfolioEngine(object):
                 3. Trades (fractional @ close)
                 4. Positions
 
+            The history is built as a ledger on the calendar. Quantities are
+            accumulated in pre-split units and divided by the cumulative split
+            factor, trades before the splits of the day are therefore scaled
+            by the factor of the previous day. Cash accounts are reset to the
+            known value at each position snapshot.
+
             FIXME: missing features
                 1. Spin-offs are not accounted for
                 2. Cash positions do not consider dividends
@@ -126,141 +147,184 @@ class PortfolioEngine(object):
         eq_list = set(p[2] for p in pos_hist if p[3] == 'Equity')
         spl_hist = self._load_splits(eq_list)
 
-        # Create a dictionary of dates with "events"
-        events = defaultdict(dict)
-        event_dates = set()
-
-        for i, pos in enumerate(pos_hist):
-            dt = pos[1].date()
-            e = events.get(dt, defaultdict(list))
-            e['p'].append(i)
-            events[dt] = e
-            event_dates.add(dt)
-
-        for i, trd in enumerate(trd_hist):
-            dt = trd[1].date()
-            e = events.get(dt, defaultdict(list))
-            if self._fx.is_ccy(trd[2]):
-                e['t'].append(i)
-            else:
-                _type = 't' if trd[5].is_integer() else 'ft'
-                e[_type].append(i)
-            events[dt] = e
-            event_dates.add(dt)
+        # Rows of the ledger, the base currency account is always present
+        base_ccy = self._ptf.currency
+        uids = {base_ccy}
+        uids.update(t[2] for t in trd_hist)
+        uids.update(t[4] for t in trd_hist)
+        uids.update(p[2] for p in pos_hist)
+        uids = sorted(uids)
+        u_map = {u: i for i, u in enumerate(uids)}
 
+        m, n = len(uids), self._dt.shape[0]
+
+        # Split factors are applied at the close of the day before the split
+        split_f = np.ones((m, n + 1))
         for uid, series in spl_hist.items():
-            for time, val in series.items():
-                dt = (time - off.BDay(1)).date()
-                e = events.get(dt, defaultdict(list))
-                e['s'].append((uid, time))
-                events[dt] = e
-                event_dates.add(dt)
-
-        # Get a sorted unique list of dates with events
-        event_dates = sorted(event_dates)
-
-        # Branch out depending on whether the inception is inside or outside
-        # the span of the calendar.
-        if self._ptf.inception_date >= self._cal.start:
-            df = pd.DataFrame(index=self._cal.calendar)
-            df.loc[self._ptf.inception_date, self._ptf.currency] = .0
-
-            positions = {}
-
-            for date in event_dates:
-                tstamp = pd.Timestamp(date)
-                date_events = events[date]
-
-                # First apply the trades
-                for i in date_events['t']:
-                    trade = trd_hist[i]
-                    uid = trade[2]
-                    side = trade[3]
-                    ccy = trade[4]
-                    q = trade[5]
-                    p = trade[6]
-                    costs = trade[7]
-                    if side == 1:
-                        delta_q = q
-                        delta_cash = -q * p - costs
-                    else:
-                        delta_q = -q
-                        delta_cash = q * p - costs
-                    position = positions.get(uid, .0)
-                    position += delta_q
-                    cash = positions.get(ccy, .0)
-                    cash += delta_cash
-
-                    positions[uid] = position
-                    positions[ccy] = cash
-                    df.loc[tstamp, uid] = position
-                    df.loc[tstamp, ccy] = cash
-
-                # Apply splits
-                # The split if applied the day before as the adjusting trades
-                # are executed the daz before.
-                for uid, time in date_events['s']:
-                    split = spl_hist[uid].at[time]
-                    position = positions.get(uid, .0)
-                    position /= split
-                    positions[uid] = position
-                    df.loc[tstamp, uid] = position
-
-                # Apply fractional trades to clean up after splits
-                # FIXME: This does not work if fractional trades are allowed.
-                #        It must be checked the trading phase. If is 'closing'
-                #        the trade should be accounted for in the position the
-                #        day after. The fact is fractional is irrelevant.
-                for i in date_events['ft']:
-                    trade = trd_hist[i]
-                    uid = trade[2]
-                    side = trade[3]
-                    ccy = trade[4]
-                    q = trade[5]
-                    p = trade[6]
-                    costs = trade[7]
-                    if side == 1:
-                        delta_q = q
-                        delta_cash = -q * p - costs
-                    else:
-                        delta_q = -q
-                        delta_cash = q * p - costs
-                    position = positions.get(uid, .0)
-                    position += delta_q
-                    cash = positions.get(ccy, .0)
-                    cash += delta_cash
-
-                    positions[uid] = position
-                    positions[ccy] = cash
-                    df.loc[tstamp, uid] = position
-                    df.loc[tstamp, ccy] = cash
-
-                # Check the position
-                for i in date_events['p']:
-                    pos = pos_hist[i]
-                    uid = pos[2]
-                    position = positions.get(uid, .0)
-
-                    # Cash positions are never exact due to dividends and fees.
-                    # We therefore "reset" the position whenever we know exact
-                    # values.
-                    # TODO: calculate and log the deviation of the cash position
-                    #       <time_between_pos>, <abs. dev.>, <perc. dev.>
-                    #       for each cash position.
-                    if pos[3] == 'Cash':
-                        df.loc[tstamp, uid] = pos[5]
-                    else:
-                        assert position == pos[5], \
-                            f'PortfolioEngine(): {uid}: {position:.5f} != {pos[5]:.5f} @ {date}'
-
-        else:
-            # TODO: to do the case in which the inception is before the start
-            #       of the calendar.
-            pass
-        # Go through the list of events and apply them in the appropriate order
+            if series.empty:
+                continue
+            t_pos = self._event_pos(
+                (t - off.BDay(1)).date() for t in series.index
+            )
+            np.multiply.at(split_f[u_map[uid]], t_pos, series.to_numpy())
+        cum_split = np.cumprod(split_f, axis=1)[:, :n]
+        prev_split = np.hstack((np.ones((m, 1)), cum_split[:, :-1]))
+
+        # Trades. Quantities are converted in pre-split units using the split
+        # factor in force at the time of the trade.
+        delta_q = np.zeros((m, n + 1))
+        delta_c = np.zeros((m, n + 1))
+        if trd_hist:
+            t_pos = self._event_pos(t[1].date() for t in trd_hist)
+            t_pos_c = np.minimum(t_pos, n - 1)
+            u_idx = np.array([u_map[t[2]] for t in trd_hist])
+            c_idx = np.array([u_map[t[4]] for t in trd_hist])
+            side = np.array([1. if t[3] == 1 else -1. for t in trd_hist])
+            q = np.array([t[5] for t in trd_hist], dtype=float)
+            p = np.array([t[6] for t in trd_hist], dtype=float)
+            costs = np.array([t[7] for t in trd_hist], dtype=float)
+
+            # Fractional trades are executed after the splits of the day
+            is_frac = np.array([
+                (not self._fx.is_ccy(t[2])) and (not float(t[5]).is_integer())
+                for t in trd_hist
+            ])
+            factor = np.where(
+                is_frac,
+                cum_split[u_idx, t_pos_c],
+                prev_split[u_idx, t_pos_c]
+            )
 
+            np.add.at(delta_q, (u_idx, t_pos), side * q * factor)
+            np.add.at(delta_c, (c_idx, t_pos), -side * q * p - costs)
+
+        # Cash movements only affect currency accounts that are never split
+        ledger = np.cumsum(delta_q, axis=1)[:, :n] / cum_split \
+            + np.cumsum(delta_c, axis=1)[:, :n]
+
+        # Position snapshots. Cash accounts are never exact due to dividends
+        # and fees, we therefore "reset" them whenever we know exact values.
+        # TODO: calculate and log the deviation of the cash position
+        #       <time_between_pos>, <abs. dev.>, <perc. dev.>
+        #       for each cash position.
+        if pos_hist:
+            p_pos = self._event_pos(p[1].date() for p in pos_hist)
+            is_cash = np.array([p[3] == 'Cash' for p in pos_hist])
+            keep = p_pos < n
+            u_idx = np.array([u_map[p[2]] for p in pos_hist])
+            value = np.array([p[5] for p in pos_hist], dtype=float)
+
+            sel = keep & is_cash
+            reset = np.full((m, n), -1, dtype=int)
+            reset_v = np.zeros((m, n))
+            reset[u_idx[sel], p_pos[sel]] = p_pos[sel]
+            reset_v[u_idx[sel], p_pos[sel]] = value[sel]
+            last = np.maximum.accumulate(reset, axis=1)
+
+            rows = np.arange(m)[:, None]
+            last_c = np.maximum(last, 0)
+            adj = reset_v[rows, last_c] - ledger[rows, last_c]
+            ledger += np.where(last >= 0, adj, .0)
+
+            sel = keep & ~is_cash
+            calc = ledger[u_idx[sel], p_pos[sel]]
+            wrong = ~np.isclose(calc, value[sel], rtol=1e-9, atol=1e-9)
+            if wrong.any():
+                k = np.where(sel)[0][np.argmax(wrong)]
+                pos = pos_hist[k]
+                position = ledger[u_idx[k], p_pos[k]]
+                raise AssertionError(
+                    f'PortfolioEngine(): {pos[2]}: {position:.5f} != '
+                    f'{pos[5]:.5f} @ {pos[1].date()}'
+                )
+
+        self._hist_uids = uids
+        self._hist_qty = ledger
+        self._hist_val = None
+        self._ptf._cnsts_df = pd.DataFrame(
+            ledger.T,
+            index=self._cal.calendar[self._slc],
+            columns=uids
+        )
         self._ptf._is_history_loaded = True
 
+    def _price_matrix(self, uids: Sequence[str]) -> np.ndarray:
+        """ Matrix <uid, time> of prices in base currency, forward filled with
+            the last valid value. Currencies have a price of one unit.
+        """
+        base_ccy = self._ptf.currency
+        res = np.empty((len(uids), self._dt.shape[0]))
+
+        for i, uid in enumerate(uids):
+            if self._fx.is_ccy(uid):
+                p, ccy = 1., uid
+            else:
+                asset = self._af.get(uid)
+                p, ccy = asset.prices.to_numpy()[self._slc], asset.currency
+
+            fx = 1.
+            if ccy != base_ccy:
+                fx = self._fx.get(ccy, base_ccy).prices
+                if isinstance(fx, pd.Series):
+                    fx = fx.to_numpy()[self._slc]
+            res[i, :] = p * fx
+
+        # Forward fill the missing values
+        mask = np.isnan(res)
+        idx = np.where(~mask, np.arange(res.shape[1])[None, :], 0)
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        return res[np.arange(res.shape[0])[:, None], idx]
+
+    def _calc_hist_values(self) -> None:
+        """ Value the history of positions in base currency. """
+        if not self._ptf._is_history_loaded:
+            self._load_ptf_history()
+
+        prices = self._price_matrix(self._hist_uids)
+        self._hist_val = self._hist_qty * prices
+
+    @property
+    def positions_history(self) -> pd.DataFrame:
+        """ Returns the history of quantities, and cash balances, held. """
+        if not self._ptf._is_history_loaded:
+            self._load_ptf_history()
+        return self._ptf.positions_hist
+
+    @property
+    def values_history(self) -> pd.DataFrame:
+        """ Returns the history of position values in base currency. """
+        if self._hist_val is None:
+            self._calc_hist_values()
+        return pd.DataFrame(
+            self._hist_val.T,
+            index=self._cal.calendar[self._slc],
+            columns=self._hist_uids
+        )
+
+    @property
+    def nav_history(self) -> pd.Series:
+        """ Returns the history of the portfolio value in base currency. """
+        if self._hist_val is None:
+            self._calc_hist_values()
+        return pd.Series(
+            np.nansum(self._hist_val, axis=0),
+            index=self._cal.calendar[self._slc]
+        )
+
+    @property
+    def weights_history(self) -> pd.DataFrame:
+        """ Returns the history of the constituent weights in base currency. """
+        if self._hist_val is None:
+            self._calc_hist_values()
+        nav = np.nansum(self._hist_val, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wgt = self._hist_val / nav
+        return pd.DataFrame(
+            wgt.T,
+            index=self._cal.calendar[self._slc],
+            columns=self._hist_uids
+        )
+
     def _load_splits(self, eq_uids: Iterable) -> dict[str, pd.Series]:
         """ Fetch the list of splits for all equities in the portfolio. """
         return {
@@ -268,25 +332,54 @@ class PortfolioEngine(object):
             for u in eq_uids
         }
 
-    def correlation(self) -> np.ndarray:
-        """ Get the correlation matrix for the underlying constituents. """
-        ret_matrix = _ret_matrix(
-            self._ptf.constituents_uids,
-            self._ptf.currency
-        )[:, self._slc]
-        v = cutils.dropna(ret_matrix, 1)
+    def correlation(self, method: str = 'sample', **kwargs) -> np.ndarray:
+        """ Get the correlation matrix for the underlying constituents. See
+            covariance() for the input parameters.
+        """
+        cov = self.covariance(method, **kwargs)
+        if isinstance(cov, Math.FactorCovariance):
+            cov = cov.to_dense()
+        return Math.cov2corr(cov)
+
+    def covariance(self, method: str = 'sample', **kwargs) \
+            -> Union[np.ndarray, Math.FactorCovariance]:
+        """ Get the covariance matrix for the underlying constituents. The
+            estimate is cached globally and shared with the other portfolios
+            on the same universe and window, it is recalculated if the
+            returns in the window have changed. The sample covariance is
+            updated incrementally when the window moves.
 
-        return np.corrcoef(v)
+            Input:
+                method [str]: covariance estimator, one of 'sample',
+                    'ledoit_wolf', 'ewma', 'pairwise', 'pca'
+                    (default: 'sample')
+                kwargs: parameters of the estimator
 
-    def covariance(self) -> np.ndarray:
-        """ Get the covariance matrix for the underlying constituents. """
-        ret_matrix = _ret_matrix(
-            self._ptf.constituents_uids,
-            self._ptf.currency
-        )[:, self._slc]
-        v = cutils.dropna(ret_matrix, 1)
+            Output:
+                cov [Union[np.ndarray, Math.FactorCovariance]]: covariance
+                    matrix or the statistical factor model for the 'pca'
+                    method
+        """
+        uids = self._ptf.constituents_uids
+        v = _ret_matrix(uids, self._ptf.currency)[:, self._slc]
+        cache = Math.get_cov_cache_glob()
+        universe = tuple([self._ptf.currency] + list(uids))
+        key = cache.key(
+            universe, (self._dt[0], self._dt[-1]), 'B', cache.stamp(v),
+            method, **kwargs
+        )
+
+        def _calc() -> np.ndarray:
+            # The sample covariance follows the moving window incrementally
+            if (method == 'sample') and (kwargs.get('ddof', 1) == 1) and \
+                    (set(kwargs) <= {'ddof'}):
+                return cache.rolling((universe, 'B', method), self._dt, v)
 
-        return np.cov(v)
+            # The pairwise estimator uses incomplete observations as well
+            x = v if method == 'pairwise' else cutils.dropna(v, 1)
+            return Math.covariance(x, method, **kwargs)
+
+        return cache.get(key, _calc)
 
     def optimize(self, method: str, parameters: dict[str, Any]):
         """ Prepare the data for optimizers and launch a portfolio optimization.
@@ -317,6 +410,45 @@ class PortfolioEngine(object):
         """ Calculates the Portfolio Diversification Index """
         return Math.pdi(self.covariance())
 
+    def var_mc(self, horizon: int, paths: int,
+               confidence: Sequence[float] = (.95, .99),
+               observations: Optional[int] = None,
+               mem_budget: int = 2 ** 28,
+               seed: Optional[int] = None, **kwargs) -> Var.MCVarResult:
+        """ Monte Carlo Value at Risk of the current positions in base
+            currency. The risk factors are the constituents returns in base
+            currency.
+
+            Input:
+                horizon [int]: horizon of the VaR in business days
+                paths [int]: number of simulated paths
+                confidence [Sequence[float]]: confidence levels
+                    (default: (.95, .99))
+                observations [Optional[int]]: number of past observations used
+                    to estimate the risk factors, all if None (default: None)
+                mem_budget [int]: memory available for the simulation in
+                    bytes (default: 256MB)
+                seed [Optional[int]]: seed of the random generator
+                    (default: None)
+                kwargs: variance reduction options of Var.MonteCarloVar
+
+            Output:
+                res [Var.MCVarResult]: VaR and expected shortfall of the
+                    portfolio and of the single positions
+        """
+        uids = self._ptf.constituents_uids
+        ret = _ret_matrix(uids, self._ptf.currency)[:, self._slc]
+        ret = np.log1p(ret[:, ~np.any(np.isnan(ret), axis=0)])
+        if observations is not None:
+            ret = ret[:, -int(observations):]
+
+        # The base currency cash, last of the positions, carries no risk
+        return Var.MonteCarloVar(
+            ret, self.positions_value[:-1], horizon, paths,
+            confidence=confidence, labels=uids,
+            mem_budget=mem_budget, seed=seed, **kwargs
+        ).result
+
     def summary(self) -> dict[str, Any]:
         """ Show the portfolio summary at t0 in the portfolio base currency. """
 
@@ -0,0 +1,287 @@
+#
+# Walk-forward optimization engine
+# Rolling re-optimization of portfolios over sliding windows of returns
+#
+
+import numpy as np
+import pandas as pd
+from typing import (Any, Optional, Sequence, Union)
+
+from .Optimizer import (OptimizerResult, TyOptimizer)
+from .Utils import _ret_matrix
+
+import nfpy.Calendar as Cal
+import nfpy.Math as Math
+from nfpy.Tools import (Constants as Cn, Utilities as Ut)
+
+
+class WalkForwardResult(Ut.AttributizedDict):
+    """ Object containing the result of the walk-forward optimization. """
+
+    def __init__(self):
+        super().__init__()
+        self.model = None
+        self.labels = None
+        self.dates = None
+        self.success = None
+        self.weights = None
+        self.ptf_return = None
+        self.ptf_variance = None
+        self.turnover = None
+        self.avg_turnover = np.nan
+        self.tot_turnover = np.nan
+
+
+class WalkForwardEngine(object):
+    """ Runs an optimizer over sliding windows of the returns matrix. The mean
+        returns and the sample covariance are updated incrementally between
+        windows by adding the entering and removing the exiting observations.
+        If another estimator is requested in the 'cov_method' and
+        'cov_params' parameters of the optimizer, the covariance is estimated
+        on each window with Math.covariance(). Each optimization is warm
+        started from the previous weights.
+        Observations with any missing return are excluded from the window
+        statistics as done by optimize_portfolio().
+
+        For optimizers returning a frontier of portfolios, the portfolio with
+        the highest Sharpe ratio is retained.
+
+        Input:
+            returns [np.ndarray]: matrix of returns <uid, time>
+            method [Union[str, TyOptimizer]]: optimizer class or its name
+            labels [Sequence[str]]: labels of the constituents
+            window [int]: length of the estimation window in periods
+            step [int]: number of periods between rebalancing (default: 1)
+            freq [str]: frequency of the returns (default: 'B')
+            dates [Optional[np.ndarray]]: dates of the returns (default: None)
+            parameters [Optional[dict[str, Any]]]: parameters of the
+                optimizer (default: None)
+    """
+
+    # Number of incremental updates before recomputing the sums from scratch
+    # to bound the accumulation of rounding errors
+    _REFRESH = 250
+
+    def __init__(self, returns: np.ndarray, method: Union[str, TyOptimizer],
+                 labels: Sequence[str], window: int, step: int = 1,
+                 freq: str = 'B', dates: Optional[np.ndarray] = None,
+                 parameters: Optional[dict[str, Any]] = None):
+        if returns.ndim != 2:
+            raise ValueError('WalkForwardEngine(): returns matrix not 2D')
+        if returns.shape[0] != len(labels):
+            raise ValueError('WalkForwardEngine(): labels and returns must have the same size')
+        if (window < 2) or (window > returns.shape[1]):
+            raise ValueError(f'WalkForwardEngine(): window must be in [2, {returns.shape[1]}]')
+        if step < 1:
+            raise ValueError('WalkForwardEngine(): step must be positive')
+        if (dates is not None) and (len(dates) != returns.shape[1]):
+            raise ValueError('WalkForwardEngine(): dates and returns must have the same length')
+
+        if isinstance(method, str):
+            symbol = '.'.join(['nfpy.Financial.Portfolio.Optimizer', method, method])
+            method = Ut.import_symbol(symbol)
+
+        self._ret = returns
+        self._class = method
+        self._labels = labels
+        self._window = window
+        self._step = step
+        self._freq = freq
+        self._dates = dates
+        self._params = parameters if parameters else {}
+        self._scaling = Cn.FREQ_2_D[freq]['Y']
+
+        # Covariance estimator requested to the optimizer, the incremental
+        # update is exact only for the sample covariance
+        self._cov_method = self._params.get('cov_method', 'sample')
+        self._cov_params = dict(self._params.get('cov_params') or {})
+        if self._cov_method == 'sample':
+            self._ddof = int(self._cov_params.pop('ddof', 1))
+            if self._cov_params:
+                raise ValueError(f'WalkForwardEngine(): sample covariance parameters {list(self._cov_params)} not recognized')
+
+        self._res = None
+
+    @property
+    def result(self) -> WalkForwardResult:
+        if self._res is None:
+            self._res = self._calculate()
+        return self._res
+
+    def _window_stats(self) -> tuple:
+        """ Generator of the statistics of the sliding windows. Yields the
+            end of the window (excluded), the mask of the valid observations,
+            and the annualized mean returns and covariance. The covariance is
+            a Math.FactorCovariance for the 'pca' estimator.
+        """
+        valid = ~np.any(np.isnan(self._ret), axis=0)
+        x = np.where(valid, self._ret, .0)
+        n_dates, w = x.shape[1], self._window
+
+        s1 = s2 = cnt = None
+        start = end = 0
+        for k, t in enumerate(range(w, n_dates + 1, self._step)):
+            new_start = t - w
+            if (k % self._REFRESH == 0) or (new_start >= end):
+                # Full computation on the window
+                blk = x[:, new_start:t]
+                s1 = blk.sum(axis=1)
+                s2 = blk @ blk.T
+                cnt = int(valid[new_start:t].sum())
+            else:
+                # Add the entering and remove the exiting observations
+                add, rem = x[:, end:t], x[:, start:new_start]
+                s1 += add.sum(axis=1) - rem.sum(axis=1)
+                s2 += add @ add.T - rem @ rem.T
+                cnt += int(valid[end:t].sum()) - int(valid[start:new_start].sum())
+            start, end = new_start, t
+
+            mask = valid[start:end]
+            if cnt < 2:
+                yield t, mask, None, None
+                continue
+
+            mean = s1 / cnt
+            if self._cov_method == 'sample':
+                cov = (s2 - cnt * np.outer(mean, mean)) / (cnt - self._ddof)
+            else:
+                cov = Math.covariance(
+                    self._ret[:, start:end][:, mask],
+                    self._cov_method, **self._cov_params
+                )
+            yield t, mask, \
+                Math.compound(mean, self._scaling), \
+                cov * self._scaling
+
+    @staticmethod
+    def _select(res: OptimizerResult) -> Optional[int]:
+        """ Index of the portfolio to retain from the optimizer result. """
+        if (not res.success) or (res.len == 0):
+            return None
+        if res.len == 1:
+            return 0
+        return int(np.nanargmax(res.sharpe))
+
+    def _calculate(self) -> WalkForwardResult:
+        n = self._ret.shape[0]
+        ends, success, weights = [], [], []
+        ptf_ret, ptf_var = [], []
+
+        prev_w = None
+        for t, mask, mean, cov in self._window_stats():
+            ends.append(t - 1)
+
+            idx = None
+            if mean is not None:
+                model = self._class(
+                    self._ret[:, t - self._window:t][:, mask],
+                    self._freq, self._labels, **self._params
+                )
+                model.mean_returns = mean
+                model.covariance = cov
+                model.warm_start = prev_w
+                res = model.result
+                idx = self._select(res)
+
+            if idx is None:
+                success.append(False)
+                weights.append(np.full(n, np.nan))
+                ptf_ret.append(np.nan)
+                ptf_var.append(np.nan)
+                continue
+
+            prev_w = np.asarray(res.weights[idx], dtype=float)
+            success.append(True)
+            weights.append(prev_w)
+            ptf_ret.append(res.ptf_return[idx])
+            ptf_var.append(res.ptf_variance[idx])
+
+        weights = np.array(weights).reshape(-1, n)
+
+        # Turnover between consecutive successful rebalancing
+        success = np.array(success, dtype=bool)
+        turnover = np.full(len(ends), np.nan)
+        pos = np.where(success)[0]
+        if pos.shape[0] > 1:
+            turnover[pos[1:]] = np.sum(
+                np.abs(np.diff(weights[pos], axis=0)),
+                axis=1
+            )
+
+        r = WalkForwardResult()
+        r.model = self._class.__name__
+        r.labels = self._labels
+        r.dates = np.array(ends) if self._dates is None \
+            else np.asarray(self._dates)[ends]
+        r.success = success
+        r.weights = weights
+        r.ptf_return = np.array(ptf_ret)
+        r.ptf_variance = np.array(ptf_var)
+        r.turnover = turnover
+        if pos.shape[0] > 1:
+            r.avg_turnover = float(np.nanmean(turnover))
+            r.tot_turnover = float(np.nansum(turnover))
+        return r
+
+    def weights_series(self) -> pd.DataFrame:
+        """ Returns the weights held on each date, as set at the last
+            rebalancing. Dates before the first rebalancing are NaN.
+        """
+        res = self.result
+        n_dates = self._ret.shape[1]
+        index = self._dates if self._dates is not None else np.arange(n_dates)
+
+        held = np.full((n_dates, self._ret.shape[0]), np.nan)
+        ends = np.searchsorted(index, res.dates) if self._dates is not None \
+            else res.dates
+        held[ends] = res.weights
+
+        # Failed rebalancing keep the previous weights
+        return pd.DataFrame(held, index=index, columns=self._labels).ffill()
+
+
+def walk_forward(
+        method: str,
+        parameters: dict[str, Any],
+        uids: Sequence[str],
+        tgt_ccy: str,
+        window: int,
+        step: int = 1,
+        dates_slice: slice | None = None,
+        labels: Sequence[str] | None = None
+) -> WalkForwardEngine:
+    """ Prepare the data for a walk-forward optimization of a portfolio. The
+        returns matrix is built once on the calendar.
+
+        Input:
+            method [str]: indicated which optimization we want
+            parameters [dict[str, Any]]: parameters to use for the
+                optimization
+            uids [Iterable[str]]: list of uids to use
+            tgt_ccy [str]: currency of the returns
+            window [int]: length of the estimation window in periods
+            step [int]: number of periods between rebalancing (default: 1)
+            dates_slice [Optional[slice]]: slice of the calendar
+            labels [Optional[Sequence[str]]]: labels to use in place of the uids
+                in the output, must be of the same size as <uids>
+
+        Output:
+            engine [WalkForwardEngine]: the engine, results are calculated on
+                first access to WalkForwardEngine.result
+    """
+    if labels is not None:
+        if len(uids) != len(labels):
+            raise ValueError('walk_forward(): uids and labels must have the same size')
+    else:
+        labels = uids
+
+    dates = Cal.get_calendar_glob().calendar.values
+    ret_matrix = _ret_matrix(uids, tgt_ccy)
+    if dates_slice:
+        ret_matrix = ret_matrix[:, dates_slice]
+        dates = dates[dates_slice]
+
+    return WalkForwardEngine(
+        ret_matrix, method, labels, window, step,
+        freq='B', dates=dates, parameters=parameters
+    )
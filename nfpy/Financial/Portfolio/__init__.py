@@ -1,8 +1,10 @@
 from .Optimizer import *
 from .Optimization import optimize_portfolio
 from .PortfolioEngine import PortfolioEngine
+from .WalkForward import (walk_forward, WalkForwardEngine, WalkForwardResult)
 
 __all__ = [
     'optimize_portfolio',
-    'PortfolioEngine', 'TyOptimizer'
+    'PortfolioEngine', 'TyOptimizer',
+    'walk_forward', 'WalkForwardEngine', 'WalkForwardResult'
 ]
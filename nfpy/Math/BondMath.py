@@ -12,7 +12,7 @@ from nfpy.Tools import (Constants as Cn, Exceptions as Ex)
 
 from .DiscountFactor import dcf
 from .EquityMath import fv
-from .TSUtils_ import trim_ts
+from .TSUtils_ import (search_trim_pos, trim_ts)
 
 
 def ytm(cf: np.ndarray, p0: float, acc: float = .0) -> float:
@@ -121,7 +121,7 @@ def cash_flows(cf: np.ndarray, dt: np.ndarray, ty: np.ndarray,
             dt [np.ndarray]: array of dates
             perc [float]: percentage of cash flow accrued
     """
-    pf, dts = trim_ts(cf, dt, start=date)
+    dts, pf, _ = trim_ts(dt, cf, start=date)
     n = len(pf)
     ty, perc = ty[-n:], .0
 
@@ -141,6 +141,201 @@ def cash_flows(cf: np.ndarray, dt: np.ndarray, ty: np.ndarray,
     return v, dts, perc
 
 
+def _prepare_dates(dates: Union[np.datetime64, np.ndarray],
+                   values: Union[np.ndarray, float],
+                   inception: np.datetime64, maturity: np.datetime64) \
+        -> tuple[np.ndarray, np.ndarray]:
+    """ Broadcast dates and values (prices or rates) to arrays of the same
+        length and trim them to the life of the bond.
+    """
+    dates = np.atleast_1d(np.asarray(dates))
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    if dates.shape[0] == 1 and values.shape[0] > 1:
+        dates = np.repeat(dates, values.shape[0])
+    elif values.shape[0] == 1 and dates.shape[0] > 1:
+        values = np.repeat(values, dates.shape[0])
+
+    slc = search_trim_pos(dates, start=inception, end=maturity)
+    if slc is None:
+        return np.array([]), np.array([])
+    return dates[slc], values[slc]
+
+
+def cash_flows_matrix(dates: np.ndarray, inception: np.datetime64,
+                      cf_values: np.ndarray, cf_dates: np.ndarray,
+                      cf_types: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Vectorized version of cash_flows() over many reference dates. For each
+        date the cash flows still to be paid are given with their time
+        distance in years, applying the accrued interest to the first coupon.
+        Cash flows already paid have value zero.
+
+        Input:
+            dates [np.ndarray]: array of reference dates
+            inception [np.datetime64]: inception date of the bond
+            cf_values [np.ndarray]: array of cash flows
+            cf_dates [np.ndarray]: array of cash flow dates
+            cf_types [np.ndarray]: array of cash flow types
+
+        Output:
+            t [np.ndarray]: (dates, cash flows) time distances in years
+            v [np.ndarray]: (dates, cash flows) values of the cash flows
+    """
+    td = np.timedelta64(Cn.DAYS_IN_1Y, 'D')
+    m, n = dates.shape[0], cf_dates.shape[0]
+
+    t = (cf_dates[None, :] - dates[:, None]) / td
+    v = np.tile(np.asarray(cf_values, dtype=float), (m, 1))
+
+    # Cash flows on or after the reference date are still to be paid
+    first = np.searchsorted(cf_dates, dates, side='left')
+    paid = np.arange(n)[None, :] < first[:, None]
+    v[paid] = .0
+
+    # Accrue the first coupon to be paid over the current coupon period
+    cou_pos = np.where(cf_types == get_dt_glob().get('cfC'))[0]
+    if cou_pos.shape[0] > 0:
+        nxt = np.searchsorted(cf_dates, dates, side='right')
+        has_nxt = nxt < n
+        nxt_c = np.minimum(nxt, n - 1)
+
+        t_old = np.where(
+            nxt > 0,
+            cf_dates[np.maximum(nxt - 1, 0)],
+            inception
+        )
+        perc = (cf_dates[nxt_c] - dates) / (cf_dates[nxt_c] - t_old)
+        perc = np.where(perc == 1., .0, perc)
+
+        k = np.searchsorted(cou_pos, first, side='left')
+        rows = np.where((k < cou_pos.shape[0]) & has_nxt)[0]
+        cols = cou_pos[k[rows]]
+        v[rows, cols] *= perc[rows]
+
+    return t, v
+
+
+def _price(t: np.ndarray, v: np.ndarray, r: np.ndarray, order: int = 0) \
+        -> tuple[np.ndarray, ...]:
+    """ Price of the cash flows and its first <order> derivatives with respect
+        to the yearly compounded rate.
+    """
+    base = 1. + r[:, None]
+    disc = v * base ** -t
+    res = [disc.sum(axis=1)]
+    if order > 0:
+        d1 = t * disc / base
+        res.append(-d1.sum(axis=1))
+        if order > 1:
+            res.append(((t + 1.) * d1 / base).sum(axis=1))
+    return tuple(res)
+
+
+def ytm_vec(t: np.ndarray, v: np.ndarray, p0: np.ndarray,
+            acc: Union[np.ndarray, float] = .0, tol: float = 1e-10,
+            max_iter: int = 50) -> np.ndarray:
+    """ Vectorized yield to maturity. Each row of the <t>, <v> matrices is a
+        set of cash flows, for instance one bond at different dates or
+        different bonds at the same date (padding with zero values). Halley
+        iterations are run on all the rows at once, the rows not converged
+        are solved by bisection on a bracketing interval.
+
+        Input:
+            t [np.ndarray]: (n, cash flows) time distances in years
+            v [np.ndarray]: (n, cash flows) values of the cash flows
+            p0 [np.ndarray]: (n,) market prices, NaN are skipped
+            acc [Union[np.ndarray, float]]: accrued interest to subtract from
+                the dirty price (default: .0)
+            tol [float]: tolerance on the yield (default: 1e-10)
+            max_iter [int]: maximum number of iterations (default: 50)
+
+        Output:
+            res [np.ndarray]: (n,) yields to maturity
+    """
+    p = np.asarray(p0, dtype=float) + acc
+    n = p.shape[0]
+    r = np.full(n, .02)
+    active = ~np.isnan(p)
+    done = np.zeros(n, dtype=bool)
+
+    for _ in range(max_iter):
+        idx = np.where(active & ~done)[0]
+        if idx.shape[0] == 0:
+            break
+
+        f, d1, d2 = _price(t[idx], v[idx], r[idx], order=2)
+        f -= p[idx]
+        den = 2. * d1 * d1 - f * d2
+        step = np.where(den != 0., 2. * f * d1 / den, f / d1)
+
+        r_new = r[idx] - step
+        bad = ~np.isfinite(r_new) | (r_new <= -1.)
+        r[idx] = np.where(bad, r[idx], r_new)
+        done[idx] = ~bad & (np.abs(step) < tol)
+        active[idx[bad]] = False
+
+    # Bracketing fallback for the rows not converged
+    fail = np.where(~done & ~np.isnan(p))[0]
+    if fail.shape[0] > 0:
+        lo = np.full(fail.shape[0], -.99)
+        hi = np.full(fail.shape[0], 10.)
+        f_lo = _price(t[fail], v[fail], lo)[0] - p[fail]
+        f_hi = _price(t[fail], v[fail], hi)[0] - p[fail]
+        ok = np.sign(f_lo) != np.sign(f_hi)
+
+        for _ in range(200):
+            mid = .5 * (lo + hi)
+            f_mid = _price(t[fail], v[fail], mid)[0] - p[fail]
+            same = np.sign(f_mid) == np.sign(f_lo)
+            lo = np.where(same, mid, lo)
+            f_lo = np.where(same, f_mid, f_lo)
+            hi = np.where(same, hi, mid)
+            if np.max(hi - lo) < tol:
+                break
+
+        r[fail] = np.where(ok, .5 * (lo + hi), np.nan)
+
+    r[np.isnan(p)] = np.nan
+    return r
+
+
+def calc_ytm_dur_cvx(dates: Union[np.datetime64, np.ndarray],
+                     inception: np.datetime64, maturity: np.datetime64,
+                     prices: Union[np.ndarray, float], cf_values: np.ndarray,
+                     cf_dates: np.ndarray, cf_types: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ Calculate together yield to maturity, duration and convexity of a bond
+        for all the given dates at once.
+
+        Input:
+            dates [Union[np.datetime64, np.ndarray]]: array of dates
+            inception [np.datetime64]: inception date of the bond
+            maturity [np.datetime64]: maturity date of the bond
+            prices [Union[np.ndarray, float]]: array of prices
+            cf_values [np.ndarray]: array of cash flows
+            cf_dates [np.ndarray]: array of cash flow dates
+            cf_types [np.ndarray]: array of cash flow types
+
+        Output:
+            ytm [np.ndarray]: array of yields to maturity
+            dur [np.ndarray]: array of durations
+            cvx [np.ndarray]: array of convexities
+            dts [np.ndarray]: array of dates
+    """
+    dts, p = _prepare_dates(dates, prices, inception, maturity)
+    if dts.shape[0] == 0:
+        # Quick exit if no dates
+        e = np.array([])
+        return e, e, e, e
+
+    t, v = cash_flows_matrix(dts, inception, cf_values, cf_dates, cf_types)
+    y = ytm_vec(t, v, p)
+
+    wflow = v * (1. + y[:, None]) ** -t
+    dur = (wflow * t).sum(axis=1) / p
+    cvx = (wflow * t * t).sum(axis=1) / p
+    return y, dur, cvx, dts
+
+
 def calc_fv(dates: Union[np.datetime64, np.ndarray], inception: np.datetime64,
             maturity: np.datetime64, prices: Union[np.ndarray, float],
             cf_values: np.ndarray, cf_dates: np.ndarray, cf_types: np.ndarray,
@@ -163,33 +358,14 @@ def calc_fv(dates: Union[np.datetime64, np.ndarray], inception: np.datetime64,
             v [np.ndarray]: array of fair values
             dts [np.ndarray]: array of dates
     """
-    # Prepare input data
     _ = prices
-    is_single_date = isinstance(dates, np.datetime64)
-    is_single_rate = isinstance(rates, float)
-    if is_single_date & is_single_rate:
-        dates = np.array([dates])
-        rates = np.array([rates])
-    elif is_single_rate:
-        rates = np.array([rates] * len(dates))
-    elif is_single_date:
-        dates = np.array([dates] * len(rates))
-
-    # Quick exit if no dates
-    _, dts = trim_ts(None, dates, start=inception, end=maturity)
-    n = len(dts)
-    if n == 0:
+    dts, r = _prepare_dates(dates, rates, inception, maturity)
+    if dts.shape[0] == 0:
+        # Quick exit if no dates
         return np.array([]), np.array([])
 
-    v = np.empty(n)
-    for i in range(n):
-        dt, r_, t_ = dts[i], rates[i], None
-        try:
-            pf, _, _ = cash_flows(cf_values, cf_dates, cf_types, dt, inception)
-            v[i] = fv(pf, r_, t_)
-        except Ex.IsNoneError:
-            v[i] = np.nan
-    return v, dts
+    t, v = cash_flows_matrix(dts, inception, cf_values, cf_dates, cf_types)
+    return _price(t, v, r)[0], dts
 
 
 def calc_ytm(dates: Union[np.datetime64, np.ndarray], inception: np.datetime64,
@@ -215,8 +391,9 @@ def calc_ytm(dates: Union[np.datetime64, np.ndarray], inception: np.datetime64,
             dts [np.ndarray]: array of dates
     """
     _ = rates
-    return _gen_bm_func('ytm', dates, inception, maturity, prices,
-                        cf_values, cf_dates, cf_types)
+    y, _, _, dts = calc_ytm_dur_cvx(dates, inception, maturity, prices,
+                                    cf_values, cf_dates, cf_types)
+    return y, dts
 
 
 def calc_duration(dates: Union[np.datetime64, np.ndarray],
@@ -244,8 +421,9 @@ def calc_duration(dates: Union[np.datetime64, np.ndarray],
             dts [np.ndarray]: array of dates
     """
     _ = rates
-    return _gen_bm_func('dur', dates, inception, maturity, prices,
-                        cf_values, cf_dates, cf_types)
+    _, dur, _, dts = calc_ytm_dur_cvx(dates, inception, maturity, prices,
+                                      cf_values, cf_dates, cf_types)
+    return dur, dts
 
 
 def calc_convexity(dates: Union[np.datetime64, np.ndarray],
@@ -273,58 +451,9 @@ def calc_convexity(dates: Union[np.datetime64, np.ndarray],
             dts [np.ndarray]: array of dates
     """
     _ = rates
-    return _gen_bm_func('cvx', dates, inception, maturity, prices,
-                        cf_values, cf_dates, cf_types)
-
-
-def _gen_bm_func(mode: str, dates: Union[np.datetime64, np.ndarray],
-                 inception: np.datetime64, maturity: np.datetime64,
-                 prices: Union[np.ndarray, float], cf_values: np.ndarray,
-                 cf_dates: np.ndarray, cf_types: np.ndarray) \
-        -> tuple[np.ndarray, np.ndarray]:
-    """ General function to calculate fair value, duration and convexity of a
-        bond given the bond' cash flows, and maturity and inception dates.
-    """
-    # Prepare input data
-    is_single_date = isinstance(dates, np.datetime64)
-    is_single_rate = isinstance(prices, float)
-    if is_single_date & is_single_rate:
-        dates = np.array([dates])
-        prices = np.array([prices])
-    elif is_single_rate:
-        prices = np.array([prices] * len(dates))
-    elif is_single_date:
-        dates = np.array([dates] * len(prices))
-
-    # Select calculation
-    if mode == 'ytm':
-        f_ = ytm
-    elif mode == 'dur':
-        f_ = duration
-    elif mode == 'cvx':
-        f_ = convexity
-    else:
-        raise ValueError(f'_gen_bm_func() mode ({mode}) not recognized')
-
-    # Trim data
-    prices, dts = trim_ts(prices, dates, start=inception, end=maturity)
-    n = len(dts)
-    if n == 0:
-        # Quick exit if no dates
-        return np.array([]), np.array([])
-
-    v = np.empty(n)
-    for i in range(n):
-        dt, p = dts[i], prices[i]
-        if np.isnan(p):
-            v[i] = np.nan
-        else:
-            try:
-                pf, _, _ = cash_flows(cf_values, cf_dates, cf_types, dt, inception)
-                v[i] = f_(pf, p)
-            except Ex.IsNoneError:
-                v[i] = np.nan
-    return v, dts
+    _, _, cvx, dts = calc_ytm_dur_cvx(dates, inception, maturity, prices,
+                                      cf_values, cf_dates, cf_types)
+    return cvx, dts
 
 
 def calc_dcf(date: np.datetime64, inception: np.datetime64,
@@ -352,7 +481,7 @@ def calc_dcf(date: np.datetime64, inception: np.datetime64,
     dates = np.array([date])
 
     # Quick exit if no dates
-    _, dts = trim_ts(None, dates, start=inception, end=maturity)
+    dts, _, _ = trim_ts(dates, None, start=inception, end=maturity)
     if len(dts) == 0:
         return np.array([]), np.array([])
 
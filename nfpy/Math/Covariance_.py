@@ -0,0 +1,385 @@
+#
+# Covariance_
+# Covariance estimators, online updates and cache of the estimates
+#
+
+from collections import OrderedDict
+import hashlib
+import numpy as np
+from typing import (Any, Callable, Hashable, Optional, Sequence, TypeVar, Union)
+
+from nfpy.Tools import Singleton
+
+from .FactorModel_ import (FactorCovariance, pca_factor_model)
+
+__all__ = [
+    'CovarianceCache', 'OnlineCovariance', 'cov2corr', 'covariance',
+    'ewma_cov', 'get_cov_cache_glob', 'ledoit_wolf', 'nearest_psd',
+    'pairwise_cov', 'sample_cov', 'TyCovCache',
+]
+
+
+def cov2corr(cov: np.ndarray) -> np.ndarray:
+    """ Correlation matrix from a covariance matrix. """
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, 1.)
+    return corr
+
+
+def nearest_psd(cov: np.ndarray, eps: float = .0) -> np.ndarray:
+    """ Nearest positive semi-definite matrix obtained by clipping the
+        negative eigenvalues at <eps>.
+    """
+    val, vec = np.linalg.eigh(.5 * (cov + cov.T))
+    val = np.maximum(val, eps)
+    return (vec * val) @ vec.T
+
+
+def sample_cov(v: np.ndarray, ddof: int = 1) -> np.ndarray:
+    """ Sample covariance of complete observations.
+
+        Input:
+            v [np.ndarray]: matrix of observations <variable, time>
+            ddof [int]: delta degrees of freedom (default: 1)
+
+        Output:
+            cov [np.ndarray]: covariance matrix
+    """
+    x = v - v.mean(axis=1, keepdims=True)
+    return (x @ x.T) / (v.shape[1] - ddof)
+
+
+def ledoit_wolf(v: np.ndarray) -> tuple[np.ndarray, float]:
+    """ Ledoit-Wolf shrinkage of the sample covariance towards the scaled
+        identity. The shrinkage intensity is the optimal one under quadratic
+        loss as in Ledoit and Wolf (2004).
+
+        Input:
+            v [np.ndarray]: matrix of complete observations <variable, time>
+
+        Output:
+            cov [np.ndarray]: shrunk covariance matrix
+            shrinkage [float]: shrinkage intensity in [0, 1]
+    """
+    p, n = v.shape
+    x = v - v.mean(axis=1, keepdims=True)
+    s = (x @ x.T) / n
+
+    mu = np.trace(s) / p
+    s_norm2 = float(np.sum(s * s))
+    d2 = (s_norm2 - 2. * mu * np.trace(s) + p * mu * mu) / p
+    if d2 <= .0:
+        return s, .0
+
+    # sum_t ||x_t x_t' - S||^2 = sum_t ||x_t||^4 - n ||S||^2
+    x_norm4 = np.sum(np.sum(x * x, axis=0) ** 2)
+    b2 = (x_norm4 / n - s_norm2) / (n * p)
+    shrinkage = float(min(max(b2, .0), d2) / d2)
+
+    cov = (1. - shrinkage) * s
+    cov[np.diag_indices(p)] += shrinkage * mu
+    return cov, shrinkage
+
+
+def ewma_cov(v: np.ndarray, lmbd: float = .94, demean: bool = False) \
+        -> np.ndarray:
+    """ Exponentially weighted covariance with decay <lmbd>, the most recent
+        observation is the last one.
+
+        Input:
+            v [np.ndarray]: matrix of complete observations <variable, time>
+            lmbd [float]: decay factor in (0, 1) (default: 0.94)
+            demean [bool]: remove the weighted mean (default: False)
+
+        Output:
+            cov [np.ndarray]: covariance matrix
+    """
+    if not (.0 < lmbd < 1.):
+        raise ValueError(f'ewma_cov(): decay {lmbd} not in (0, 1)')
+
+    n = v.shape[1]
+    w = lmbd ** np.arange(n - 1, -1, -1, dtype=float)
+    w /= w.sum()
+
+    x = v
+    if demean:
+        x = v - (v @ w)[:, None]
+    return (x * w) @ x.T
+
+
+def pairwise_cov(v: np.ndarray, min_obs: int = 2, psd: bool = True) \
+        -> np.ndarray:
+    """ Covariance on pairwise-complete observations. Each element uses all
+        the dates where both variables are available, therefore variables with
+        ragged histories do not restrict the others. The resulting matrix may
+        be indefinite and is projected on the nearest positive semi-definite
+        one if requested.
+
+        Input:
+            v [np.ndarray]: matrix of observations <variable, time> with NaN
+            min_obs [int]: minimum number of common observations, NaN is
+                returned for pairs below (default: 2)
+            psd [bool]: project on the positive semi-definite cone
+                (default: True)
+
+        Output:
+            cov [np.ndarray]: covariance matrix
+    """
+    m = (~np.isnan(v)).astype(float)
+    x = np.where(m > 0, v, .0)
+
+    cnt = m @ m.T
+    s_ij = x @ m.T
+    cross = x @ x.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (cross - s_ij * s_ij.T / cnt) / (cnt - 1.)
+    cov[cnt < max(min_obs, 2)] = np.nan
+
+    if psd and not np.isnan(cov).any():
+        cov = nearest_psd(cov)
+    return cov
+
+
+def covariance(v: np.ndarray, method: str = 'sample', **kwargs) \
+        -> Union[np.ndarray, FactorCovariance]:
+    """ Covariance estimator dispatcher.
+
+        Input:
+            v [np.ndarray]: matrix of observations <variable, time>
+            method [str]: one of 'sample', 'ledoit_wolf', 'ewma', 'pairwise',
+                'pca'
+            kwargs: parameters of the estimator
+
+        Output:
+            cov [Union[np.ndarray, FactorCovariance]]: covariance matrix, the
+                'pca' method returns the low-rank plus diagonal model
+
+        Exceptions:
+            ValueError: if the method is not recognized
+    """
+    if method == 'sample':
+        return sample_cov(v, **kwargs)
+    elif method == 'ledoit_wolf':
+        return ledoit_wolf(v)[0]
+    elif method == 'ewma':
+        return ewma_cov(v, **kwargs)
+    elif method == 'pairwise':
+        return pairwise_cov(v, **kwargs)
+    elif method == 'pca':
+        return pca_factor_model(v, **kwargs)
+    raise ValueError(f'covariance(): method {method} not recognized')
+
+
+class OnlineCovariance(object):
+    """ Covariance updated observation by observation with rank-one updates.
+        With <lmbd> = None the sample covariance is tracked (Welford) and
+        observations can also be removed to maintain a sliding window. With
+        <lmbd> in (0, 1) an exponentially weighted covariance is tracked.
+
+        Input:
+            n [int]: number of variables
+            lmbd [Optional[float]]: EWMA decay factor (default: None)
+    """
+
+    def __init__(self, n: int, lmbd: Optional[float] = None):
+        if (lmbd is not None) and not (.0 < lmbd < 1.):
+            raise ValueError(f'OnlineCovariance(): decay {lmbd} not in (0, 1)')
+
+        self._lmbd = lmbd
+        self._cnt = 0
+        self._wsum = .0
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros((n, n))
+
+    @property
+    def count(self) -> int:
+        return self._cnt
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    @property
+    def cov(self) -> np.ndarray:
+        if self._lmbd is not None:
+            return self._m2.copy()
+        if self._cnt < 2:
+            return np.full(self._m2.shape, np.nan)
+        return self._m2 / (self._cnt - 1)
+
+    def update(self, x: np.ndarray) -> None:
+        """ Add observations, <x> is either a vector or a matrix
+            <variable, time>. Observations with missing values are skipped.
+        """
+        x = x.reshape(x.shape[0], -1)
+        for k in range(x.shape[1]):
+            xt = x[:, k]
+            if np.isnan(xt).any():
+                continue
+
+            self._cnt += 1
+            if self._lmbd is None:
+                delta = xt - self._mean
+                self._mean += delta / self._cnt
+                self._m2 += np.outer(delta, xt - self._mean)
+            else:
+                # Normalized weights as in ewma_cov()
+                self._wsum = self._lmbd * self._wsum + 1.
+                a = 1. / self._wsum
+                self._m2 *= 1. - a
+                self._m2 += a * np.outer(xt, xt)
+
+    def downdate(self, x: np.ndarray) -> None:
+        """ Remove observations previously added, <x> is either a vector or a
+            matrix <variable, time>. Only for the sample covariance.
+        """
+        if self._lmbd is not None:
+            raise ValueError('OnlineCovariance(): cannot remove observations from an EWMA')
+
+        x = x.reshape(x.shape[0], -1)
+        for k in range(x.shape[1]):
+            xt = x[:, k]
+            if np.isnan(xt).any():
+                continue
+            if self._cnt <= 1:
+                self._cnt = 0
+                self._mean[:] = .0
+                self._m2[:] = .0
+                continue
+
+            mean_old = (self._cnt * self._mean - xt) / (self._cnt - 1)
+            self._m2 -= np.outer(xt - mean_old, xt - self._mean)
+            self._mean = mean_old
+            self._cnt -= 1
+
+
+class CovarianceCache(metaclass=Singleton):
+    """ Least recently used cache of covariance estimates keyed by universe,
+        window, frequency, stamp of the data, method and parameters of the
+        estimator. The stamp makes the estimates stale whenever the data of
+        the window change, e.g. after a download revising past prices.
+        For sliding windows an OnlineCovariance is kept per universe,
+        frequency and method and moved with the window by rank-one updates.
+    """
+
+    _MAX_SIZE = 64
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._online = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def stamp(v: np.ndarray) -> tuple:
+        """ Identifier of the content of the matrix of observations. """
+        h = hashlib.blake2b(np.ascontiguousarray(v).tobytes(), digest_size=16)
+        return v.shape, h.digest()
+
+    @staticmethod
+    def _hashable(v: Any) -> Hashable:
+        """ Hashable form of a parameter of the estimator. Arrays are
+            replaced by their stamp, containers by tuples.
+        """
+        if isinstance(v, np.ndarray):
+            return CovarianceCache.stamp(v) + (v.dtype.str,)
+        if isinstance(v, dict):
+            return tuple(sorted(
+                (k, CovarianceCache._hashable(x)) for k, x in v.items()
+            ))
+        if isinstance(v, (set, frozenset)):
+            return frozenset(CovarianceCache._hashable(x) for x in v)
+        if isinstance(v, (list, tuple)):
+            return tuple(CovarianceCache._hashable(x) for x in v)
+        return v
+
+    @staticmethod
+    def key(uids: Sequence[str], window: Hashable, freq: str, stamp: Hashable,
+            method: str, **kwargs) -> tuple:
+        return tuple(uids), window, freq, stamp, method, \
+            CovarianceCache._hashable(kwargs)
+
+    def get(self, key: tuple, calc_f: Callable[[], Any]) -> Any:
+        """ Return the cached estimate for <key>, calculating it with
+            <calc_f> if missing. Arrays are returned as copies, the cached
+            estimate cannot be altered by the callers. Factor models are
+            immutable and returned as they are.
+        """
+        try:
+            v = self._cache[key]
+        except KeyError:
+            v = calc_f()
+            self._cache[key] = v
+            if len(self._cache) > self._MAX_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+
+        if isinstance(v, np.ndarray):
+            v = v.copy()
+        return v
+
+    def rolling(self, key: Hashable, dates: np.ndarray,
+                v: np.ndarray) -> np.ndarray:
+        """ Sample covariance of the complete observations of the window,
+            obtained by moving the online estimate stored under <key>. If the
+            window has slid forward only the dates leaving and entering the
+            window are removed and added. The estimate is rebuilt if the
+            windows do not overlap, if the data of the overlapping dates have
+            changed or once as many dates as the window length have been
+            moved, to bound the accumulation of rounding errors.
+
+            Input:
+                key [Hashable]: identifier of the universe, frequency and
+                    method
+                dates [np.ndarray]: sorted dates of the window
+                v [np.ndarray]: matrix of observations <variable, time>
+
+            Output:
+                cov [np.ndarray]: covariance matrix
+        """
+        state = self._online.get(key)
+        oc = None
+        if state is not None:
+            old_dates, old_v, oc, moved = state
+            start = int(np.searchsorted(old_dates, dates[0]))
+            n_ovl = old_dates.shape[0] - start
+            n_new = dates.shape[0] - n_ovl
+
+            if (n_ovl <= 0) or (n_new < 0) or \
+                    (old_v.shape[0] != v.shape[0]) or \
+                    (moved + start + n_new > dates.shape[0]) or \
+                    not np.array_equal(old_dates[start:], dates[:n_ovl]) or \
+                    not np.array_equal(old_v[:, start:], v[:, :n_ovl],
+                                       equal_nan=True):
+                oc = None
+            else:
+                oc.downdate(old_v[:, :start])
+                oc.update(v[:, n_ovl:])
+                moved += start + n_new
+
+        if oc is None:
+            oc = OnlineCovariance(v.shape[0])
+            oc.update(v)
+            moved = 0
+
+        self._online[key] = (dates.copy(), v.copy(), oc, moved)
+        self._online.move_to_end(key)
+        if len(self._online) > self._MAX_SIZE:
+            self._online.popitem(last=False)
+        return oc.cov
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._online.clear()
+
+
+def get_cov_cache_glob() -> CovarianceCache:
+    """ Returns the pointer to the global CovarianceCache """
+    return CovarianceCache()
+
+
+TyCovCache = TypeVar('TyCovCache', bound=CovarianceCache)
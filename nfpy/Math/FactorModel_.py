@@ -0,0 +1,169 @@
+#
+# FactorModel_
+# Statistical factor models of the covariance
+#
+
+import numpy as np
+from typing import (Optional, TypeVar, Union)
+
+
+class FactorCovariance(object):
+    """ Low-rank plus diagonal covariance matrix
+
+            C = B diag(f) B' + diag(d)
+
+        where B are the factor loadings <asset, factor>, f the variances of
+        the uncorrelated factors and d the specific variances. The dense
+        matrix is never built, products, variances and risk contributions
+        cost O(NK) and linear systems O(NK^2) through the Woodbury identity.
+
+        The object supports the subset of the ndarray interface used by the
+        optimizers: shape, ndim, diagonal(), the @ operator and the scaling
+        by a scalar.
+
+        Input:
+            loadings [np.ndarray]: factor loadings matrix <asset, factor>
+            factor_var [np.ndarray]: variances of the factors
+            specific_var [np.ndarray]: specific variances of the assets
+    """
+
+    # Make numpy defer the binary operators to the methods of the class
+    __array_ufunc__ = None
+
+    def __init__(self, loadings: np.ndarray, factor_var: np.ndarray,
+                 specific_var: np.ndarray):
+        if loadings.ndim != 2:
+            raise ValueError('FactorCovariance(): loadings matrix not 2D')
+        n, k = loadings.shape
+        if factor_var.shape != (k,):
+            raise ValueError(f'FactorCovariance(): factor variances not of size {k}')
+        if specific_var.shape != (n,):
+            raise ValueError(f'FactorCovariance(): specific variances not of size {n}')
+
+        self._b = loadings
+        self._f = factor_var
+        self._d = specific_var
+        self._bf = loadings * factor_var
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._d.shape[0], self._d.shape[0]
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def num_factors(self) -> int:
+        return self._f.shape[0]
+
+    @property
+    def loadings(self) -> np.ndarray:
+        return self._b
+
+    @property
+    def factor_var(self) -> np.ndarray:
+        return self._f
+
+    @property
+    def specific_var(self) -> np.ndarray:
+        return self._d
+
+    def diagonal(self) -> np.ndarray:
+        return np.sum(self._bf * self._b, axis=1) + self._d
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        """ Product C x for a vector or a matrix <asset, n>. """
+        d = self._d if x.ndim == 1 else self._d[:, None]
+        return self._bf @ (self._b.T @ x) + d * x
+
+    def __matmul__(self, x: np.ndarray) -> np.ndarray:
+        return self.dot(x)
+
+    def __rmatmul__(self, x: np.ndarray) -> np.ndarray:
+        # C is symmetric: x' C = (C x)'
+        return self.dot(x.T).T
+
+    def __mul__(self, a: float) -> 'FactorCovariance':
+        return FactorCovariance(self._b, a * self._f, a * self._d)
+
+    __rmul__ = __mul__
+
+    def variance(self, wgt: np.ndarray) -> float:
+        """ Portfolio variance w' C w. """
+        bw = self._b.T @ wgt
+        return float(bw @ (self._f * bw) + wgt @ (self._d * wgt))
+
+    def risk_contributions(self, wgt: np.ndarray) -> np.ndarray:
+        """ Risk contributions w_i (C w)_i / (w' C w) of each asset. """
+        cw = self.dot(wgt)
+        return wgt * cw / float(wgt @ cw)
+
+    def add_diagonal(self, v: Union[float, np.ndarray]) -> 'FactorCovariance':
+        """ Returns the model of C + diag(v). """
+        return FactorCovariance(self._b, self._f, self._d + v)
+
+    def subset(self, idx: np.ndarray) -> 'FactorCovariance':
+        """ Returns the model of the sub-matrix C[idx, idx]. """
+        return FactorCovariance(self._b[idx], self._f, self._d[idx])
+
+    def solve(self, x: np.ndarray) -> np.ndarray:
+        """ Solve C y = x using the Woodbury identity
+
+                C^-1 = D^-1 - D^-1 B (F^-1 + B' D^-1 B)^-1 B' D^-1
+        """
+        d_inv = 1. / (self._d if x.ndim == 1 else self._d[:, None])
+        bd = self._b / self._d[:, None]
+        core = np.diag(1. / self._f) + self._b.T @ bd
+        return d_inv * x - bd @ np.linalg.solve(core, bd.T @ x)
+
+    def to_dense(self) -> np.ndarray:
+        """ Dense covariance matrix, O(N^2) in memory. """
+        c = self._bf @ self._b.T
+        c[np.diag_indices_from(c)] += self._d
+        return c
+
+
+def pca_factor_model(v: np.ndarray, k: Optional[int] = None,
+                     expl: float = .9, ddof: int = 1) -> FactorCovariance:
+    """ Statistical factor model from the principal components of the returns.
+        The first <k> principal components are retained as factors, the
+        residual variance of each asset is its specific variance. The
+        decomposition is obtained from the thin SVD of the returns matrix in
+        O(NT min(N, T)), hence the N x N sample covariance is never built.
+
+        Input:
+            v [np.ndarray]: matrix of complete observations <asset, time>
+            k [Optional[int]]: number of factors, if None the smallest number
+                explaining at least <expl> of the total variance is used
+                (default: None)
+            expl [float]: fraction of explained variance used to choose the
+                number of factors (default: 0.9)
+            ddof [int]: delta degrees of freedom (default: 1)
+
+        Output:
+            model [FactorCovariance]: factor model of the covariance
+    """
+    n, t = v.shape
+    if t - ddof < 1:
+        raise ValueError('pca_factor_model(): not enough observations')
+
+    x = (v - v.mean(axis=1, keepdims=True)) / np.sqrt(t - ddof)
+    u, s, _ = np.linalg.svd(x, full_matrices=False)
+    eig = s * s
+
+    total_var = np.sum(x * x, axis=1)
+    if k is None:
+        ratio = np.cumsum(eig) / np.sum(total_var)
+        k = int(np.searchsorted(ratio, expl) + 1)
+    k = max(1, min(k, eig.shape[0]))
+
+    b, f = u[:, :k], eig[:k]
+    spec = total_var - np.sum(b * b * f, axis=1)
+
+    # Keep the specific variances strictly positive for invertibility
+    floor = 1e-8 * max(float(np.mean(total_var)), np.finfo(float).tiny)
+    return FactorCovariance(b, f, np.maximum(spec, floor))
+
+
+TyFactorCov = TypeVar('TyFactorCov', bound=FactorCovariance)
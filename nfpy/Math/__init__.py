@@ -1,6 +1,8 @@
 from .BondMath import *
+from .Covariance_ import *
 from .DiscountFactor import *
 from .EquityMath import *
+from .FactorModel_ import *
 from .Returns_ import *
 from .Risk_ import *
 from .TSStats_ import *
@@ -10,13 +12,22 @@ from .TSUtils_ import *
 __all__ = [
     # Bond
     'accrued', 'aggregate_cf', 'calc_convexity', 'calc_dcf', 'calc_duration',
-    'calc_fv', 'calc_ytm', 'cash_flows', 'convexity', 'duration', 'ytm',
+    'calc_fv', 'calc_ytm', 'calc_ytm_dur_cvx', 'cash_flows',
+    'cash_flows_matrix', 'convexity', 'duration', 'ytm', 'ytm_vec',
     # DiscountFactor
     'ccdf', 'cdf', 'dcf', 'df', 'rate_interpolate',
     # Equity
     'fv',
 
     # MATH FUNCTIONS
+    # Covariance_
+    'CovarianceCache', 'OnlineCovariance', 'cov2corr', 'covariance',
+    'ewma_cov', 'get_cov_cache_glob', 'ledoit_wolf', 'nearest_psd',
+    'pairwise_cov', 'sample_cov', 'TyCovCache',
+
+    # FactorModel_
+    'FactorCovariance', 'pca_factor_model', 'TyFactorCov',
+
     # Returns_
     'comp_ret', 'compound', 'e_ret', 'tot_ret',
 
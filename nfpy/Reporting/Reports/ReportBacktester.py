@@ -31,7 +31,8 @@ class ReportBacktester(BaseReport):
             'w_macd': 50
         },
         "sizer": "ConstantSplitSizer",
-        "sizer_params": {'buy': .2, 'sell': .3}
+        "sizer_params": {'buy': .2, 'sell': .3},
+        "workers": 1
     }
 
     def _init_input(self, type_: Optional[str] = None) -> None:
@@ -55,7 +56,10 @@ class ReportBacktester(BaseReport):
             modified so that the database parameters in self._p are not
             changed from one asset to the next.
         """
-        bk = Trd.Backtester(self._uids, self._p['start_amount'], False)
+        bk = Trd.Backtester(
+            self._uids, self._p['start_amount'], False,
+            workers=self._p.get('workers', 1)
+        )
         symbol = '.'.join(['nfpy.Trading.Strategies', self._p['strategy']])
         bk.strategy = Ut.import_symbol(symbol)
         bk.parameters = self._p['strategy_params']
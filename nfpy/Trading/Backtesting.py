@@ -3,18 +3,29 @@
 # Class to backtest simple strategies
 #
 
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import os
 from typing import (Any, MutableSequence, Optional, Union)
 
 import nfpy.Assets as Ast
 import nfpy.Calendar as Cal
+import nfpy.DB as DB
 from nfpy.Tools import (get_conf_glob, Utilities as Ut)
 
 from .BaseSizer import TySizer
 from .Strategies import (Order, OrderType, SignalFlag, TyStrategy)
 
 
+def _init_worker(cal_args: dict, db_path: str) -> None:
+    """ Initialize the calendar and the database of a worker process. Workers
+        started with the spawn method inherit neither of them, with the fork
+        method they are already initialized and this is a no-op.
+    """
+    Cal.get_calendar_glob().initialize(**cal_args)
+    DB.get_db_glob(db_path)
+
+
 class Portfolio(object):
     """ Class representing a single-security portfolio for backtesting. """
 
@@ -31,6 +42,12 @@ class Portfolio(object):
         self.total_return = .0
         self.trades = []  # List of executed trades
 
+        # Time series of the portfolio
+        self.dates = None
+        self.positions = None  # Number of shares held
+        self.cash_history = None  # Available cash
+        self.equity = None  # Total value of the portfolio
+
     def buy(self, dt: np.datetime64, p: float, s: SignalFlag, sz: int) -> None:
         """ Buy the position.
 
@@ -81,6 +98,29 @@ class Portfolio(object):
         self.final_value = self.cash
         self.total_return = self.cash / self.initial - 1.
 
+    def calc_history(self, dates: np.ndarray, prices: np.ndarray) -> None:
+        """ Calculate the time series of shares held, cash and total value of
+            the portfolio at the end of each period from the executed trades.
+
+            Input:
+                dates [np.ndarray]: dates of the backtest
+                prices [np.ndarray]: prices used to value the position
+        """
+        d_shares = np.zeros(dates.shape[0])
+        d_cash = np.zeros(dates.shape[0])
+        if self.trades:
+            dt, s, _, sz, amount = zip(*(tr[:5] for tr in self.trades))
+            idx = np.searchsorted(dates, np.array(dt, dtype=dates.dtype))
+            sign = np.array([1. if getattr(f, 'value', f) > 0 else -1.
+                             for f in s])
+            np.add.at(d_shares, idx, sign * np.array(sz, dtype=float))
+            np.add.at(d_cash, idx, -sign * np.array(amount, dtype=float))
+
+        self.dates = dates
+        self.positions = np.cumsum(d_shares)
+        self.cash_history = self.initial + np.cumsum(d_cash)
+        self.equity = self.cash_history + self.positions * prices
+
 
 class ConsolidatedResults(Ut.AttributizedDict):
 
@@ -96,10 +136,25 @@ class ConsolidatedResults(Ut.AttributizedDict):
 
 
 class Backtester(object):
+    """ Backtest a strategy on each of the given uids. With more than one
+        worker the uids are distributed over a pool of processes, each with
+        its own database connection and asset cache, and the results are
+        collected in the order of the uids. The calendar and the database of
+        the workers are initialized as in the calling process, hence any
+        start method of the processes may be used.
+
+        Input:
+            uids [Union[str, MutableSequence[str]]]: uids to backtest
+            initial [float]: initial cash value
+            bulk [bool]: use the "bulk" or the "online" mode
+            debug [bool]: store the indicators history (default: False)
+            workers [int]: number of processes (default: 1)
+    """
+
     _DT_FMT = '%Y%m%d'
 
     def __init__(self, uids: Union[str, MutableSequence[str]], initial: float,
-                 bulk: bool, debug: bool = False):
+                 bulk: bool, debug: bool = False, workers: int = 1):
         # Handlers
         self._af = Ast.get_af_glob()
         self._conf = get_conf_glob()
@@ -108,6 +163,7 @@ class Backtester(object):
         self._bulk = bool(bulk)
         self._initial = float(initial)
         self._debug = bool(debug)
+        self._workers = max(1, int(workers))
 
         if isinstance(uids, str):
             self._uids = [uids]
@@ -127,6 +183,18 @@ class Backtester(object):
         self._res = {}
         self._debug_res = {}
 
+    def __getstate__(self) -> dict:
+        # Handlers are not sent to the workers, each creates its own
+        state = self.__dict__.copy()
+        state['_af'] = None
+        state['_conf'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._af = Ast.get_af_glob()
+        self._conf = get_conf_glob()
+
     @property
     def debug_data(self) -> Optional[dict[int, dict]]:
         return self._debug_res if self._debug else None
@@ -193,26 +261,143 @@ class Backtester(object):
         self._create_new_directory()
 
         # Backtest strategy
-        for uid in self._uids:
-            asset = self._af.get(uid)
-            print(f'>>> {asset.uid}')
+        if (self._workers > 1) and (len(self._uids) > 1):
+            workers = min(self._workers, len(self._uids))
+            chunk = max(1, len(self._uids) // (4 * workers))
+            cal = Cal.get_calendar_glob()
+            cal_args = {
+                'end': cal.end,
+                'start': cal.start,
+                'monthly_start': cal.monthly_calendar[0],
+                'yearly_start': cal.yearly_calendar[0],
+                'fmt': cal.fmt,
+            }
+            init_args = (cal_args, DB.get_db_glob().db_path)
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_worker,
+                                     initargs=init_args) as pool:
+                for res in pool.map(self._backtest, self._uids,
+                                    chunksize=chunk):
+                    self._store_result(*res)
+        else:
+            for uid in self._uids:
+                self._store_result(*self._backtest(uid))
+
+        # Consolidate results
+        # self._consolidate()
+
+    def _backtest(self, uid: str) \
+            -> tuple[str, Optional[Portfolio], Optional[dict], str]:
+        """ Backtest the strategy on a single uid.
+
+            Input:
+                uid [str]: uid to backtest
+
+            Output:
+                uid [str]: backtested uid
+                ptf [Optional[Portfolio]]: backtested portfolio, None if the
+                    backtest failed
+                debug [Optional[dict]]: history of the indicators if in debug
+                    mode, None otherwise
+                msg [str]: error message if the backtest failed
+        """
+        asset = self._af.get(uid)
+        try:
+            strategy = self._strat(asset, self._bulk, **self._params)
+            ptf = self.apply(strategy)
 
+            # TODO: keep as side-effect of outputting the results of ptf
+            ptf.statistics()
+        except (IndexError, TypeError) as ex:
+            return asset.uid, None, None, f'Backtest failed for {asset.uid}\n{ex}'
+
+        debug = self._debug_info(strategy) if self._debug else None
+        return asset.uid, ptf, debug, ''
+
+    def apply(self, strategy: TyStrategy) -> Portfolio:
+        """ Backtest an already created strategy with the sizer and initial
+            cash of the backtester. The vectorized backtesting is used in bulk
+            mode if the strategy supports it, the online one otherwise.
+
+            Input:
+                strategy [TyStrategy]: strategy to backtest
+
+            Output:
+                ptf [Portfolio]: backtested hypothetical portfolio
+        """
+        if self._bulk:
             try:
-                strategy = self._strat(asset, **self._params)
-                ptf = self._online_apply(strategy)
-
-                # TODO: keep as side-effect of outputting the results of ptf
-                ptf.statistics()
-                self._res[asset.uid] = ptf
-            except (IndexError, TypeError) as ex:
-                print(f'Backtest failed for {asset.uid}\n{ex}')
+                return self._bulk_apply(strategy)
+            except NotImplementedError:
+                pass
+        return self._online_apply(strategy)
+
+    def _store_result(self, uid: str, ptf: Optional[Portfolio],
+                      debug: Optional[dict], msg: str) -> None:
+        print(f'>>> {uid}')
+        if ptf is None:
+            print(msg)
+            return
+
+        self._res[uid] = ptf
+        if self._debug:
+            self._debug_res[uid] = debug
+
+    def _bulk_apply(self, strategy: TyStrategy) -> Portfolio:
+        """ Perform the vectorized backtesting of a simple strategy. Signals
+            are calculated as arrays from the bulk indicators and executed as
+            market orders at the following period at the same prices of the
+            online mode. Only the periods with a trade are visited to apply
+            the sizer. As in the online mode, trades are sized on the
+            execution prices and orders whose size is zero are cancelled.
+
+            Input:
+                strategy [TyStrategy]: strategy to backtest
+
+            Output:
+                ptf [Portfolio]: backtested hypothetical portfolio
+
+            Exceptions:
+                NotImplementedError: if the strategy has no vectorized signals
+        """
+        dates = strategy.dt
+        prices = strategy.ts
+        flags = strategy.bulk_signals()
+
+        # Orders are executed at the period following the signal at the
+        # highest (buy) or lowest (sell) of the two prices
+        t_exec = np.flatnonzero(flags[:-1]) + 1
+        is_buy = flags[t_exec - 1] > 0
+        p_exec = np.where(
+            is_buy,
+            np.maximum(prices[t_exec], prices[t_exec - 1]),
+            np.minimum(prices[t_exec], prices[t_exec - 1])
+        )
+
+        # Trades are sized on the execution prices
+        p_fill = prices.copy()
+        p_fill[t_exec] = p_exec
+
+        ptf = Portfolio(initial=self._initial)
+        self._sizer.set(p_fill, ptf)
+
+        for t, buy, p in zip(t_exec, is_buy, p_exec):
+            signal = SignalFlag.BUY if buy else SignalFlag.SELL
+            sz = self._sizer(t, signal)
+            if sz <= 0:
+                continue
+            if buy:
+                ptf.buy(dates[t], p, signal, sz)
             else:
-                # Add the results to self._debug_res
-                if self._debug:
-                    self._store_debug_info(uid, strategy)
+                ptf.sell(dates[t], p, signal, sz)
 
-        # Consolidate results
-        # self._consolidate()
+        # Sell any residual security at the end of the backtesting period
+        ptf.sell(dates[-1], prices[-1], SignalFlag.SELL, ptf.shares)
+        ptf.calc_history(dates, prices)
+
+        self._sizer.clean()
+
+        return ptf
 
     def _online_apply(self, strategy: TyStrategy) -> Portfolio:
         """ Perform the bulk backtesting of a simple strategy.
@@ -236,8 +421,10 @@ class Backtester(object):
         dates = strategy.dt
         prices = strategy.ts
 
+        # Trades are sized on the execution prices
+        p_fill = prices.copy()
         ptf = Portfolio(initial=self._initial)
-        self._sizer.set(prices, ptf)
+        self._sizer.set(p_fill, ptf)
 
         # Initialize working variables
         pending: list[Order] = []
@@ -262,21 +449,23 @@ class Backtester(object):
 
                     # If the order is marketable apply it
                     if action == 'execute':
-                        # Calculate order size
+                        # Calculate the execution price, the highest (buy)
+                        # or lowest (sell) of the two prices
                         signal = order.signal
+                        if signal == SignalFlag.BUY:
+                            p = max(prices[t], prices[t - 1])
+                        else:
+                            p = min(prices[t], prices[t - 1])
+
+                        # Calculate order size on the execution price. If
+                        # the size is zero the order is cancelled.
+                        p_fill[t] = p
                         sz = self._sizer(t, signal)
                         if sz > 0:
-                            # If size is greater than zero buy/sell
-                            if signal == SignalFlag.BUY:  # BUY
-                                # Calculate buy price and apply
-                                p = max(prices[t], prices[t - 1])
+                            if signal == SignalFlag.BUY:
                                 ptf.buy(dates[t], p, signal, sz)
                             else:
-                                # Calculate sell price and apply
-                                p = min(prices[t], prices[t - 1])
                                 ptf.sell(dates[t], p, signal, sz)
-                        else:
-                            orders_new_list.append(order)
                         # print(f'     >>>>>>: {t}: {signal}')
 
                     # If the order is to be kept do it
@@ -294,17 +483,19 @@ class Backtester(object):
         # Sell any residual security at the current market price at the end of
         # the backtesting period to get the final portfolio value
         ptf.sell(dates[-1], prices[-1], SignalFlag.SELL, ptf.shares)
+        ptf.calc_history(dates, prices)
 
         # Clean up
         self._sizer.clean()
 
         return ptf
 
-    def _store_debug_info(self, uid: str, strategy: TyStrategy) -> None:
+    @staticmethod
+    def _debug_info(strategy: TyStrategy) -> dict:
         d = {}
         for n, ind in enumerate(strategy._indicators):
             d[n] = ind.get_indicator()
-        self._debug_res[uid] = d
+        return d
 
     # def _consolidate(self):
     #     """ Creates consolidated results objects by grouping equities by some
@@ -19,6 +19,7 @@ class BaseIndicator(metaclass=ABCMeta):
 
         self._t = -1
         self._max_t = ts.shape[ts.ndim - 1]
+        self._is_calculated = False
 
         self._check_dims(ts, dims)
         _check_nans(ts)
@@ -49,6 +50,8 @@ class BaseIndicator(metaclass=ABCMeta):
             t0 represents the first time step for which we want to generate a
             data point. The minimum acceptable is <min_length> that is also the
             default, the maximum is the length in period of the series max_t.
+            In bulk mode the history is calculated only once, hence the
+            indicator can be shared and restarted at no cost.
         """
         if t0 is None:
             t0 = self.min_length
@@ -60,7 +63,10 @@ class BaseIndicator(metaclass=ABCMeta):
         # We go to t0 - 1 because we need the INDEX, not the step number, of
         # the PREVIOUS element. Hence, 1 before.
         self._t = t0 - 1
+        if self._is_bulk and self._is_calculated:
+            return
         self._bulk(t0 - 1)
+        self._is_calculated = self._is_bulk
 
     def __iter__(self):
         return self
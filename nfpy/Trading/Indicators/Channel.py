@@ -9,6 +9,7 @@ from typing import (Sequence, Union)
 import nfpy.Math as Math
 
 from .BaseIndicator import BaseIndicator
+from .Utils import (_RollingExtremum, _RollingMoments)
 
 
 class Bollinger(BaseIndicator):
@@ -25,6 +26,7 @@ class Bollinger(BaseIndicator):
         self._high = None
         self._bp = None
         self._b_width = None
+        self._mom = _RollingMoments(w)
 
         super(Bollinger, self).__init__(ts, is_bulk, {1})
 
@@ -55,6 +57,9 @@ class Bollinger(BaseIndicator):
         self._high[ts_slc] = high
         self._ma[ts_slc] = mean
 
+        if not self._is_bulk:
+            self._mom.reset(self._ts[t0 - self._w + 1:t0 + 1])
+
     def get_indicator(self) -> dict:
         return {'high': self._high, 'mean': self._ma, 'low': self._low,
                 '%b': self._bp, 'width': self._b_width}
@@ -65,8 +70,9 @@ class Bollinger(BaseIndicator):
 
     def _ind_online(self) -> Union[float, tuple]:
         ts = self._ts
-        ma = self._ma[self._t - 1] + (ts[self._t] - ts[self._t - self._w]) / self._w
-        std = self._alpha * np.std(ts[self._t - self._w + 1:self._t + 1], axis=0, ddof=1)
+        self._mom.update(ts[self._t], ts[self._t - self._w])
+        ma = self._mom.mean
+        std = self._alpha * self._mom.std(1)
         low = ma - std
         high = ma + std
         b_diff = 2. * std
@@ -102,6 +108,8 @@ class Donchian(BaseIndicator):
         self._ma = None
         self._low = None
         self._high = None
+        self._roll_high = _RollingExtremum(w, True)
+        self._roll_low = _RollingExtremum(w, False)
 
         super(Donchian, self).__init__(ts, is_bulk, {1, 2})
 
@@ -115,7 +123,7 @@ class Donchian(BaseIndicator):
                 setattr(self, '_ind', self._ind_hl)
 
     def _bulk(self, t0: int) -> None:
-        n = self._ts.shape[0]
+        n = self._max_t
         self._ma = np.empty(n, dtype=float)
         self._low = np.empty(n, dtype=float)
         self._high = np.empty(n, dtype=float)
@@ -129,18 +137,14 @@ class Donchian(BaseIndicator):
             else slice(None, t0 - self._shift + 1)
 
         if self._is_hl:
-            high = np.r_[
-                [np.nan] * wasted,
-                np.max(
-                    Math.rolling_window(self._ts[0, ts_slc], self._w),
-                    axis=1
-                )]
-            low = np.r_[
-                [np.nan] * wasted,
-                np.min(
-                    Math.rolling_window(self._ts[1, ts_slc], self._w),
-                    axis=1
-                )]
+            high = np.max(
+                Math.rolling_window(self._ts[0, ts_slc], self._w),
+                axis=1
+            )
+            low = np.min(
+                Math.rolling_window(self._ts[1, ts_slc], self._w),
+                axis=1
+            )
         else:
             roll = Math.rolling_window(self._ts[ts_slc], self._w)
             high = np.max(roll, axis=1)
@@ -152,6 +156,17 @@ class Donchian(BaseIndicator):
         self._high[rw_slc] = high
         self._ma[rw_slc] = .5 * (high + low)
 
+        if not self._is_bulk:
+            # Window of the channel at t0
+            end = t0 - self._shift
+            slc = slice(end - self._w + 1, end + 1)
+            if self._is_hl:
+                self._roll_high.reset(self._ts[0, slc], end)
+                self._roll_low.reset(self._ts[1, slc], end)
+            else:
+                self._roll_high.reset(self._ts[slc], end)
+                self._roll_low.reset(self._ts[slc], end)
+
     def get_indicator(self) -> dict:
         return {'high': self._high, 'mean': self._ma, 'low': self._low}
 
@@ -162,9 +177,11 @@ class Donchian(BaseIndicator):
         pass
 
     def _ind_c(self) -> Union[float, tuple]:
-        ts = self._ts[self._t - self._w - self._shift + 1:self._t - self._shift + 1]
-        high = np.max(ts)
-        low = np.min(ts)
+        t = self._t - self._shift
+        self._roll_high.push(t, self._ts[t])
+        self._roll_low.push(t, self._ts[t])
+        high = self._roll_high.value
+        low = self._roll_low.value
         mean = .5 * (high + low)
 
         self._ma[self._t] = mean
@@ -173,9 +190,11 @@ class Donchian(BaseIndicator):
         return high, mean, low
 
     def _ind_hl(self) -> Union[float, tuple]:
-        ts = self._ts[:, self._t - self._w - self._shift + 1:self._t - self._shift + 1]
-        high = np.max(ts[0, :])
-        low = np.min(ts[1, :])
+        t = self._t - self._shift
+        self._roll_high.push(t, self._ts[0, t])
+        self._roll_low.push(t, self._ts[1, t])
+        high = self._roll_high.value
+        low = self._roll_low.value
         mean = .5 * (high + low)
 
         self._ma[self._t] = mean
@@ -0,0 +1,83 @@
+#
+# Indicator Cache
+# Share bulk indicators between strategies working on the same series
+#
+
+import hashlib
+import numpy as np
+from typing import (Type, TypeVar)
+
+from nfpy.Tools import Singleton
+
+from .BaseIndicator import TyIndicator
+
+
+class IndicatorCache(metaclass=Singleton):
+    """ Cache of bulk indicators keyed by series, indicator class and
+        parameters. The cache is active only within a 'with' block, outside
+        of it a new indicator is always created. Online indicators are never
+        shared as they carry the state of the iteration.
+
+        Usage:
+            with get_ind_cache_glob():
+                # strategies built here share their bulk indicators
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._active = False
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> 'IndicatorCache':
+        self._active = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._active = False
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def is_active(self) -> bool:
+        return self._active
+
+    @staticmethod
+    def _fingerprint(ts: np.ndarray) -> tuple:
+        """ Identifier of the content of the series. """
+        h = hashlib.blake2b(np.ascontiguousarray(ts).tobytes(), digest_size=16)
+        return ts.shape, ts.dtype.str, h.digest()
+
+    def get(self, ind: Type[TyIndicator], ts: np.ndarray, is_bulk: bool,
+            *params) -> TyIndicator:
+        """ Return the indicator <ind> on the series <ts> with parameters
+            <params>, creating it if not in cache.
+        """
+        if not (self._active and is_bulk):
+            return ind(ts, is_bulk, *params)
+
+        key = (ind, self._fingerprint(ts), params)
+        try:
+            obj = self._cache[key]
+        except KeyError:
+            obj = ind(ts, is_bulk, *params)
+            self._cache[key] = obj
+            self.misses += 1
+        else:
+            self.hits += 1
+        return obj
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def get_ind_cache_glob() -> IndicatorCache:
+    """ Returns the pointer to the global IndicatorCache """
+    return IndicatorCache()
+
+
+TyIndCache = TypeVar('TyIndCache', bound=IndicatorCache)
@@ -3,12 +3,14 @@
 # Moving Average based indicators.
 #
 
+from bisect import (bisect_left, insort)
 import numpy as np
 from typing import Union
 
 import nfpy.Math as Math
 
 from .BaseIndicator import BaseIndicator
+from .Utils import (_ewm, _RollingMoments)
 
 
 class Sma(BaseIndicator):
@@ -57,6 +59,7 @@ class Smstd(BaseIndicator):
         self._w = w
         self._dof = ddof
         self._std = None
+        self._mom = _RollingMoments(w)
 
         super(Smstd, self).__init__(ts, is_bulk, {1})
 
@@ -74,6 +77,9 @@ class Smstd(BaseIndicator):
         ts2d = Math.rolling_window(self._ts[ts_slc], self._w)
         self._std[std_slc] = np.std(ts2d, axis=1, ddof=self._dof)
 
+        if not self._is_bulk:
+            self._mom.reset(self._ts[t0 - self._w + 1:t0 + 1])
+
     def get_indicator(self) -> dict:
         return {'smstd': self._std}
 
@@ -81,9 +87,10 @@ class Smstd(BaseIndicator):
         return self._std[self._t]
 
     def _ind_online(self) -> Union[float, tuple]:
-        std = np.std(self._ts[self._t - self._w + 1:self._t + 1], axis=0, ddof=self._dof)
+        self._mom.update(self._ts[self._t], self._ts[self._t - self._w])
+        std = self._mom.std(self._dof)
         self._std[self._t] = std
-        return float(std)
+        return std
 
     @property
     def min_length(self) -> int:
@@ -155,10 +162,8 @@ class Ewma(BaseIndicator):
     def _bulk(self, t0: int) -> None:
         self._ma = np.empty(self._max_t, dtype=float)
 
-        self._ma[0] = self._ts[0]
         end = self._max_t if self._is_bulk else t0 + 1
-        for i in range(1, end):
-            self._ma[i] = self._alpha * self._ts[i] + self._c * self._ma[i - 1]
+        self._ma[:end] = _ewm(self._ts[:end], self._alpha)
 
     def get_indicator(self) -> dict:
         return {'ewma': self._ma}
@@ -184,6 +189,7 @@ class Smd(BaseIndicator):
     def __init__(self, ts: np.ndarray, is_bulk: bool, w: int):
         self._w = w
         self._smd = None
+        self._win = None  # Sorted values of the window
 
         super(Smd, self).__init__(ts, is_bulk, {1})
 
@@ -201,6 +207,9 @@ class Smd(BaseIndicator):
         ts2d = Math.rolling_window(self._ts[ts_slc], self._w)
         self._smd[std_slc] = np.median(ts2d, axis=1)
 
+        if not self._is_bulk:
+            self._win = sorted(self._ts[t0 - self._w + 1:t0 + 1].tolist())
+
     def get_indicator(self) -> dict:
         return {'smd': self._smd}
 
@@ -208,9 +217,15 @@ class Smd(BaseIndicator):
         return self._smd[self._t]
 
     def _ind_online(self) -> Union[float, tuple]:
-        smd = np.median(self._ts[self._t - self._w + 1:self._t + 1], axis=0)
+        # Keep the window sorted by replacing the oldest value
+        win = self._win
+        del win[bisect_left(win, float(self._ts[self._t - self._w]))]
+        insort(win, float(self._ts[self._t]))
+
+        m = self._w // 2
+        smd = win[m] if self._w % 2 else .5 * (win[m - 1] + win[m])
         self._smd[self._t] = smd
-        return float(smd)
+        return smd
 
     @property
     def min_length(self) -> int:
@@ -246,19 +261,15 @@ class Macd(BaseIndicator):
         self._signal = np.empty(self._max_t, dtype=float)
         self._hist = np.empty(self._max_t, dtype=float)
 
-        self._mas = self._ts[0]
-        self._maf = self._ts[0]
-        self._macd[0] = .0
-        self._signal[0] = .0
-        self._hist[0] = .0
-
         end = self._max_t if self._is_bulk else t0 + 1
-        for i in range(1, end):
-            self._mas = self._als * self._ts[i] + self._cs * self._mas
-            self._maf = self._alf * self._ts[i] + self._cf * self._maf
-            self._macd[i] = self._maf - self._mas
-            self._signal[i] = self._alm * self._macd[i] + self._cm * self._signal[i - 1]
-        self._hist[1:end] = self._macd[1:end] - self._signal[1:end]
+        mas = _ewm(self._ts[:end], self._als)
+        maf = _ewm(self._ts[:end], self._alf)
+        self._mas = mas[-1]
+        self._maf = maf[-1]
+
+        self._macd[:end] = maf - mas
+        self._signal[:end] = _ewm(self._macd[:end], self._alm)
+        self._hist[:end] = self._macd[:end] - self._signal[:end]
 
     def get_indicator(self) -> dict:
         return {'macd': self._macd, 'signal': self._signal, 'hist': self._hist}
@@ -301,15 +312,12 @@ class Dema(BaseIndicator):
     def _bulk(self, t0: int) -> None:
         self._dema = np.empty(self._max_t, dtype=float)
 
-        self._ma1 = self._ts[0]
-        self._ma2 = self._ts[0]
-        self._dema[0] = self._ts[0]
-
         end = self._max_t if self._is_bulk else t0 + 1
-        for i in range(1, end):
-            self._ma1 = self._alpha * self._ts[i] + self._c * self._ma1
-            self._ma2 = self._alpha * self._ma1 + self._c * self._ma2
-            self._dema[i] = 2. * self._ma1 - self._ma2
+        ma1 = _ewm(self._ts[:end], self._alpha)
+        ma2 = _ewm(ma1, self._alpha)
+        self._ma1 = ma1[-1]
+        self._ma2 = ma2[-1]
+        self._dema[:end] = 2. * ma1 - ma2
 
     def get_indicator(self) -> dict:
         return {'dema': self._dema}
@@ -349,17 +357,14 @@ class Tema(BaseIndicator):
     def _bulk(self, t0: int) -> None:
         self._tema = np.empty(self._max_t, dtype=float)
 
-        self._ma1 = self._ts[0]
-        self._ma2 = self._ts[0]
-        self._ma3 = self._ts[0]
-        self._tema[0] = self._ts[0]
-
         end = self._max_t if self._is_bulk else t0 + 1
-        for i in range(1, end):
-            self._ma1 = self._alpha * self._ts[i] + self._c * self._ma1
-            self._ma2 = self._alpha * self._ma1 + self._c * self._ma2
-            self._ma3 = self._alpha * self._ma2 + self._c * self._ma3
-            self._tema[i] = 3. * self._ma1 - 3. * self._ma2 + self._ma3
+        ma1 = _ewm(self._ts[:end], self._alpha)
+        ma2 = _ewm(ma1, self._alpha)
+        ma3 = _ewm(ma2, self._alpha)
+        self._ma1 = ma1[-1]
+        self._ma2 = ma2[-1]
+        self._ma3 = ma3[-1]
+        self._tema[:end] = 3. * ma1 - 3. * ma2 + ma3
 
     def get_indicator(self) -> dict:
         return {'tema': self._tema}
@@ -9,6 +9,7 @@ from typing import Union
 import nfpy.Math as Math
 
 from .BaseIndicator import BaseIndicator
+from .Utils import (_ewm, _RollingExtremum)
 
 
 class Aroon(BaseIndicator):
@@ -25,6 +26,8 @@ class Aroon(BaseIndicator):
         self._aro = None
         self._aro_up = None
         self._aro_dwn = None
+        self._roll_high = _RollingExtremum(w, True)
+        self._roll_low = _RollingExtremum(w, False)
 
         super(Aroon, self).__init__(ts, is_bulk, {1})
 
@@ -50,6 +53,11 @@ class Aroon(BaseIndicator):
         self._aro_up[a_slc] = up
         self._aro_dwn[a_slc] = down
 
+        if not self._is_bulk:
+            window = self._ts[t0 - self._w + 1:t0 + 1]
+            self._roll_high.reset(window, t0)
+            self._roll_low.reset(window, t0)
+
     def get_indicator(self) -> dict:
         return {'up': self._aro_up, 'down': self._aro_dwn, 'aroon': self._aro}
 
@@ -57,9 +65,13 @@ class Aroon(BaseIndicator):
         return self._aro_up[self._t], self._aro_dwn[self._t], self._aro[self._t]
 
     def _ind_online(self) -> Union[float, tuple]:
-        slc = self._ts[self._t - self._w + 1: self._t + 1]
-        up = 100. - 100. * (np.argmax(slc) + 1) / self._w
-        down = 100. - 100. * (np.argmin(slc) + 1) / self._w
+        self._roll_high.push(self._t, self._ts[self._t])
+        self._roll_low.push(self._t, self._ts[self._t])
+
+        # Position of the extrema in the window
+        start = self._t - self._w + 1
+        up = 100. - 100. * (self._roll_high.index - start + 1) / self._w
+        down = 100. - 100. * (self._roll_low.index - start + 1) / self._w
         aroon = up - down
 
         self._aro[self._t] = aroon
@@ -720,21 +732,15 @@ class RsiWilder(BaseIndicator):
         up_d[up_d < 0.] = 0.
         down_d[down_d < 0.] = 0.
 
-        rs = np.empty(up_d.shape[0], dtype=float)
+        ma_up = _ewm(up_d, self._alpha, 1)
+        ma_down = _ewm(down_d, self._alpha, 1)
+        rs = ma_up / ma_down
         rs[0:2] = np.nan
 
-        end = self._max_t if self._is_bulk else t0 + 1
-        ma_up = up_d[1]
-        ma_down = down_d[1]
-        for i in range(2, end):
-            ma_up = self._alpha * up_d[i] + self._c * ma_up
-            ma_down = self._alpha * down_d[i] + self._c * ma_down
-            rs[i] = ma_up / ma_down
-
         self._up[slc] = up_d
         self._down[slc] = down_d
-        self._ma_up = ma_up
-        self._ma_down = ma_down
+        self._ma_up = ma_up[-1]
+        self._ma_down = ma_down[-1]
         self._rsi[slc] = 100. - 100. / (1. + rs)
 
     def get_indicator(self) -> dict:
@@ -780,6 +786,8 @@ class Stochastic(BaseIndicator):
         self._p_k = None
         self._p_d = None
         self._p_d_slow = None
+        self._roll_high = _RollingExtremum(w_price, True)
+        self._roll_low = _RollingExtremum(w_price, False)
 
         super(Stochastic, self).__init__(ts, is_bulk, {1})
 
@@ -813,6 +821,11 @@ class Stochastic(BaseIndicator):
             Math.rolling_mean(p_d, self._wd)
         ]
 
+        if not self._is_bulk:
+            window = self._ts[t0 - self._wp + 1:t0 + 1]
+            self._roll_high.reset(window, t0)
+            self._roll_low.reset(window, t0)
+
     def get_indicator(self) -> dict:
         return {'p_d': self._p_d, 'p_d_slow': self._p_d_slow}
 
@@ -820,9 +833,10 @@ class Stochastic(BaseIndicator):
         return self._p_d[self._t], self._p_d_slow[self._t]
 
     def _ind_online(self) -> Union[float, tuple]:
-        start = self._t - self._wp + 1
-        high = np.max(self._ts[start:self._t + 1], axis=0)
-        low = np.min(self._ts[start:self._t + 1], axis=0)
+        self._roll_high.push(self._t, self._ts[self._t])
+        self._roll_low.push(self._t, self._ts[self._t])
+        high = self._roll_high.value
+        low = self._roll_low.value
 
         p_k = (self._ts[self._t] - low) / (high - low)
         p_d = self._p_d[self._t - 1] + (p_k - self._p_k[self._t - self._wk]) / self._wk
@@ -939,20 +953,15 @@ class Tsi(BaseIndicator):
         self._ema_fsabs = np.empty(self._max_t, dtype=float)
         self._ema_pcabs = np.empty(self._max_t, dtype=float)
 
-        def _ewma(out_, m_, a_, start_, end_):
-            out_[:start_ + 1] = m_[:start_ + 1]
-            for i in range(start_ + 1, end_):
-                out_[i] = a_ * (m_[i] - out_[i - 1]) + out_[i - 1]
-
         end = self._max_t if self._is_bulk else t0 + 1
 
         mom = np.r_[.0, self._ts[1:end] - self._ts[:end - 1]]
-        _ewma(self._ema_fs, mom, self._as, 0, end)
-        _ewma(self._ema_pc, self._ema_fs, self._af, 1, end)
+        self._ema_fs[:end] = _ewm(mom, self._as)
+        self._ema_pc[:end] = _ewm(self._ema_fs[:end], self._af, 1)
 
         mom = np.abs(mom)
-        _ewma(self._ema_fsabs, mom, self._as, 0, end)
-        _ewma(self._ema_pcabs, self._ema_fsabs, self._af, 1, end)
+        self._ema_fsabs[:end] = _ewm(mom, self._as)
+        self._ema_pcabs[:end] = _ewm(self._ema_fsabs[:end], self._af, 1)
 
         self._tsi[:end] = 100. * (self._ema_pc[:end] / self._ema_pcabs[:end])
 
@@ -995,6 +1004,8 @@ class Vwap(BaseIndicator):
     def __init__(self, ts: np.ndarray, is_bulk: bool, w: int):
         self._w = w
         self._vwap = None
+        self._sum_pv = .0
+        self._sum_v = .0
 
         super(Vwap, self).__init__(ts, is_bulk, {2})
 
@@ -1010,6 +1021,10 @@ class Vwap(BaseIndicator):
             np.nansum(p * v, axis=1) / np.nansum(v, axis=1)
         ]
 
+        # Rolling sums of the last window for the online updates
+        self._sum_pv = float(np.nansum(p[-1] * v[-1]))
+        self._sum_v = float(np.nansum(v[-1]))
+
     def get_indicator(self) -> dict:
         return {'vwap': self._vwap}
 
@@ -1017,11 +1032,11 @@ class Vwap(BaseIndicator):
         return self._vwap[self._t]
 
     def _ind_online(self) -> Union[float, tuple]:
-        t_last = self._t + 1
-        t_old = t_last - self._w
-        p = self._ts[0, t_old:t_last]
-        v = self._ts[1, t_old:t_last]
-        vwap = np.nansum(p * v) / np.nansum(v)
+        t, t_old = self._t, self._t - self._w
+        ts = self._ts
+        self._sum_pv += ts[0, t] * ts[1, t] - ts[0, t_old] * ts[1, t_old]
+        self._sum_v += ts[1, t] - ts[1, t_old]
+        vwap = self._sum_pv / self._sum_v
         self._vwap[self._t] = vwap
         return vwap
 
@@ -0,0 +1,288 @@
+#
+# Panel Indicators
+# Bulk indicators on calendar-aligned panels of prices <asset, time>
+#
+# Missing values are handled by computing each indicator on the valid
+# observations of each asset only. The valid values of every row are moved
+# to the front of the panel, the indicators are calculated for all the
+# assets at once and the results are moved back to the original dates.
+# Hence, the indicator of each asset is identical to the one obtained from
+# the corresponding 1D indicator on its series without missing values. The
+# indicators are NaN on the dates where the input is missing.
+#
+
+import numpy as np
+from scipy.ndimage import (maximum_filter1d, minimum_filter1d)
+from typing import Generator
+import warnings
+
+from .Utils import _ewm
+
+# Number of periods of the blocks used to accumulate the rolling sums
+_BLOCK = 256
+
+
+def _compact(panel: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Move the valid values of each row to the front keeping their order.
+
+        Output:
+            comp [np.ndarray]: compacted panel, trailing values are NaN
+            order [np.ndarray]: original position of each compacted value
+            valid [np.ndarray]: mask of the valid values in the panel
+    """
+    if panel.ndim != 2:
+        raise ValueError(f'Panel indicators: panel shape={panel.shape} not 2D')
+
+    valid = ~np.isnan(panel)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    return np.take_along_axis(panel, order, axis=1), order, valid
+
+
+def _expand(comp: np.ndarray, order: np.ndarray, valid: np.ndarray) \
+        -> np.ndarray:
+    """ Move the compacted values back to their original positions. """
+    out = np.empty(comp.shape, dtype=float)
+    np.put_along_axis(out, order, comp, axis=1)
+    out[~valid] = np.nan
+    return out
+
+
+def _blocks(n: int, w: int) -> Generator[tuple[int, int], None, None]:
+    """ Blocks <start, end> of the outputs of a rolling window over <n>
+        periods, the inputs of a block start at start - w + 1.
+    """
+    step = max(w, _BLOCK)
+    for start in range(w - 1, n, step):
+        yield start, min(start + step, n)
+
+
+def _center(x: np.ndarray, w: int) -> tuple[np.ndarray, np.ndarray]:
+    """ Center the rows on the mean of their first window. """
+    with warnings.catch_warnings():
+        # Rows without valid values
+        warnings.simplefilter('ignore', RuntimeWarning)
+        c = np.nanmean(x[:, :w], axis=1, keepdims=True)
+    return x - c, c
+
+
+def _window_sums(x: np.ndarray, w: int) -> np.ndarray:
+    """ Sums over all the complete windows of the rows. """
+    c = np.cumsum(x, axis=1)
+    out = np.empty((x.shape[0], x.shape[1] - w + 1))
+    out[:, 0] = c[:, w - 1]
+    out[:, 1:] = c[:, w:] - c[:, :-w]
+    return out
+
+
+def _rolling_mean(v: np.ndarray, w: int) -> np.ndarray:
+    """ Rolling mean along the rows, the first w - 1 values are NaN. The sums
+        are accumulated over blocks of periods, each centered on the mean of
+        its first window, hence the loss of precision depends on the range
+        of the values within a block and not on the full history.
+    """
+    out = np.full(v.shape, np.nan)
+    for start, end in _blocks(v.shape[1], w):
+        x, c = _center(v[:, start - w + 1:end], w)
+        out[:, start:end] = _window_sums(x, w) / w + c
+    return out
+
+
+def _rolling_std(v: np.ndarray, w: int, ddof: int = 1) -> np.ndarray:
+    """ Rolling standard deviation along the rows, the first w - 1 values are
+        NaN. The moments are accumulated over centered blocks of periods as in
+        _rolling_mean(). Windows of constant values have zero deviation.
+    """
+    var = np.full(v.shape, np.nan)
+    for start, end in _blocks(v.shape[1], w):
+        x, _ = _center(v[:, start - w + 1:end], w)
+        m1 = _window_sums(x, w) / w
+        m2 = _window_sums(x * x, w) / w
+        var[:, start:end] = np.maximum(m2 - m1 * m1, .0) * w / (w - ddof)
+
+    flat = _rolling_extremum(v, w, True) == _rolling_extremum(v, w, False)
+    var[flat & ~np.isnan(var)] = .0
+    return np.sqrt(var)
+
+
+def _rolling_extremum(v: np.ndarray, w: int, is_max: bool) -> np.ndarray:
+    """ Rolling maximum or minimum along the rows over the trailing window,
+        the first w - 1 values are NaN.
+    """
+    # Missing values never win the comparison
+    fill = -np.inf if is_max else np.inf
+    f = maximum_filter1d if is_max else minimum_filter1d
+    out = f(np.where(np.isnan(v), fill, v), size=w, axis=1,
+            origin=(w - 1) // 2)
+    out[:, :w - 1] = np.nan
+    return out
+
+
+def panel_sma(panel: np.ndarray, w: int) -> dict:
+    """ Simple Moving Average of each asset of the panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: rolling window size
+
+        Output:
+            res [dict]: 'sma' panel
+    """
+    comp, order, valid = _compact(panel)
+    return {'sma': _expand(_rolling_mean(comp, w), order, valid)}
+
+
+def panel_ewma(panel: np.ndarray, w: int) -> dict:
+    """ Exponentially Weighted Moving Average of each asset of the panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: window size defining the decay 2 / (1 + w)
+
+        Output:
+            res [dict]: 'ewma' panel
+    """
+    comp, order, valid = _compact(panel)
+    return {'ewma': _expand(_ewm(comp, 2. / (1. + w)), order, valid)}
+
+
+def panel_macd(panel: np.ndarray, ws: int, wf: int, wm: int) -> dict:
+    """ Moving Average Convergence Divergence of each asset of the panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            ws [int]: slow window size
+            wf [int]: fast window size
+            wm [int]: signal window size
+
+        Output:
+            res [dict]: 'macd', 'signal' and 'hist' panels
+    """
+    comp, order, valid = _compact(panel)
+    macd = _ewm(comp, 2. / (1. + wf)) - _ewm(comp, 2. / (1. + ws))
+    signal = _ewm(macd, 2. / (1. + wm))
+    return {
+        'macd': _expand(macd, order, valid),
+        'signal': _expand(signal, order, valid),
+        'hist': _expand(macd - signal, order, valid)
+    }
+
+
+def _up_down(comp: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Positive and negative price changes, the first change is NaN. """
+    diff = np.empty(comp.shape, dtype=float)
+    diff[:, 0] = np.nan
+    diff[:, 1:] = np.diff(comp, axis=1)
+    return np.where(diff < .0, .0, diff), np.where(diff > .0, .0, -diff)
+
+
+def panel_rsi_cutler(panel: np.ndarray, w: int) -> dict:
+    """ Cutler's Relative Strength Index, using the SMA, of each asset of the
+        panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: rolling window size
+
+        Output:
+            res [dict]: 'rsi' panel
+    """
+    comp, order, valid = _compact(panel)
+    up, down = _up_down(comp)
+
+    # The first window has one change less, the ratio of the means is the
+    # ratio of the sums
+    up[:, 0] = .0
+    down[:, 0] = .0
+    ma_up = _rolling_mean(up, w)
+    ma_down = _rolling_mean(down, w)
+
+    # Windows without moves have zero means, not the rounding of the rolling
+    # sums, hence flat windows give a NaN RSI
+    ma_up[_rolling_extremum(up, w, True) == .0] = .0
+    ma_down[_rolling_extremum(down, w, True) == .0] = .0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ma_up / ma_down
+    return {'rsi': _expand(100. - 100. / (1. + rs), order, valid)}
+
+
+def panel_rsi_wilder(panel: np.ndarray, w: int) -> dict:
+    """ Wilder's Relative Strength Index, using the EWMA, of each asset of the
+        panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: window size defining the decay 2 / (1 + w)
+
+        Output:
+            res [dict]: 'rsi' panel
+    """
+    comp, order, valid = _compact(panel)
+    up, down = _up_down(comp)
+    alpha = 2. / (1. + w)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = _ewm(up, alpha, 1) / _ewm(down, alpha, 1)
+    rs[:, :2] = np.nan
+    return {'rsi': _expand(100. - 100. / (1. + rs), order, valid)}
+
+
+def panel_bollinger(panel: np.ndarray, w: int, alpha: float) -> dict:
+    """ Bollinger Bands of each asset of the panel.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: rolling window size
+            alpha [float]: width of the bands in standard deviations
+
+        Output:
+            res [dict]: 'high', 'mean', 'low', '%b' and 'width' panels
+    """
+    comp, order, valid = _compact(panel)
+    mean = _rolling_mean(comp, w)
+    band_dev = alpha * _rolling_std(comp, w)
+
+    low = mean - band_dev
+    high = mean + band_dev
+    b_diff = 2. * band_dev
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bp = (comp - low) / b_diff
+        width = b_diff / mean
+
+    # On flat windows %b is undefined, the price may differ from the mean by
+    # the rounding of the rolling sums
+    bp[band_dev == .0] = np.nan
+    return {
+        'high': _expand(high, order, valid),
+        'mean': _expand(mean, order, valid),
+        'low': _expand(low, order, valid),
+        '%b': _expand(bp, order, valid),
+        'width': _expand(width, order, valid)
+    }
+
+
+def panel_donchian(panel: np.ndarray, w: int, shift: int = 0) -> dict:
+    """ Donchian Channels of each asset of the panel on the close prices.
+
+        Input:
+            panel [np.ndarray]: prices <asset, time>
+            w [int]: rolling window size
+            shift [int]: number of periods the channel is moved forward
+                (default: 0)
+
+        Output:
+            res [dict]: 'high', 'mean' and 'low' panels
+    """
+    comp, order, valid = _compact(panel)
+    shift = abs(shift)
+
+    high = np.full(comp.shape, np.nan)
+    low = np.full(comp.shape, np.nan)
+    if comp.shape[1] > shift:
+        end = comp.shape[1] - shift
+        high[:, shift:] = _rolling_extremum(comp[:, :end], w, True)
+        low[:, shift:] = _rolling_extremum(comp[:, :end], w, False)
+
+    return {
+        'high': _expand(high, order, valid),
+        'mean': _expand(.5 * (high + low), order, valid),
+        'low': _expand(low, order, valid)
+    }
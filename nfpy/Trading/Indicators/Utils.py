@@ -3,7 +3,10 @@
 # Functions for indicator functions and classes.
 #
 
+from collections import deque
+from math import sqrt
 import numpy as np
+from scipy.signal import lfilter
 
 from nfpy.Tools import Exceptions as Ex
 
@@ -17,3 +20,84 @@ def _check_len(v, w) -> None:
 def _check_nans(v: np.ndarray) -> None:
     if np.sum(np.isnan(v)) > 0:
         raise Ex.NanPresent(f'The provided Series contains NaNs')
+
+
+def _ewm(v: np.ndarray, alpha: float, start: int = 0) -> np.ndarray:
+    """ Exponentially weighted moving average along the last axis following
+        the recursion
+            y_t = alpha * v_t + (1 - alpha) * y_{t-1}
+        with y_t = v_t up to <start>. The recursion is run as a linear filter.
+    """
+    out = np.empty(v.shape, dtype=float)
+    out[..., :start + 1] = v[..., :start + 1]
+    if v.shape[-1] > start + 1:
+        c = 1. - alpha
+        out[..., start + 1:], _ = lfilter(
+            [alpha], [1., -c], v[..., start + 1:], axis=-1,
+            zi=c * out[..., start:start + 1]
+        )
+    return out
+
+
+class _RollingMoments(object):
+    """ Mean and variance of a sliding window of <w> values. Each update
+        replaces the oldest value with the newest in O(1).
+    """
+
+    def __init__(self, w: int):
+        self._w = w
+        self.mean = .0
+        self._m2 = .0
+
+    def reset(self, v: np.ndarray) -> None:
+        """ Initialize with the values <v> of the window. """
+        self.mean = float(np.mean(v))
+        self._m2 = float(np.sum((v - self.mean) ** 2))
+
+    def update(self, x_new: float, x_old: float) -> None:
+        delta = x_new - x_old
+        mean = self.mean + delta / self._w
+        self._m2 += delta * (x_new - mean + x_old - self.mean)
+        self.mean = mean
+
+    def std(self, ddof: int = 0) -> float:
+        return sqrt(max(self._m2, .0) / (self._w - ddof))
+
+
+class _RollingExtremum(object):
+    """ Maximum, or minimum, of a sliding window of <w> values tracked with a
+        monotonic deque in O(1) amortized per update. Ties are resolved in
+        favour of the oldest value as in np.argmax().
+    """
+
+    def __init__(self, w: int, is_max: bool = True):
+        self._w = w
+        self._is_max = is_max
+        self._q = deque()
+
+    @property
+    def value(self) -> float:
+        return self._q[0][1]
+
+    @property
+    def index(self) -> int:
+        return self._q[0][0]
+
+    def reset(self, v: np.ndarray, t: int) -> None:
+        """ Initialize with the values <v> of the window ending at <t>. """
+        self._q.clear()
+        start = t - v.shape[0] + 1
+        for i, x in enumerate(v):
+            self.push(start + i, x)
+
+    def push(self, t: int, x: float) -> None:
+        q = self._q
+        if self._is_max:
+            while q and q[-1][1] < x:
+                q.pop()
+        else:
+            while q and q[-1][1] > x:
+                q.pop()
+        q.append((t, x))
+        while q[0][0] <= t - self._w:
+            q.popleft()
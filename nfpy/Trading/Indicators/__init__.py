@@ -1,7 +1,9 @@
 from .BaseIndicator import TyIndicator
 from .Channel import *
+from .IndicatorCache import (get_ind_cache_glob, IndicatorCache, TyIndCache)
 from .MA import *
 from .MO import *
+from .Panel import *
 
 
 __all__ = [
@@ -11,10 +13,17 @@ __all__ = [
     # Channel
     'Bollinger', 'Donchian',
 
+    # IndicatorCache
+    'get_ind_cache_glob', 'IndicatorCache', 'TyIndCache',
+
     # MA
     'Csma', 'Dema', 'Ewma', 'Macd', 'Sma', 'Smd', 'Smstd', 'Tema',  # 'wma',
 
     # MO
     'Aroon', 'Atr', 'Cci', 'Fi', 'FiElder', 'Mfi', 'RsiCutler', 'RsiWilder',
-    'Stochastic', 'Tr',  'Tsi'
+    'Stochastic', 'Tr',  'Tsi',
+
+    # Panel
+    'panel_bollinger', 'panel_donchian', 'panel_ewma', 'panel_macd',
+    'panel_rsi_cutler', 'panel_rsi_wilder', 'panel_sma',
 ]
@@ -0,0 +1,225 @@
+#
+# Parameter Sweep
+# Grid and random search over the parameters of a strategy
+#
+
+import itertools
+import numpy as np
+import pandas as pd
+from typing import (Any, Callable, Iterator, Optional, Sequence, Union)
+
+import nfpy.Assets as Ast
+from nfpy.Tools import Utilities as Ut
+
+from .Backtesting import Backtester
+from .BaseSizer import TySizer
+from .Indicators import get_ind_cache_glob
+from .Strategies import TyStrategy
+
+
+class SweepResults(Ut.AttributizedDict):
+    """ Columnar table of the results of a parameter sweep. Each column is a
+        typed array with one row per tested (uid, parameters) pair. The uids
+        are stored as codes into <uids>. The rows of the failed backtests are
+        marked in <success>, their metrics are NaN or zero for the counts.
+    """
+
+    _METRICS = ('final_value', 'total_return', 'max_drawdown',
+                'num_buy', 'num_sell')
+    _COUNTS = ('num_buy', 'num_sell')
+
+    # Metrics for which the lower the better
+    _MINIMIZE = ('max_drawdown',)
+
+    def __init__(self):
+        super().__init__()
+        self.uids = None
+        self.params = None
+        self.uid_code = None
+        self.success = None
+        self.columns = None
+
+    def __len__(self) -> int:
+        return 0 if self.uid_code is None else self.uid_code.shape[0]
+
+    def to_frame(self) -> pd.DataFrame:
+        """ Returns the results table as a DataFrame. """
+        df = pd.DataFrame(self.columns)
+        df.insert(0, 'uid', pd.Categorical.from_codes(self.uid_code, self.uids))
+        df.insert(1, 'success', self.success)
+        return df
+
+    def best(self, metric: str = 'total_return', uid: Optional[str] = None,
+             maximize: Optional[bool] = None) -> dict[str, Any]:
+        """ Returns the row with the best value of <metric>, optionally
+            restricted to a single <uid>.
+
+            Input:
+                metric [str]: metric to rank the results on
+                    (default: 'total_return')
+                uid [Optional[str]]: uid to restrict the search to
+                    (default: None)
+                maximize [Optional[bool]]: if True return the highest value,
+                    if False the lowest. If None the drawdown is minimized
+                    and the other metrics are maximized (default: None)
+
+            Exceptions:
+                ValueError: if the metric is unknown or no result is available
+        """
+        if metric not in self.columns:
+            raise ValueError(f'SweepResults(): metric {metric} not recognized')
+        if maximize is None:
+            maximize = metric not in self._MINIMIZE
+
+        v = np.where(self.success, self.columns[metric].astype(float), np.nan)
+        if uid is not None:
+            v = np.where(self.uid_code == self.uids.index(uid), v, np.nan)
+        if np.all(np.isnan(v)):
+            raise ValueError('SweepResults(): no result available')
+
+        i = int(np.nanargmax(v) if maximize else np.nanargmin(v))
+        row = {'uid': self.uids[self.uid_code[i]]}
+        row.update({k: c[i] for k, c in self.columns.items()})
+        return row
+
+
+class ParameterSweep(object):
+    """ Grid or random search over the parameters of a strategy run in bulk
+        mode. The bulk indicators are calculated once per uid and shared by
+        all the parameter combinations that use them through the global
+        indicator cache, hence a grid over two moving average windows of
+        sizes N and M calculates N + M moving averages rather than 2 N M.
+
+        Input:
+            uids [Union[str, Sequence[str]]]: uids to backtest
+            strategy [TyStrategy]: strategy class
+            grid [dict[str, Sequence]]: values of each parameter to test
+            initial [float]: initial cash value
+            sizer [TySizer]: trade sizer
+            fixed [Optional[dict[str, Any]]]: parameters of the strategy not
+                swept (default: None)
+            samples [Optional[int]]: number of combinations drawn at random
+                among the admissible ones, if None all the admissible
+                combinations are tested (default: None)
+            constraint [Optional[Callable[[dict], bool]]]: filter of the
+                admissible combinations, e.g. w_fast < w_slow (default: None)
+            seed [Optional[int]]: seed of the random search (default: None)
+    """
+
+    def __init__(self, uids: Union[str, Sequence[str]], strategy: TyStrategy,
+                 grid: dict[str, Sequence], initial: float, sizer: TySizer,
+                 fixed: Optional[dict[str, Any]] = None,
+                 samples: Optional[int] = None,
+                 constraint: Optional[Callable[[dict], bool]] = None,
+                 seed: Optional[int] = None):
+        if not grid:
+            raise ValueError('ParameterSweep(): empty parameters grid')
+        if any(len(v) == 0 for v in grid.values()):
+            raise ValueError('ParameterSweep(): parameters without values')
+        if (samples is not None) and (int(samples) <= 0):
+            raise ValueError('ParameterSweep(): number of samples must be positive')
+
+        self._af = Ast.get_af_glob()
+
+        self._uids = [uids] if isinstance(uids, str) else list(uids)
+        self._strat = strategy
+        self._grid = {k: list(v) for k, v in grid.items()}
+        self._fixed = fixed if fixed else {}
+        self._samples = samples
+        self._constraint = constraint
+        self._seed = seed
+
+        self._bt = Backtester(self._uids, initial, True)
+        self._bt.sizer = sizer
+
+        self._res = None
+
+    @property
+    def result(self) -> SweepResults:
+        if self._res is None:
+            self._res = self._calculate()
+        return self._res
+
+    def _admissible(self) -> Iterator[dict[str, Any]]:
+        """ Generator of the combinations of the grid satisfying the
+            constraint.
+        """
+        names = list(self._grid.keys())
+        for values in itertools.product(*self._grid.values()):
+            p = dict(zip(names, values))
+            if (self._constraint is None) or self._constraint(p):
+                yield p
+
+    def combinations(self) -> Iterator[dict[str, Any]]:
+        """ Generator of the parameter combinations to test. In a random
+            search the combinations are drawn among the admissible ones,
+            hence exactly <samples> combinations are tested if available.
+        """
+        if self._samples is None:
+            yield from self._admissible()
+            return
+
+        combos = list(self._admissible())
+        rng = np.random.default_rng(self._seed)
+        size = len(combos)
+        idx = rng.choice(size, min(int(self._samples), size), replace=False)
+        for i in np.sort(idx):
+            yield combos[i]
+
+    @staticmethod
+    def _max_drawdown(equity: np.ndarray) -> float:
+        peak = np.maximum.accumulate(equity)
+        return float(np.max(1. - equity / peak))
+
+    def _calculate(self) -> SweepResults:
+        combos = list(self.combinations())
+        names = list(self._grid.keys())
+        n = len(self._uids) * len(combos)
+
+        uid_code = np.empty(n, dtype=np.int32)
+        success = np.zeros(n, dtype=bool)
+        metrics = {
+            m: np.zeros(n, dtype=np.int64) if m in SweepResults._COUNTS
+            else np.full(n, np.nan)
+            for m in SweepResults._METRICS
+        }
+
+        cache = get_ind_cache_glob()
+        row = 0
+        for k, uid in enumerate(self._uids):
+            asset = self._af.get(uid)
+
+            # Indicators are shared only among the combinations of one uid
+            with cache:
+                for p in combos:
+                    uid_code[row] = k
+                    try:
+                        strategy = self._strat(asset, True, **self._fixed, **p)
+                        ptf = self._bt.apply(strategy)
+                    except (IndexError, TypeError, ValueError) as ex:
+                        print(f'Sweep failed for {uid} {p}\n{ex}')
+                    else:
+                        ptf.statistics()
+                        success[row] = True
+                        metrics['final_value'][row] = ptf.final_value
+                        metrics['total_return'][row] = ptf.total_return
+                        if ptf.equity is not None:
+                            metrics['max_drawdown'][row] = \
+                                self._max_drawdown(ptf.equity)
+                        metrics['num_buy'][row] = ptf.num_buy
+                        metrics['num_sell'][row] = ptf.num_sell
+                    row += 1
+
+        columns = {
+            name: np.tile(np.array([p[name] for p in combos]), len(self._uids))
+            for name in names
+        }
+        columns.update(metrics)
+
+        res = SweepResults()
+        res.uids = self._uids
+        res.params = names
+        res.uid_code = uid_code
+        res.success = success
+        res.columns = columns
+        return res
@@ -12,7 +12,7 @@ import nfpy.Assets as Ast
 import nfpy.Math as Math
 
 from .Enums import (Order, Signal, SignalFlag)
-from ..Indicators import TyIndicator
+from ..Indicators import (get_ind_cache_glob, TyIndicator)
 
 
 class BaseStrategy(metaclass=ABCMeta):
@@ -90,6 +90,43 @@ class BaseStrategy(metaclass=ABCMeta):
 
         return signal
 
+    @staticmethod
+    def _cross_signals(d: np.ndarray, t0: int) -> np.ndarray:
+        """ Signals generated by the crossing of zero of the series <d> from
+            the index <t0>: a BUY when <d> becomes positive after being
+            negative and a SELL when it becomes negative after being positive.
+            Zero and missing values leave the side unchanged.
+        """
+        flags = np.zeros(d.shape[0], dtype=np.int8)
+        side = np.nan_to_num(np.sign(d[t0:]), nan=.0).astype(np.int8)
+        if side.shape[0] < 2:
+            return flags
+
+        # Side of the last non-zero value before each index
+        idx = np.where(side != 0, np.arange(side.shape[0]), -1)
+        last = np.maximum.accumulate(idx)[:-1]
+        prev = np.where(last >= 0, side[np.maximum(last, 0)], 0)
+
+        curr = side[1:]
+        cross = (curr != 0) & (prev != 0) & (curr != prev)
+        flags[t0 + 1:] = np.where(cross, curr, 0)
+        return flags
+
+    @staticmethod
+    def _band_exit_signals(z: np.ndarray, t0: int) -> np.ndarray:
+        """ Signals generated by the exit from a band from the index <t0>.
+            The position with respect to the band <z> is -1 below, 1 above and
+            0 inside. A BUY is raised when re-entering from below and a SELL
+            when re-entering from above.
+        """
+        flags = np.zeros(z.shape[0], dtype=np.int8)
+        zt = z[t0:]
+        if zt.shape[0] < 2:
+            return flags
+
+        flags[t0 + 1:] = np.where(zt[1:] == 0, -zt[:-1], 0)
+        return flags
+
     @staticmethod
     def _extract_ts(asset: Ast.TyAsset) -> np.ndarray:
         """ Returns the 1D or 2D time series required to use the strategy. """
@@ -112,16 +149,60 @@ class BaseStrategy(metaclass=ABCMeta):
     def raise_signal(self, flag: SignalFlag) -> Signal:
         return Signal(self._t, self._dt[self._t], flag)
 
+    def _new_indicator(self, ind: type, *params) -> TyIndicator:
+        """ Create the indicator <ind> with parameters <params> on the series
+            of the strategy. In bulk mode, if the global indicator cache is
+            active an identical indicator is shared.
+        """
+        return get_ind_cache_glob().get(ind, self._ts, self._is_bulk, *params)
+
     def _register_indicator(self, ind: list[TyIndicator]) -> None:
         self._indicators.extend(ind)
 
     def start(self, t0: Optional[int] = None) -> None:
-        """ Call the start() method of each indicator. """
+        """ Call the start() method of each indicator. The first period
+            evaluated by the strategy is <t0>, the same of the indicators.
+        """
         t0 = self.min_length + 1 if t0 is None else t0
-        self._t = t0
+        self._t = t0 - 1
         for ind in self._indicators:
             ind.start(t0)
 
+    def bulk_signals(self) -> np.ndarray:
+        """ Signals of the whole history calculated with array operations on
+            the bulk indicators. The signals are raised at the same periods
+            of the online mode and delayed by the periods of confirmation.
+
+            Output:
+                flags [np.ndarray]: array of int8 with 1 for BUY, -1 for SELL
+                    and 0 where no signal is raised
+
+            Exceptions:
+                ValueError: if the strategy is not in bulk mode
+                NotImplementedError: if the strategy has no vectorized signals
+        """
+        if not self._is_bulk:
+            raise ValueError(f'{self._LABEL}: vectorized signals require the bulk mode')
+
+        self.start()
+        t0 = self._t + 1
+        if t0 >= self._max_t:
+            return np.zeros(self._max_t, dtype=np.int8)
+
+        flags = self._bulk_signals(t0)
+        npc = self._num_p_conf
+        if npc > 0:
+            flags[npc:] = flags[:-npc].copy()
+            flags[:npc] = 0
+        return flags
+
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        """ Returns the array of signal flags from the index <t0> onwards
+            using the bulk indicators. Strategies supporting the vectorized
+            backtesting must override this method.
+        """
+        raise NotImplementedError(f'{self._LABEL}: vectorized signals not available')
+
     @abstractmethod
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         """ Return the validity of a pending order.
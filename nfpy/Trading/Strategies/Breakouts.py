@@ -3,6 +3,7 @@
 # Strategies based on breakouts from channels or oscillators
 #
 
+import numpy as np
 from typing import (Callable, Optional, Sequence)
 
 import nfpy.Assets as Ast
@@ -38,14 +39,20 @@ class OscillatorBreakout(BaseStrategy):
         self._params = params
 
         self._status = b''
-        self._ind_f = indicator(self._ts, bulk, *params)
+        self._ind_f = self._new_indicator(indicator, *params)
         self._register_indicator([self._ind_f])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        # The oscillator is the first output of the indicator
+        osc = next(iter(self._ind_f.get_indicator().values()))
+        z = np.where(osc < self._thr[0], -1, np.where(osc > self._thr[1], 1, 0))
+        return self._band_exit_signals(z, t0)
+
     def _signal(self) -> Optional[Signal]:
-        osc = self._ind_f.__next__()
+        osc = self._ind_f.__next__()[1]
         signal = None
 
         if osc < self._thr[0]:
@@ -59,7 +66,7 @@ class OscillatorBreakout(BaseStrategy):
 
             # We are overbought ('b') and we exit ('n') => sell
             elif self._status == b'b':
-                signal = self.raise_signal(SignalFlag.BUY)
+                signal = self.raise_signal(SignalFlag.SELL)
             self._status = b'n'
 
         return signal
@@ -88,14 +95,20 @@ class ChannelBreakout(BaseStrategy):
         self._params = params
 
         self._status = b''
-        self._ind_f = indicator(self._ts, bulk, *params)
+        self._ind_f = self._new_indicator(indicator, *params)
         self._register_indicator([self._ind_f])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        ind = self._ind_f.get_indicator()
+        v = self._ts
+        z = np.where(v < ind['low'], -1, np.where(v > ind['high'], 1, 0))
+        return self._band_exit_signals(z, t0)
+
     def _signal(self) -> Optional[Signal]:
-        high, _, low = self._ind_f.__next__()[:3]
+        high, _, low = self._ind_f.__next__()[1][:3]
         signal = None
 
         v = self._ts[self._t]
@@ -110,7 +123,7 @@ class ChannelBreakout(BaseStrategy):
 
             # We are overbought ('b') and we exit ('n') => sell
             elif self._status == b'b':
-                signal = self.raise_signal(SignalFlag.BUY)
+                signal = self.raise_signal(SignalFlag.SELL)
             self._status = b'n'
 
         return signal
@@ -133,8 +146,8 @@ class DonchianBreakout(ChannelBreakout):
     DESCRIPTION = f""
 
     def __init__(self, asset: Ast.TyAsset, bulk: bool, w: int,
-                 npc: Optional[int] = 0):
-        super().__init__(asset, bulk, Ind.Donchian, (w,), npc)
+                 npc: Optional[int] = 0, shift: int = 1):
+        super().__init__(asset, bulk, Ind.Donchian, (w, shift), npc)
 
 
 class BollingerBreakout(ChannelBreakout):
@@ -3,6 +3,7 @@
 # Strategies based on crossing between MAs
 #
 
+import numpy as np
 from typing import Optional
 
 import nfpy.Assets as Ast
@@ -37,14 +38,18 @@ class SMAPriceCross(BaseStrategy):
         self._w = w
 
         self._status = b''
-        self._ma = Ind.Sma(self._ts, bulk, w)
+        self._ma = self._new_indicator(Ind.Sma, w)
         self._register_indicator([self._ma])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        ma = self._ma.get_indicator()['sma']
+        return self._cross_signals(self._ts - ma, t0)
+
     def _signal(self) -> Optional[Signal]:
-        ma = self._ma.__next__()
+        ma = self._ma.__next__()[1]
         d_new = self._ts[self._t] - ma
 
         signal = None
@@ -87,16 +92,21 @@ class TwoSMACross(BaseStrategy):
         self._ws = w_slow
 
         self._status = b''
-        self._maf = Ind.Sma(self._ts, bulk, w_fast)
-        self._mas = Ind.Sma(self._ts, bulk, w_slow)
+        self._maf = self._new_indicator(Ind.Sma, w_fast)
+        self._mas = self._new_indicator(Ind.Sma, w_slow)
         self._register_indicator([self._maf, self._mas])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        maf = self._maf.get_indicator()['sma']
+        mas = self._mas.get_indicator()['sma']
+        return self._cross_signals(maf - mas, t0)
+
     def _signal(self) -> Optional[Signal]:
-        maf = self._maf.__next__()
-        mas = self._mas.__next__()
+        maf = self._maf.__next__()[1]
+        mas = self._mas.__next__()[1]
         d_new = maf - mas
 
         signal = None
@@ -137,14 +147,18 @@ class EMAPriceCross(BaseStrategy):
         self._w = w
 
         self._status = b''
-        self._ema = Ind.Ewma(self._ts, bulk, w)
+        self._ema = self._new_indicator(Ind.Ewma, w)
         self._register_indicator([self._ema])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        ema = self._ema.get_indicator()['ewma']
+        return self._cross_signals(self._ts - ema, t0)
+
     def _signal(self) -> Optional[Signal]:
-        ema = self._ema.__next__()
+        ema = self._ema.__next__()[1]
         d_new = self._ts[self._t] - ema
 
         signal = None
@@ -187,16 +201,21 @@ class TwoEMACross(BaseStrategy):
         self._ws = w_slow
 
         self._status = b''
-        self._emaf = Ind.Ewma(self._ts, bulk, w_fast)
-        self._emas = Ind.Ewma(self._ts, bulk, w_slow)
+        self._emaf = self._new_indicator(Ind.Ewma, w_fast)
+        self._emas = self._new_indicator(Ind.Ewma, w_slow)
         self._register_indicator([self._emaf, self._emas])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        emaf = self._emaf.get_indicator()['ewma']
+        emas = self._emas.get_indicator()['ewma']
+        return self._cross_signals(emaf - emas, t0)
+
     def _signal(self) -> Optional[Signal]:
-        emaf = self._emaf.__next__()
-        emas = self._emas.__next__()
+        emaf = self._emaf.__next__()[1]
+        emas = self._emas.__next__()[1]
         d_new = emaf - emas
 
         signal = None
@@ -242,18 +261,29 @@ class ThreeSMAMomentumStrategy(BaseStrategy):
         self._wt = w_trend
 
         self._status = b''
-        self._maf = Ind.Sma(self._ts, bulk, w_fast)
-        self._mas = Ind.Sma(self._ts, bulk, w_slow)
-        self._mat = Ind.Sma(self._ts, bulk, w_trend)
+        self._maf = self._new_indicator(Ind.Sma, w_fast)
+        self._mas = self._new_indicator(Ind.Sma, w_slow)
+        self._mat = self._new_indicator(Ind.Sma, w_trend)
         self._register_indicator([self._maf, self._mas, self._mat])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        maf = self._maf.get_indicator()['sma']
+        mas = self._mas.get_indicator()['sma']
+        mat = self._mat.get_indicator()['sma']
+        flags = self._cross_signals(maf - mas, t0)
+
+        # Keep only the crossings in the direction of the trend
+        flags[(flags > 0) & ~(self._ts > mat)] = 0
+        flags[(flags < 0) & ~(self._ts < mat)] = 0
+        return flags
+
     def _signal(self) -> Optional[Signal]:
-        maf = self._maf.__next__()
-        mas = self._mas.__next__()
-        mat = self._mat.__next__()
+        maf = self._maf.__next__()[1]
+        mas = self._mas.__next__()[1]
+        mat = self._mat.__next__()[1]
         d_new = maf - mas
 
         signal = None
@@ -301,18 +331,29 @@ class ThreeEMAMomentumStrategy(BaseStrategy):
         self._wt = w_trend
 
         self._status = b''
-        self._emaf = Ind.Ewma(self._ts, bulk, w_fast)
-        self._emas = Ind.Ewma(self._ts, bulk, w_slow)
-        self._emat = Ind.Ewma(self._ts, bulk, w_trend)
+        self._emaf = self._new_indicator(Ind.Ewma, w_fast)
+        self._emas = self._new_indicator(Ind.Ewma, w_slow)
+        self._emat = self._new_indicator(Ind.Ewma, w_trend)
         self._register_indicator([self._emaf, self._emas, self._emat])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        emaf = self._emaf.get_indicator()['ewma']
+        emas = self._emas.get_indicator()['ewma']
+        emat = self._emat.get_indicator()['ewma']
+        flags = self._cross_signals(emaf - emas, t0)
+
+        # Keep only the crossings in the direction of the trend
+        flags[(flags > 0) & ~(self._ts > emat)] = 0
+        flags[(flags < 0) & ~(self._ts < emat)] = 0
+        return flags
+
     def _signal(self) -> Optional[Signal]:
-        emaf = self._emaf.__next__()
-        emas = self._emas.__next__()
-        emat = self._emat.__next__()
+        emaf = self._emaf.__next__()[1]
+        emas = self._emas.__next__()[1]
+        emat = self._emat.__next__()[1]
         d_new = emaf - emas
 
         signal = None
@@ -357,14 +398,18 @@ class MACDHistReversalStrategy(BaseStrategy):
         self._wm = w_macd
 
         self._status = b''
-        self._macd = Ind.Macd(self._ts, bulk, w_slow, w_fast, w_macd)
+        self._macd = self._new_indicator(Ind.Macd, w_slow, w_fast, w_macd)
         self._register_indicator([self._macd])
 
     def check_order_validity(self, order: Order) -> tuple[str, int]:
         return 'execute', self._t
 
+    def _bulk_signals(self, t0: int) -> np.ndarray:
+        hist = self._macd.get_indicator()['hist']
+        return self._cross_signals(hist, t0)
+
     def _signal(self) -> Optional[Signal]:
-        hist = self._macd.__next__()[2]
+        hist = self._macd.__next__()[1][2]
 
         signal = None
         if hist > .0:
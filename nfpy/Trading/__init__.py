@@ -1,6 +1,7 @@
 from .AlertsEngine import (AlertsEngine, Alert)
 from .Backtesting import (Backtester, Portfolio)
 from .BaseSizer import TySizer
+from .ParameterSweep import (ParameterSweep, SweepResults)
 from .SR import (get_pivot, SRBreach, SRBreachEngine)
 from .Strategies import (Order, Signal, SignalFlag, TyStrategy)
 
@@ -18,6 +19,9 @@ __all__ = [
     # BaseStrategy
     'TyStrategy',
 
+    # ParameterSweep
+    'ParameterSweep', 'SweepResults',
+
     # SR
     'get_pivot', 'SRBreach', 'SRBreachEngine',
 
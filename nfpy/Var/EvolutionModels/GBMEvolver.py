@@ -38,3 +38,28 @@ class GBMEvolver(BaseVarEvolver):
         self._path = self.mu - .5*self.var + draws
         self._res[n] = self._path.sum()
         # self._data[n] = (1. + self._path).prod() - 1.
+
+    @staticmethod
+    def evolve(draws: np.ndarray, mu: np.ndarray,
+               full: bool = False) -> np.ndarray:
+        """ Evolve all paths of all risk factors at once. The draws must
+            already be correlated and scaled by the volatility.
+
+            The drift <mu> is the mean of the log-returns, that estimates
+            mu - .5 sigma^2 of d ln S = (mu - .5 sigma^2) dt + sigma dz, hence
+            it already includes the Ito correction and is applied as is.
+
+            Input:
+                draws [np.ndarray]: tensor of draws <path, time, risk factor>
+                mu [np.ndarray]: mean log-return of each risk factor
+                full [bool]: if True return the whole paths, otherwise only
+                    the value at the horizon (default: False)
+
+            Output:
+                log_ret [np.ndarray]: cumulated log-returns, <path, time,
+                    risk factor> if <full> else <path, risk factor>
+        """
+        if full:
+            steps = np.arange(1, draws.shape[1] + 1)[:, None]
+            return np.cumsum(draws, axis=1) + steps * mu
+        return draws.sum(axis=1) + draws.shape[1] * mu
@@ -55,6 +55,7 @@ class HistoricalVarModel(object):
 
         # Random engine
         self._rnd_engine = None
+        self._draws = None
 
         # Outputs
         self._res = None
@@ -128,7 +129,8 @@ class HistoricalVarModel(object):
         return self._rf[l]
 
     def get_rnd_draws(self, n: int, rf_uid: str) -> np.array:
-        return self._rnd_engine.get(n, rf_uid)
+        i = self._rnd_engine.labels.index(rf_uid)
+        return self._draws[n, :, i]
 
     def calculate(self):
         # fase 0: data cleaning
@@ -171,8 +173,10 @@ class HistoricalVarModel(object):
     def _initialize_random_engine(self):
         """ calculates the sigma for the risk factors
         """
-        self._rnd_engine = RandomEngine(self._rf, self._obs, self._num_rf,
-                                        self._horizon, self._n)
+        self._rnd_engine = RandomEngine.from_risk_factors(
+            self._rf, self._obs, self._horizon
+        )
+        self._draws = self._rnd_engine.draws(self._n)
 
     def _simulate(self):
         """ for each rf in the dict perform the calculation, to be
@@ -0,0 +1,274 @@
+#
+# Monte Carlo Var
+# Vectorized Monte Carlo Value at Risk with memory-aware chunking
+#
+
+import numpy as np
+from scipy.stats import norm
+from typing import (Optional, Sequence)
+
+from nfpy.Tools import Utilities as Ut
+
+from .EvolutionModels.GBMEvolver import GBMEvolver
+from .RandomEngine import RandomEngine
+
+
+class MCVarResult(Ut.AttributizedDict):
+    """ Object containing the results of the Monte Carlo VaR calculation. """
+
+    def __init__(self):
+        super().__init__()
+        self.labels = None
+        self.horizon = None
+        self.paths = None
+        self.chunk_size = None
+        self.chunks = None
+        self.confidence = None
+        self.var = None
+        self.es = None
+        self.mean = None
+        self.std = None
+        self.rf_var = None
+        self.rf_es = None
+        self.cv_beta = None
+
+
+class TailAccumulator(object):
+    """ Streaming estimate of the lower tail of a distribution. Only the <k>
+        smallest values observed so far are kept for each column, hence
+        quantiles and expected shortfall up to a tail probability of k/N are
+        exact while the memory does not depend on the number of samples.
+        Mean and variance are merged across blocks (Chan et al.).
+
+        Input:
+            k [int]: number of tail values to keep
+            m [int]: number of columns (default: 1)
+    """
+
+    def __init__(self, k: int, m: int = 1):
+        self._k = max(1, int(k))
+        self._tail = np.empty((0, m))
+        self._cnt = 0
+        self._mean = np.zeros(m)
+        self._m2 = np.zeros(m)
+
+    @property
+    def count(self) -> int:
+        return self._cnt
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    @property
+    def std(self) -> np.ndarray:
+        if self._cnt < 2:
+            return np.full(self._mean.shape, np.nan)
+        return np.sqrt(self._m2 / (self._cnt - 1))
+
+    def update(self, x: np.ndarray) -> None:
+        """ Add a block of samples <sample, column>. """
+        n = x.shape[0]
+        if n == 0:
+            return
+
+        # Merge the moments of the block
+        mean_b = x.mean(axis=0)
+        m2_b = np.sum((x - mean_b) ** 2, axis=0)
+        tot = self._cnt + n
+        delta = mean_b - self._mean
+        self._m2 += m2_b + delta * delta * self._cnt * n / tot
+        self._mean += delta * n / tot
+        self._cnt = tot
+
+        # Keep the smallest k values of each column
+        tail = np.concatenate((self._tail, x), axis=0)
+        if tail.shape[0] > self._k:
+            tail = np.partition(tail, self._k - 1, axis=0)[:self._k]
+        self._tail = tail
+
+    def quantile(self, alpha: float) -> tuple[np.ndarray, np.ndarray]:
+        """ Lower quantile at tail probability <alpha> and the mean of the
+            values below it. The quantile is the m-th smallest value with
+            m = ceil(alpha * N).
+
+            Output:
+                q [np.ndarray]: quantile of each column
+                tail_mean [np.ndarray]: mean of the tail of each column
+
+            Exceptions:
+                ValueError: if the tail is not long enough for <alpha>
+        """
+        m = max(1, int(np.ceil(alpha * self._cnt - 1e-9)))
+        if m > self._tail.shape[0]:
+            raise ValueError(f'TailAccumulator(): tail probability {alpha} beyond the stored tail')
+
+        tail = np.sort(self._tail, axis=0)[:m]
+        return tail[-1], tail.mean(axis=0)
+
+
+class MonteCarloVar(object):
+    """ Monte Carlo Value at Risk of a linear portfolio of risk factors
+        evolved as correlated geometric brownian motions. All paths and risk
+        factors are evolved as a single tensor operation on blocks of paths
+        sized to fit in <mem_budget> bytes. The P&L distribution is never
+        stored: the tails needed for VaR and expected shortfall are
+        accumulated across blocks.
+
+        The variance reduction techniques of the RandomEngine are enabled by
+        <antithetic>, <moment_matching> and <sobol>. With <control_variate>
+        the first order P&L, whose distribution is gaussian and known in
+        closed form, is simulated alongside and used as control for the
+        portfolio VaR, ES and mean. The coefficient of the control is
+        estimated on the first block of paths.
+
+        The drift of each risk factor is the mean of its log-returns, which
+        already includes the Ito correction -.5 sigma^2.
+
+        Input:
+            returns [np.ndarray]: log-returns of the risk factors <rf, time>,
+                observations with missing values are discarded
+            exposures [np.ndarray]: value of the portfolio exposed to each
+                risk factor
+            horizon [int]: number of periods of the projection
+            paths [int]: number of simulated paths
+            confidence [Sequence[float]]: confidence levels of the VaR
+                (default: (.95, .99))
+            labels [Optional[Sequence[str]]]: names of the risk factors
+                (default: None)
+            mem_budget [int]: memory available for the simulation in bytes
+                (default: 256MB)
+            seed [Optional[int]]: seed of the random generator (default: None)
+            antithetic [bool]: use antithetic variates (default: False)
+            moment_matching [bool]: match the moments of the draws
+                (default: False)
+            sobol [bool]: use Sobol' sequences with Brownian bridge
+                (default: False)
+            control_variate [bool]: use the first order P&L as control
+                (default: False)
+    """
+
+    def __init__(self, returns: np.ndarray, exposures: np.ndarray,
+                 horizon: int, paths: int,
+                 confidence: Sequence[float] = (.95, .99),
+                 labels: Optional[Sequence[str]] = None,
+                 mem_budget: int = 2 ** 28, seed: Optional[int] = None,
+                 antithetic: bool = False, moment_matching: bool = False,
+                 sobol: bool = False, control_variate: bool = False):
+        if returns.ndim != 2:
+            raise ValueError('MonteCarloVar(): returns matrix not 2D')
+        if exposures.shape != (returns.shape[0],):
+            raise ValueError(f'MonteCarloVar(): exposures must be of size {returns.shape[0]}')
+        if int(paths) <= 0:
+            raise ValueError('MonteCarloVar(): number of paths must be positive')
+        if any((c <= .0) or (c >= 1.) for c in confidence):
+            raise ValueError('MonteCarloVar(): confidence levels must be in (0, 1)')
+
+        ret = returns[:, ~np.any(np.isnan(returns), axis=0)]
+        if ret.shape[1] < 2:
+            raise ValueError('MonteCarloVar(): not enough complete observations')
+
+        self._exp = exposures
+        self._horizon = int(horizon)
+        self._paths = int(paths)
+        self._conf = tuple(confidence)
+        self._labels = labels
+        self._mem = int(mem_budget)
+        self._cv = control_variate
+
+        self._mu = ret.mean(axis=1)
+        sigma = np.atleast_2d(np.cov(ret))
+        self._sigma = sigma
+        self._engine = RandomEngine(
+            sigma, self._horizon, seed, labels, antithetic=antithetic,
+            moment_matching=moment_matching, sobol=sobol
+        )
+
+        self._res = None
+
+    @property
+    def engine(self) -> RandomEngine:
+        return self._engine
+
+    @property
+    def chunk_size(self) -> int:
+        """ Number of paths simulated in each block. """
+        per_path = self._engine.tensors * self._horizon \
+            * self._exp.shape[0] * np.dtype(float).itemsize
+        chunk = max(1, min(self._paths, self._mem // per_path))
+        return self._engine.fit_chunk(chunk)
+
+    @property
+    def result(self) -> MCVarResult:
+        if self._res is None:
+            self._res = self._calculate()
+        return self._res
+
+    def _linear_pnl(self) -> tuple[float, float]:
+        """ Mean and standard deviation of the first order P&L. The mean
+            log-return is the drift of the log-prices, see GBMEvolver.evolve().
+        """
+        mean = self._horizon * self._exp @ self._mu
+        std = np.sqrt(self._horizon * self._exp @ self._sigma @ self._exp)
+        return float(mean), float(std)
+
+    def _calculate(self) -> MCVarResult:
+        n_rf = self._exp.shape[0]
+        n_cols = n_rf + 2 if self._cv else n_rf + 1
+        chunk = self.chunk_size
+
+        # Column 0 is the portfolio, then the single risk factors and, if
+        # used, the control variate
+        k = int(np.ceil((1. - min(self._conf)) * self._paths)) + 1
+        acc = TailAccumulator(k, n_cols)
+
+        pnl = np.empty((chunk, n_cols))
+        n_chunks, beta = 0, .0
+        for draws in self._engine.chunks(self._paths, chunk):
+            n = draws.shape[0]
+            log_ret = GBMEvolver.evolve(draws, self._mu)
+            del draws
+
+            blk = pnl[:n]
+            np.multiply(np.expm1(log_ret), self._exp, out=blk[:, 1:n_rf + 1])
+            np.sum(blk[:, 1:n_rf + 1], axis=1, out=blk[:, 0])
+            if self._cv:
+                blk[:, -1] = log_ret @ self._exp
+                if (n_chunks == 0) and (n > 1):
+                    c = np.cov(blk[:, 0], blk[:, -1])
+                    beta = c[0, 1] / c[1, 1] if c[1, 1] > 0. else .0
+            acc.update(blk)
+            n_chunks += 1
+
+        var = np.empty((len(self._conf), n_cols))
+        es = np.empty((len(self._conf), n_cols))
+        for i, c in enumerate(self._conf):
+            q, m = acc.quantile(1. - c)
+            var[i], es[i] = -q, -m
+
+        mean = float(acc.mean[0])
+        if self._cv:
+            # Correct the estimates with the known error of the control
+            mu_l, std_l = self._linear_pnl()
+            z = norm.ppf(1. - np.array(self._conf))
+            var_l = -(mu_l + std_l * z)
+            es_l = -(mu_l - std_l * norm.pdf(z) / (1. - np.array(self._conf)))
+            var[:, 0] -= beta * (var[:, -1] - var_l)
+            es[:, 0] -= beta * (es[:, -1] - es_l)
+            mean -= beta * (float(acc.mean[-1]) - mu_l)
+
+        res = MCVarResult()
+        res.labels = self._labels
+        res.horizon = self._horizon
+        res.paths = self._paths
+        res.chunk_size = chunk
+        res.chunks = n_chunks
+        res.confidence = self._conf
+        res.var = var[:, 0]
+        res.es = es[:, 0]
+        res.mean = mean
+        res.std = float(acc.std[0])
+        res.rf_var = var[:, 1:n_rf + 1]
+        res.rf_es = es[:, 1:n_rf + 1]
+        res.cv_beta = beta if self._cv else None
+        return res
@@ -3,105 +3,234 @@
 # Class that implements the basic random generator engine for Var
 #
 
+from typing import (Generator, Optional, Sequence)
+import warnings
+
 import numpy as np
-import pandas as pd
 import numpy.random as rnd
-from numpy.linalg import cholesky
+import pandas as pd
+from scipy.stats import (norm, qmc)
 
-from nfpy.Financial.Math import TSUtils as Tu
+import nfpy.Math as Math
 
 
 class RandomEngine(object):
+    """ Generator of correlated normal draws for the risk factors. Draws are
+        generated on request for a block of paths as a tensor of shape
+        <path, time, risk factor> so that the full simulation never needs to
+        reside in memory.
+
+        The following variance reduction techniques can be combined:
+            * antithetic: each block of normal draws z is completed by -z
+            * moment_matching: the draws of each block are standardized to
+                zero mean and unit variance along the paths
+            * sobol: scrambled Sobol' quasi-random sequences are used in
+                place of pseudo-random numbers. The paths are built with the
+                Brownian bridge to assign the first, best distributed,
+                coordinates to the terminal values of the paths. Blocks of
+                2^m paths preserve the balance properties of the sequence.
+
+        Input:
+            sigma [np.ndarray]: covariance matrix of the risk factors
+            length [int]: number of time steps of each path
+            seed [Optional[int]]: seed of the random generator (default: None)
+            labels [Optional[Sequence[str]]]: names of the risk factors
+                (default: None)
+            antithetic [bool]: use antithetic variates (default: False)
+            moment_matching [bool]: match the first two moments of the draws
+                (default: False)
+            sobol [bool]: use Sobol' sequences (default: False)
+            bridge [bool]: use the Brownian bridge construction with Sobol'
+                sequences (default: True)
+    """
+
+    def __init__(self, sigma: np.ndarray, length: int,
+                 seed: Optional[int] = None,
+                 labels: Optional[Sequence[str]] = None,
+                 antithetic: bool = False, moment_matching: bool = False,
+                 sobol: bool = False, bridge: bool = True):
+        if (sigma.ndim != 2) or (sigma.shape[0] != sigma.shape[1]):
+            raise ValueError('RandomEngine(): covariance matrix not squared')
+        if int(length) <= 0:
+            raise ValueError('RandomEngine(): length of the future projection inconsistent')
+        if (labels is not None) and (len(labels) != sigma.shape[0]):
+            raise ValueError('RandomEngine(): labels and covariance must have the same size')
 
-    def __init__(self, rf_dict: dict, obs: int, dim: int, length: int, it: int,
-                 start: pd.Timestamp = None, end: pd.Timestamp = None):
-        # Sigma related
-        self._dim = None
-        self._obs = None
-        self._index = None
-        self._start = None
-        self._end = None
-
-        # Random draws related
-        self._length = None
-        self._iter = None
-        self._seed = None
+        if sobol and (int(length) * sigma.shape[0] > qmc.Sobol.MAXDIM):
+            raise ValueError(f'RandomEngine(): Sobol\' sequences limited to {qmc.Sobol.MAXDIM} dimensions')
 
-        # Matrices
-        self._sigma = None
-        self._choly = None
-        self._draws = None
+        self._dim = sigma.shape[0]
+        self._length = int(length)
+        self._index = list(labels) if labels is not None else None
+
+        self._sigma = sigma
+        self._choly = self._factorize(sigma)
+
+        # Variance reduction
+        self._antithetic = antithetic
+        self._moment = moment_matching
+        self._sobol = sobol
+        self._bridge = self._bridge_plan(self._length) \
+            if sobol and bridge else None
+
+        self._seed = None
+        self._rng = None
+        self._qmc = None
+        self.seed = seed
+
+    @classmethod
+    def from_risk_factors(cls, rf_dict: dict, obs: int, length: int,
+                          start: Optional[pd.Timestamp] = None,
+                          end: Optional[pd.Timestamp] = None,
+                          seed: Optional[int] = None) -> 'RandomEngine':
+        """ Create the engine from the covariance of the last <obs> returns
+            of the risk factors in <rf_dict>.
+        """
+        if not rf_dict:
+            raise ValueError('RandomEngine(): risk factors not present')
 
-        self._initialize(rf_dict, obs, dim, length, it, start, end)
+        mat = np.empty((len(rf_dict), obs))
+        for i, rf in enumerate(rf_dict.values()):
+            r = rf.returns
+            _, v, _ = Math.trim_ts(
+                r.index.values, r.values,
+                start=None if start is None else start.asm8,
+                end=None if end is None else end.asm8
+            )
+            mat[i, :] = v[-obs:]
+
+        mat = mat[:, ~np.any(np.isnan(mat), axis=0)]
+        return cls(np.cov(mat), length, seed, list(rf_dict.keys()))
+
+    @staticmethod
+    def _bridge_plan(n: int) -> list[tuple[int, int, int, float, float, float]]:
+        """ Order of construction of the Brownian bridge on <n> unit steps.
+            Each element (m, l, r, wl, wr, sd) builds the point m as
+                W_m = wl W_l + wr W_r + sd z
+            with W_0 = 0. The terminal point comes first, then the midpoints
+            of the intervals in breadth-first order.
+        """
+        plan = [(n, 0, 0, .0, .0, np.sqrt(n))]
+        queue, k = [(0, n)], 0
+        while k < len(queue):
+            l, r = queue[k]
+            k += 1
+            if r - l < 2:
+                continue
+            m = (l + r) // 2
+            plan.append((
+                m, l, r, (r - m) / (r - l), (m - l) / (r - l),
+                np.sqrt((m - l) * (r - m) / (r - l))
+            ))
+            queue.extend(((l, m), (m, r)))
+        return plan
+
+    @staticmethod
+    def _factorize(sigma: np.ndarray) -> np.ndarray:
+        """ Cholesky factor of the covariance. Singular covariances are
+            factorized through their eigen-decomposition.
+        """
+        try:
+            return np.linalg.cholesky(sigma)
+        except np.linalg.LinAlgError:
+            val, vec = np.linalg.eigh(.5 * (sigma + sigma.T))
+            return vec * np.sqrt(np.maximum(val, .0))
 
     @property
-    def seed(self) -> int:
+    def seed(self) -> Optional[int]:
         return self._seed
 
     @seed.setter
-    def seed(self, v: int):
+    def seed(self, v: Optional[int]):
+        """ Setting the seed restarts the random stream. """
         self._seed = v
+        self._rng = rnd.default_rng(v)
+        if self._sobol:
+            self._qmc = qmc.Sobol(
+                self._length * self._dim, scramble=True, seed=self._rng
+            )
 
     @property
-    def sigma(self) -> np.array:
+    def sigma(self) -> np.ndarray:
         return self._sigma
 
     @property
-    def cholesky(self) -> np.array:
+    def cholesky(self) -> np.ndarray:
         return self._choly
 
     @property
-    def size(self) -> tuple:
-        return self._iter, self._dim, self._length
-
-    def _initialize(self, rf_dict: dict, obs: int, dim: int, length: int,
-                    it: int, start: pd.Timestamp, end: pd.Timestamp):
-        # Consistency check
-        if not rf_dict:
-            raise ValueError('Risk Factors not present!')
-        if int(dim) <= 0:
-            raise ValueError('Number of paths inconsistent!')
-        if int(length) <= 0:
-            raise ValueError('Length of the future projection inconsistent!')
+    def labels(self) -> Optional[list[str]]:
+        return self._index
 
-        # Calculate correlation matrix and cholesky
-        nrf = len(rf_dict)
-        mat = np.empty((nrf, obs))
-
-        index, i = [], 0
-        for k, rf in rf_dict.items():
-            index.append(k)
-            r = rf.returns
-            v, _ = Tu.trim_ts(r.values, r.index.values, start, end)
-            mat[i, :] = r[-obs:]
-            i = i + 1
-
-        # calculate covariance matrix
-        mat, _ = Tu.dropna(mat)
-        sigma = np.cov(mat)
-        choly = cholesky(sigma)
-
-        # draw normal random numbers
-        size = (it, dim, length)
-        draws = rnd.normal(size=size)
-
-        # apply cholesky
-        for i in range(size[0]):
-            mat = draws[i, :, :]
-            draws[i, :, :] = np.dot(choly, mat)
-
-        self._dim = dim
-        self._length = length
-        self._iter = it
-        self._draws = draws
-        self._dim = nrf
-        self._obs = obs
-        self._index = index
-        self._sigma = sigma
-        self._choly = choly
-        self._start = end
-        self._end = start
+    @property
+    def size(self) -> tuple[int, int]:
+        return self._length, self._dim
+
+    def fit_chunk(self, chunk: int) -> int:
+        """ Largest block size not above <chunk> compatible with the
+            variance reduction techniques: even with antithetic variates and
+            a power of 2 with Sobol' sequences.
+        """
+        block = 2 if self._antithetic else 1
+        if self._sobol:
+            return max(block, 1 << (max(1, int(chunk)).bit_length() - 1))
+        return max(block, chunk - chunk % block)
 
-    def get(self, it: int, rf: str) -> np.array:
-        i = self._index.index(rf)
-        return self._draws[it, i, :]
+    @property
+    def tensors(self) -> int:
+        """ Number of <path, time, rf> tensors alive while generating. """
+        return 3 if self._bridge is not None else 2
+
+    def draws(self, n: int) -> np.ndarray:
+        """ Correlated normal draws for <n> paths.
+
+            Input:
+                n [int]: number of paths
+
+            Output:
+                draws [np.ndarray]: tensor of draws <path, time, risk factor>
+        """
+        m = (n + 1) // 2 if self._antithetic else n
+        z = self._normals(m)
+        if self._antithetic:
+            z = np.concatenate((z, -z), axis=0)[:n]
+        if self._moment and (n > 1):
+            z -= z.mean(axis=0)
+            z /= z.std(axis=0)
+        if self._bridge is not None:
+            z = self._brownian_bridge(z)
+        return z @ self._choly.T
+
+    def _normals(self, n: int) -> np.ndarray:
+        """ Independent standard normals <path, time, rf>. With Sobol'
+            sequences the time axis is the order of construction of the
+            Brownian bridge (if used) and the first coordinates of the
+            sequence are assigned to the first time step of all the factors.
+        """
+        if not self._sobol:
+            return self._rng.standard_normal((n, self._length, self._dim))
+
+        with warnings.catch_warnings():
+            # Balance warnings for blocks that are not powers of 2
+            warnings.simplefilter('ignore', UserWarning)
+            u = self._qmc.random(n)
+        u = np.clip(u, 1e-16, 1. - 1e-16)
+        return norm.ppf(u).reshape(n, self._length, self._dim)
+
+    def _brownian_bridge(self, z: np.ndarray) -> np.ndarray:
+        """ Transform the normals <path, order, rf> into the increments
+            <path, time, rf> of standard Brownian motions.
+        """
+        n = z.shape[0]
+        w = np.zeros((n, self._length + 1, self._dim))
+        for k, (m, l, r, wl, wr, sd) in enumerate(self._bridge):
+            w[:, m] = wl * w[:, l] + wr * w[:, r] + sd * z[:, k]
+        return np.diff(w, axis=1)
+
+    def chunks(self, n: int, chunk: int) \
+            -> Generator[np.ndarray, None, None]:
+        """ Draws for <n> paths generated in blocks of at most <chunk> paths.
+        """
+        chunk = self.fit_chunk(chunk)
+        for done in range(0, n, chunk):
+            yield self.draws(min(chunk, n - done))
@@ -0,0 +1,6 @@
+from .MonteCarloVar import (MCVarResult, MonteCarloVar, TailAccumulator)
+from .RandomEngine import RandomEngine
+
+__all__ = [
+    'MCVarResult', 'MonteCarloVar', 'RandomEngine', 'TailAccumulator',
+]
@@ -10,7 +10,7 @@ import nfpy.Downloader as Dwn
 import nfpy.IO as IO
 from nfpy.Tools import get_logger_glob
 
-__version__ = '0.8'
+__version__ = '0.9'
 _TITLE_ = "<<< Update database script >>>"
 __purpose__ = "Updates the time series according to the Downloads table"
 __desc__ = """
@@ -25,6 +25,7 @@ overridden by the user:
     - override automatic [bool]: with True allows to update the items marked as
         inactive not automatically downloaded.
     - save [bool]: with False does not save the results in the database.
+    - workers [int]: number of concurrent downloads.
 """
 
 if __name__ == '__main__':
@@ -47,6 +48,8 @@ if __name__ == '__main__':
                             help='override <active> flag in DB')
         parser.add_argument('-s', '--no-save', action='store_false',
                             help='do not save in DB')
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='number of concurrent downloads')
         args = parser.parse_args()
 
         if args.interactive is True:
@@ -68,6 +71,8 @@ if __name__ == '__main__':
                                                  idesc='bool', default=False, optional=True)
                 args.no_save = inh.input("Save to database (default Yes)?: ",
                                          idesc='bool', default=True, optional=True)
+                args.workers = inh.input("Number of concurrent downloads (default 1)?: ",
+                                         idesc='int', default=1, optional=True)
     except RuntimeError as ex:
         logger.error(str(ex))
         raise ex
@@ -85,7 +90,8 @@ if __name__ == '__main__':
         provider=args.provider,
         page=args.page,
         ticker=args.ticker,
-        override_active=args.override_active
+        override_active=args.override_active,
+        workers=args.workers
     )
     # )
 
@@ -10,7 +10,7 @@ import nfpy.Downloader as Dwn
 import nfpy.IO as IO
 from nfpy.Tools import get_logger_glob
 
-__version__ = '0.9'
+__version__ = '0.10'
 _TITLE_ = "<<< Import into elaboration database script >>>"
 
 if __name__ == '__main__':
@@ -31,6 +31,8 @@ if __name__ == '__main__':
                             help='override <active> flag in DB')
         parser.add_argument('-c', '--no-incremental', action='store_false',
                             help='do not use incremental import')
+        parser.add_argument('-b', '--batch', action='store_true',
+                            help='import set-based in a single transaction')
         args = parser.parse_args()
 
         if args.interactive:
@@ -61,6 +63,10 @@ if __name__ == '__main__':
                     "Do incremental import (default True)?: ",
                     idesc='bool', default=True, optional=True
                 )
+                args.batch = inh.input(
+                    "Import set-based in a single transaction (default No)?: ",
+                    idesc='bool', default=False, optional=True
+                )
     except RuntimeError as ex:
         logger.error(str(ex))
         raise ex
@@ -74,6 +80,6 @@ if __name__ == '__main__':
 
     dwnf.run_import(provider=args.provider, item=args.item, uid=args.uid,
                     override_active=args.override_active,
-                    incremental=args.no_incremental)
+                    incremental=args.no_incremental, batch=args.batch)
 
     logger.info("All done!")
@@ -13,7 +13,7 @@ from nfpy.Financial.Portfolio import PortfolioEngine
 import nfpy.IO as IO
 from nfpy.Tools import Utilities as Ut
 
-__version__ = '0.5'
+__version__ = '0.6'
 _TITLE_ = "<<< Optimize a portfolio script >>>"
 
 _OPT_H = ['Idx', 'Name', 'Module']
@@ -86,6 +86,8 @@ if __name__ == '__main__':
     budget = inh.input("Enter the budget in [-1., 1.] (default 1.): ",
                        idesc='float', default=1.)
     iterations = inh.input("Enter iterations: ", idesc='int', default=50)
+    workers = inh.input("Enter the number of parallel workers (default 1): ",
+                        idesc='int', default=1)
 
     ptf = af.get(ptfs[idx][0])
     pe = PortfolioEngine(ptf)
@@ -95,6 +97,7 @@ if __name__ == '__main__':
             'gamma': gamma,
             'iterations': iterations,
             'budget': budget,
+            'workers': workers,
         }
     )
 
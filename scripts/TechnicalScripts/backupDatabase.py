@@ -6,13 +6,13 @@
 import nfpy.DB as DB
 from nfpy.Tools import Utilities as Ut
 
-__version__ = '0.3'
+__version__ = '0.4'
 _TITLE_ = "<<< Backup Database Script >>>"
 
 
 if __name__ == '__main__':
     Ut.print_header(_TITLE_, end='\n\n')
 
-    DB.backup_db()
+    DB.get_db_glob().backup()
 
     Ut.print_ok('All done!')
@@ -0,0 +1,108 @@
+#
+# Backtest signals tests
+# Signals and trades of the bulk and online backtesting on a known series
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+
+from nfpy.Trading.Backtesting import Backtester
+from nfpy.Trading.Sizers import ConstantSizer
+from nfpy.Trading.Strategies import SignalFlag
+from nfpy.Trading.Strategies.Breakouts import (BollingerBreakout,
+                                               DonchianBreakout)
+from nfpy.Trading.Strategies.MACross import SMAPriceCross
+
+
+class _Asset(object):
+    """ Asset with a zigzag price series: down from 19 to 10, up to 20, down
+        to 10 and up to 15.
+    """
+
+    def __init__(self):
+        p = np.r_[np.arange(19., 9., -1.), np.arange(11., 21.),
+                  np.arange(19., 9., -1.), np.arange(11., 16.)]
+        dt = pd.bdate_range('2020-01-01', periods=p.shape[0])
+        self.prices = SimpleNamespace(values=p, index=dt)
+
+
+class _RandomAsset(object):
+    """ Asset with a random walk price series. """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        p = 100. * np.exp(np.cumsum(rng.normal(.0, .01, 3000)))
+        dt = pd.bdate_range('2010-01-01', periods=p.shape[0])
+        self.prices = SimpleNamespace(values=p, index=dt)
+
+
+def _backtester(bulk: bool, size: float = 1.) -> Backtester:
+    bt = Backtester.__new__(Backtester)
+    bt._bulk = bulk
+    bt._initial = 1000.
+    bt._sizer = ConstantSizer(size)
+    return bt
+
+
+@pytest.mark.parametrize('npc', [0, 2])
+def test_bulk_signals(npc):
+    flags = SMAPriceCross(_Asset(), True, 3, npc).bulk_signals()
+
+    # The price crosses the 3 periods SMA at the turning points
+    expected = np.zeros(flags.shape[0], dtype=np.int8)
+    expected[[10 + npc, 30 + npc]] = 1
+    expected[20 + npc] = -1
+    np.testing.assert_array_equal(flags, expected)
+
+
+@pytest.mark.parametrize('bulk', [True, False])
+@pytest.mark.parametrize('npc', [0, 2])
+def test_online_signals(bulk, npc):
+    strategy = SMAPriceCross(_Asset(), bulk, 3, npc)
+    strategy.start()
+    signals = [(s.t + npc, s.signal.value) for s in strategy if s is not None]
+
+    # The online state machine raises the signals at the same periods
+    flags = SMAPriceCross(_Asset(), True, 3, npc).bulk_signals()
+    assert signals == [(t, flags[t]) for t in np.flatnonzero(flags)]
+
+
+def test_bulk_apply():
+    ptf = _backtester(True).apply(SMAPriceCross(_Asset(), True, 3))
+
+    # Executed the period after the signal at the worst of the two prices.
+    # The first SELL is at index 21 as the SMA crosses at index 20.
+    trades = [(int(np.searchsorted(ptf.dates, tr[0])), tr[1], tr[2], tr[3])
+              for tr in ptf.trades]
+    assert trades == [
+        (11, SignalFlag.BUY, 12., 83),
+        (21, SignalFlag.SELL, 18., 83),
+        (31, SignalFlag.BUY, 12., 124),
+        (34, SignalFlag.SELL, 15., 124),
+    ]
+    assert ptf.cash == pytest.approx(1870.)
+    assert ptf.equity[-1] == pytest.approx(1870.)
+
+
+def test_online_apply():
+    bulk = _backtester(True).apply(SMAPriceCross(_Asset(), True, 3))
+    online = _backtester(False).apply(SMAPriceCross(_Asset(), False, 3))
+
+    assert [tr[:4] for tr in online.trades] == [tr[:4] for tr in bulk.trades]
+    np.testing.assert_allclose(online.equity, bulk.equity)
+
+
+@pytest.mark.parametrize('size', [.5, 1.])
+@pytest.mark.parametrize('strat, args', [(DonchianBreakout, (20,)),
+                                         (BollingerBreakout, (20, 2.))])
+def test_apply_parity(size, strat, args):
+    bulk = _backtester(True, size).apply(strat(_RandomAsset(), True, *args))
+    online = _backtester(False, size) \
+        .apply(strat(_RandomAsset(), False, *args))
+
+    assert len(bulk.trades) > 0
+    assert [tr[:4] for tr in online.trades] == [tr[:4] for tr in bulk.trades]
+    assert online.cash == pytest.approx(bulk.cash)
+    np.testing.assert_allclose(online.equity, bulk.equity)
@@ -0,0 +1,69 @@
+#
+# Covariance tests
+# Online covariance updates against the batch estimators
+#
+
+import numpy as np
+import pytest
+
+from nfpy.Math.Covariance_ import (CovarianceCache, OnlineCovariance,
+                                   ewma_cov, sample_cov)
+
+
+@pytest.fixture
+def returns() -> np.ndarray:
+    """ Daily returns of 6 assets over 300 periods. """
+    rng = np.random.default_rng(0)
+    return rng.normal(.0005, .01, (6, 300))
+
+
+def test_online_sample(returns):
+    oc = OnlineCovariance(returns.shape[0])
+    oc.update(returns)
+
+    assert oc.count == returns.shape[1]
+    np.testing.assert_allclose(oc.mean, returns.mean(axis=1),
+                               rtol=.0, atol=1e-15)
+    np.testing.assert_allclose(oc.cov, np.cov(returns), rtol=.0, atol=1e-15)
+
+
+def test_online_ewma(returns):
+    oc = OnlineCovariance(returns.shape[0], lmbd=.94)
+    oc.update(returns)
+
+    np.testing.assert_allclose(oc.cov, ewma_cov(returns, .94),
+                               rtol=.0, atol=1e-15)
+
+
+def test_online_sliding_window(returns):
+    w = 100
+    oc = OnlineCovariance(returns.shape[0])
+    oc.update(returns[:, :w])
+    for t in range(w, returns.shape[1]):
+        oc.downdate(returns[:, t - w])
+        oc.update(returns[:, t])
+
+    np.testing.assert_allclose(oc.cov, np.cov(returns[:, -w:]),
+                               rtol=.0, atol=1e-15)
+
+
+def test_cache_rolling(returns):
+    v = returns.copy()
+    v[2, 150] = np.nan
+    dates = np.arange(v.shape[1])
+    cache = CovarianceCache()
+    cache.clear()
+
+    w = 100
+    for t in range(w, v.shape[1] + 1, 7):
+        x = v[:, t - w:t]
+        cov = cache.rolling('key', dates[t - w:t], x)
+        expected = sample_cov(x[:, ~np.isnan(x).any(axis=0)])
+        np.testing.assert_allclose(cov, expected, rtol=.0, atol=1e-15)
+
+    # A revision of the data in the window forces a rebuild
+    x = v[:, -w:].copy()
+    x[0, -10] += .05
+    np.testing.assert_allclose(cache.rolling('key', dates[-w:], x),
+                               sample_cov(x[:, ~np.isnan(x).any(axis=0)]),
+                               rtol=.0, atol=1e-15)
@@ -0,0 +1,51 @@
+#
+# Optimizer budget tests
+# Regression tests of the budget rule of the SLSQP optimizers
+#
+
+import numpy as np
+import pytest
+
+from nfpy.Financial.Portfolio.Optimizer.MaxSharpeModel import MaxSharpeModel
+from nfpy.Financial.Portfolio.Optimizer.MinimalVarianceModel import \
+    MinimalVarianceModel
+from nfpy.Financial.Portfolio.Optimizer.RiskParityModel import RiskParityModel
+
+
+@pytest.fixture
+def correlated_returns() -> np.ndarray:
+    """ Daily returns of 8 assets sharing a common factor. """
+    rng = np.random.default_rng(0)
+    return rng.normal(.0005, .01, (8, 500)) + rng.normal(.0, .01, (1, 500))
+
+
+@pytest.mark.parametrize('model', [MinimalVarianceModel, MaxSharpeModel,
+                                   RiskParityModel])
+@pytest.mark.parametrize('budget', [1., .5, -.3])
+@pytest.mark.parametrize('solver', ['qp', 'slsqp'])
+def test_budget(correlated_returns, model, budget, solver):
+    labels = [str(i) for i in range(correlated_returns.shape[0])]
+    res = model(correlated_returns, 'B', labels, iterations=10, seed=1,
+                budget=budget, solver=solver).result
+
+    assert res.success
+    wgt = res.weights[0]
+    assert np.sum(wgt) == pytest.approx(budget, abs=1e-6)
+    assert np.sum(np.abs(wgt)) <= 2. - abs(budget) + 1e-6
+
+
+@pytest.mark.parametrize('budget', [1., .5, -.3])
+@pytest.mark.parametrize('solver', ['qp', 'slsqp'])
+def test_risk_parity_budgets(correlated_returns, budget, solver):
+    labels = [str(i) for i in range(correlated_returns.shape[0])]
+    risk_budgets = np.arange(1., 9.)
+    model = RiskParityModel(correlated_returns, 'B', labels, budget=budget,
+                            risk_budgets=risk_budgets, solver=solver)
+    res = model.result
+
+    assert res.success
+    wgt = res.weights[0]
+    assert np.all(wgt * budget > .0)
+    rc = model.rc(wgt, model._cov)
+    np.testing.assert_allclose(rc, risk_budgets / np.sum(risk_budgets),
+                               atol=1e-6)
@@ -0,0 +1,37 @@
+#
+# Panel indicators tests
+# Regression tests of the panel indicators on flat windows
+#
+
+import numpy as np
+
+from nfpy.Trading.Indicators.Panel import (panel_bollinger, panel_rsi_cutler)
+
+
+def _flat_panel() -> np.ndarray:
+    """ Random walks of 3 assets, the second one halted in the middle. """
+    rng = np.random.default_rng(0)
+    panel = 100. + np.cumsum(rng.normal(.0, 1., (3, 400)), axis=1)
+    panel[1, 100:300] = panel[1, 99]
+    return panel
+
+
+def test_rsi_cutler_flat():
+    panel = _flat_panel()
+    w = 14
+    rsi = panel_rsi_cutler(panel, w)['rsi']
+
+    assert np.all(np.isnan(rsi[1, 100 + w:300]))
+    assert not np.any(np.isnan(rsi[:, w:100]))
+    assert not np.any(np.isnan(rsi[:, 300 + w:]))
+    assert np.all((rsi[:, w:100] >= .0) & (rsi[:, w:100] <= 100.))
+
+
+def test_bollinger_flat():
+    panel = _flat_panel()
+    w = 20
+    bb = panel_bollinger(panel, w, 2.)
+
+    assert np.all(np.isnan(bb['%b'][1, 100 + w:300]))
+    assert np.all(bb['width'][1, 100 + w:300] == .0)
+    assert not np.any(np.isnan(bb['%b'][:, w:100]))
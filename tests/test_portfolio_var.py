@@ -0,0 +1,52 @@
+#
+# Portfolio VaR tests
+# Alignment of the positions and the risk factors in the Monte Carlo VaR
+#
+
+import importlib
+import numpy as np
+import pytest
+
+import nfpy.Var as Var
+
+# The package re-exports the class under the name of the module
+PE = importlib.import_module('nfpy.Financial.Portfolio.PortfolioEngine')
+
+
+class _Portfolio(object):
+    """ Portfolio with two risky positions and the base currency cash. """
+
+    currency = 'EUR'
+    constituents_uids = ['AAA', 'BBB']
+
+
+@pytest.fixture
+def portfolio(monkeypatch) -> tuple[PE.PortfolioEngine, np.ndarray]:
+    rng = np.random.default_rng(0)
+    ret = rng.normal(.0, np.array([[.001], [.03]]), (2, 500))
+    monkeypatch.setattr(PE, '_ret_matrix', lambda uids, ccy: ret.copy())
+
+    pe = PE.PortfolioEngine.__new__(PE.PortfolioEngine)
+    pe._ptf = _Portfolio()
+    pe._slc = slice(None)
+    # Values of AAA, BBB and, last, of the base currency cash
+    pe._curr_pos_val = np.array([1000., 10., 1e6])
+    return pe, ret
+
+
+def test_var_mc_exposures(portfolio):
+    pe, ret = portfolio
+    res = pe.var_mc(10, 20000, confidence=(.99,), seed=1)
+
+    # The cash is not a risk factor and the positions keep their returns
+    ref = Var.MonteCarloVar(
+        np.log1p(ret), np.array([1000., 10.]), 10, 20000,
+        confidence=(.99,), seed=1
+    ).result
+    assert res.labels == ['AAA', 'BBB']
+    assert res.rf_var.shape == (1, 2)
+    np.testing.assert_allclose(res.var, ref.var)
+    np.testing.assert_allclose(res.rf_var, ref.rf_var)
+
+    # The low volatility position is the one with the largest exposure
+    assert res.rf_var[0, 0] < 1000. * .001 * np.sqrt(10) * 3.